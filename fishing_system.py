@@ -2,17 +2,43 @@
 Main system script - runs OwnerAgent, WaterCaretaker, and FishCaretaker.
 Fisherman agents should be run separately using run_fisherman.py
 """
+
 import os
 import asyncio
 import spade
 from src import OwnerAgent, WaterCaretakerAgent, FishCaretakerAgent
+from src.ledger import EventLedger
+from src.persistence import SnapshotStore
+from src.sensor_simulator import run_seed
+from src.sensor_trace import SensorTrace, TraceRecorder, TraceReplay
 from src.logger_config import setup_logging, get_logger
+from src.metrics import start_exporters
+from src.owner_sharding import OwnerRouterAgent, SharedCapacityStore
 from dotenv import load_dotenv
 
 load_dotenv()
 setup_logging()
 SYSTEM_NAME = os.environ.get("SYSTEM_NAME", "SYSTEM")
+# Number of OwnerAgent replicas behind owner@localhost. Replica 1 runs here,
+# replicas 2..N are started separately with run_owner_replica.py <n>
+OWNER_REPLICAS = int(os.environ.get("OWNER_REPLICAS", "1"))
+OWNER_STORE_PATH = os.environ.get("OWNER_STORE_PATH", "data/owner_state.sqlite")
+# Event ledger the agents rebuild their state from after a restart ("" disables it)
+LEDGER_PATH = os.environ.get("LEDGER_PATH", "data/ledger.sqlite")
+# Agents snapshot their state here, so a restart only replays the ledger tail
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "data/snapshots")
+SNAPSHOT_INTERVAL = float(os.environ.get("SNAPSHOT_INTERVAL", "60"))
+# Seed of the simulated caretaker sensors; unset picks (and logs) a fresh one
+SENSOR_SEED = os.environ.get("SENSOR_SEED")
+# Record the caretakers' pH/camera/sonar samples to this trace file, or
+# replay one instead of the simulated sensors, TRACE_SPEED times faster (0: unpaced)
+TRACE_RECORD = os.environ.get("TRACE_RECORD")
+TRACE_REPLAY = os.environ.get("TRACE_REPLAY")
+TRACE_SPEED = float(os.environ.get("TRACE_SPEED", "1"))
+
 
+def owner_replica_jids():
+    return [f"owner_replica{i}@localhost" for i in range(1, OWNER_REPLICAS + 1)]
 
 
 async def main():
@@ -25,22 +51,83 @@ async def main():
     fish_caretaker_jid = "fish_caretaker@localhost"
     fish_caretaker_password = ""
 
+    ledger = EventLedger(LEDGER_PATH) if LEDGER_PATH else None
+    snapshots = SnapshotStore(SNAPSHOT_DIR) if ledger is not None else None
+
     # Create owner and caretaker agents (no fishermen here)
-    owner = OwnerAgent(owner_jid, owner_password, water_caretaker_jid, fish_caretaker_jid)
+    if OWNER_REPLICAS > 1:
+        # Sharded owner: the router takes owner_jid, replicas share admission state
+        store = SharedCapacityStore(OWNER_STORE_PATH)
+        if ledger is None:
+            store.reset()  # with a ledger, a restart carries on with the stored state
+        replica_jids = owner_replica_jids()
+        router = OwnerRouterAgent(owner_jid, owner_password, replica_jids)
+        owner = OwnerAgent(
+            replica_jids[0],
+            owner_password,
+            water_caretaker_jid,
+            fish_caretaker_jid,
+            capacity_store=store,
+            router_jid=owner_jid,
+            ledger=ledger,
+            snapshot_store=snapshots,
+            snapshot_interval_s=SNAPSHOT_INTERVAL,
+        )
+        # Caretaker alarms go straight to the first replica
+        alarm_jid = replica_jids[0]
+    else:
+        router = None
+        owner = OwnerAgent(
+            owner_jid,
+            owner_password,
+            water_caretaker_jid,
+            fish_caretaker_jid,
+            ledger=ledger,
+            snapshot_store=snapshots,
+            snapshot_interval_s=SNAPSHOT_INTERVAL,
+        )
+        alarm_jid = owner_jid
+    sensor_seed = run_seed(int(SENSOR_SEED) if SENSOR_SEED else None)
+    recorder = TraceRecorder(TRACE_RECORD) if TRACE_RECORD else None
+    replay = (
+        TraceReplay(SensorTrace(TRACE_REPLAY), TRACE_SPEED) if TRACE_REPLAY else None
+    )
     water_caretaker = WaterCaretakerAgent(
-        water_caretaker_jid, water_caretaker_password, owner_jid)
-    fish_caretaker = FishCaretakerAgent(fish_caretaker_jid, fish_caretaker_password, owner_jid)
+        water_caretaker_jid,
+        water_caretaker_password,
+        alarm_jid,
+        seed=sensor_seed,
+        recorder=recorder,
+        replay=replay,
+    )
+    fish_caretaker = FishCaretakerAgent(
+        fish_caretaker_jid,
+        fish_caretaker_password,
+        alarm_jid,
+        ledger=ledger,
+        snapshot_store=snapshots,
+        snapshot_interval_s=SNAPSHOT_INTERVAL,
+        seed=sensor_seed,
+        recorder=recorder,
+        replay=replay,
+    )
 
     # Start system agents
     agent_list = [owner, water_caretaker, fish_caretaker]
+    if router:
+        agent_list.append(router)
     await spade.start_agents(agent_list)
+    # Prometheus endpoint / JSON-lines dump if METRICS_PORT / METRICS_FILE are set
+    await start_exporters()
 
     system_logger = get_logger("System")
-    system_logger.info(f"System agents started ({len(agent_list)} agents)")
+    system_logger.info("System agents started (%s agents)", len(agent_list))
     system_logger.info("OwnerAgent, WaterCaretaker, and FishCaretaker are running")
-    system_logger.info(f"Fisherman limit: {owner.fisherman_limit}")
+    system_logger.info("Fisherman limit: %s", owner.fisherman_limit)
+    if router:
+        system_logger.info("Owner router started with %s replicas", OWNER_REPLICAS)
     system_logger.info("Waiting for fisherman agents to connect...")
-    
+
     print("\n" + "=" * 60)
     print("FISHERY SYSTEM - Main Services Running")
     print("=" * 60)
@@ -61,12 +148,18 @@ async def main():
     except KeyboardInterrupt:
         system_logger.info("Shutting down system...")
         await owner.stop()
+        if router:
+            await router.stop()
         await water_caretaker.stop()
         await fish_caretaker.stop()
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if recorder is not None:
+            recorder.close()
 
     system_logger.info("System stopped")
 
 
 if __name__ == "__main__":
     spade.run(main())
-
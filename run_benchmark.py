@@ -0,0 +1,95 @@
+"""
+Benchmark protocol latency and throughput for 1 to N concurrent fishermen.
+Usage: python run_benchmark.py [--fishers 1,10,100,1000,5000] [--transport local|xmpp] [--encoding JSON|BIN] [--ledger FILE] [--output FILE]
+Example: python run_benchmark.py --fishers 1,10,100 --rounds 5 --output bench.json
+
+With --transport xmpp start the system first (python fishing_system.py)
+and raise its fisherman_limit / fish_takes_limit to the largest level.
+"""
+
+import argparse
+import json
+import logging
+import spade
+from src.logger_config import setup_logging, get_logger
+from src.protocol_benchmark import ProtocolBenchmark, codec_report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fishery protocol benchmark")
+    parser.add_argument(
+        "--fishers",
+        default="1,10,100,1000,5000",
+        help="Comma-separated concurrency levels",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=3, help="Conversations per fisher"
+    )
+    parser.add_argument("--transport", choices=["local", "xmpp"], default="local")
+    parser.add_argument(
+        "--encoding",
+        choices=["JSON", "BIN"],
+        default="JSON",
+        help="Message body encoding",
+    )
+    parser.add_argument(
+        "--ledger",
+        default=None,
+        help="Record state changes in this ledger file (local transport)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30.0, help="Request timeout (s)"
+    )
+    parser.add_argument("--domain", default="localhost")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args()
+
+
+async def main(args):
+    levels = [int(level) for level in args.fishers.split(",") if level]
+    benchmark = ProtocolBenchmark(
+        transport=args.transport,
+        rounds=args.rounds,
+        timeout_s=args.timeout,
+        domain=args.domain,
+        encoding=args.encoding,
+        ledger_path=args.ledger,
+    )
+    report = await benchmark.run(levels)
+    report["meta"]["log_level"] = args.log_level
+    report["codecs"] = codec_report()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(
+        f"{'fishers':>8} {'rt/s':>10} {'msg/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        f" {'B/msg':>7} {'CPU us/msg':>10}"
+    )
+    for result in report["results"]:
+        p = [
+            max((s[key] or 0) for s in result["protocols"].values())
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(
+            f"{result['fishers']:>8} {result['round_trips_per_s']:>10} {result['messages_per_s']:>10} "
+            f"{p[0]:>9.3f} {p[1]:>9.3f} {p[2]:>9.3f}"
+            f" {result['bytes_per_message'] or 0:>7} {result['cpu_us_per_message'] or 0:>10}"
+        )
+
+    print(f"\n{'protocol':<36} {'JSON B':>7} {'BIN B':>7} {'JSON us':>8} {'BIN us':>8}")
+    for protocol, codecs in report["codecs"].items():
+        json_stats, bin_stats = codecs["JSON"], codecs["BIN"]
+        print(
+            f"{protocol:<36} {json_stats['bytes']:>7} {bin_stats['bytes']:>7} "
+            f"{json_stats['us_per_message']:>8} {bin_stats['us_per_message']:>8}"
+        )
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(level=getattr(logging, args.log_level.upper()))
+    get_logger("Benchmark").info(f"Benchmark started: {vars(args)}")
+    spade.run(main(args))
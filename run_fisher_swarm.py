@@ -0,0 +1,111 @@
+"""
+Run a headless swarm of scripted fisherman agents in a single process.
+Usage: python run_fisher_swarm.py [--fishers N] [--arrival-rate R] [--seed S] ...
+Example: python run_fisher_swarm.py --fishers 500 --arrival-rate 20 --seed 7
+"""
+
+import argparse
+import asyncio
+import time
+import spade
+from src.fisher_agent import console
+from src.fisher_swarm import ScriptedFisherAgent, SwarmSchedule
+from src.message_codec import set_default_encoding
+from src.logger_config import setup_logging, get_logger
+
+# Setup logging
+setup_logging()
+logger = get_logger("SwarmRunner")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a scripted fisherman swarm")
+    parser.add_argument("--fishers", type=int, default=100)
+    parser.add_argument(
+        "--arrival-rate", type=float, default=5.0, help="Arrivals per second"
+    )
+    parser.add_argument(
+        "--mean-stay", type=float, default=60.0, help="Mean stay in seconds"
+    )
+    parser.add_argument(
+        "--catch-rate", type=float, default=0.05, help="Mean catches per second"
+    )
+    parser.add_argument(
+        "--catch-rate-spread",
+        type=float,
+        default=0.5,
+        help="Coefficient of variation of per-fisher catch rates",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Catches per take-fish request (>1 uses the batch protocol)",
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=["JSON", "BIN"],
+        default=None,
+        help="Message body encoding",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="swarm", help="Fisher JID prefix")
+    parser.add_argument("--domain", default="localhost")
+    return parser.parse_args()
+
+
+async def main(args):
+    owner_jid = f"owner@{args.domain}"
+    fish_caretaker_jid = f"fish_caretaker@{args.domain}"
+
+    schedule = SwarmSchedule(
+        args.fishers,
+        arrival_rate=args.arrival_rate,
+        mean_stay_s=args.mean_stay,
+        catch_rate=args.catch_rate,
+        catch_rate_spread=args.catch_rate_spread,
+        seed=args.seed,
+    )
+    plans = schedule.plan()
+    logger.info(
+        "Swarm plan: %s fishermen, %s catches, seed %s",
+        len(plans),
+        sum(len(p.catches) for p in plans),
+        args.seed,
+    )
+
+    if args.encoding:
+        set_default_encoding(args.encoding)
+
+    # Skip all fisherman UI output, results go to the log file only
+    console.quiet = True
+
+    start_time = time.monotonic() + 1
+    fishers = [
+        ScriptedFisherAgent(
+            f"{args.prefix}{plan.index}@{args.domain}",
+            "",
+            owner_jid,
+            plan,
+            fish_caretaker_jid=fish_caretaker_jid,
+            start_time=start_time,
+            batch_size=args.batch_size,
+        )
+        for plan in plans
+    ]
+    await spade.start_agents(fishers)
+    print(f"Started {len(fishers)} scripted fishermen (seed {args.seed})")
+
+    try:
+        while any(fisher.is_alive() for fisher in fishers):
+            await asyncio.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Shutting down swarm...")
+        await asyncio.gather(*(f.stop() for f in fishers if f.is_alive()))
+
+    logger.info("Swarm finished")
+    print("Swarm finished")
+
+
+if __name__ == "__main__":
+    spade.run(main(parse_args()))
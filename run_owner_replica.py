@@ -0,0 +1,86 @@
+"""
+Run an additional headless OwnerAgent replica in a separate process.
+Usage: OWNER_REPLICAS=<count> python run_owner_replica.py <replica_number>
+Example: OWNER_REPLICAS=3 python run_owner_replica.py 2
+
+Replica 1 and the router are started by fishing_system.py; every replica
+shares admission state through the SQLite file at OWNER_STORE_PATH.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+import spade
+from fishing_system import (
+    LEDGER_PATH,
+    OWNER_REPLICAS,
+    OWNER_STORE_PATH,
+    SNAPSHOT_DIR,
+    SNAPSHOT_INTERVAL,
+    owner_replica_jids,
+)
+from src import OwnerAgent
+from src.ledger import EventLedger
+from src.persistence import SnapshotStore
+from src.logger_config import get_logger
+from src.owner_sharding import SharedCapacityStore
+
+logger = get_logger("OwnerReplicaRunner")
+
+
+async def main(replica_number):
+    replica_jid = owner_replica_jids()[replica_number - 1]
+    ledger = snapshots = None
+    if LEDGER_PATH:
+        # A ledger file belongs to one process
+        path = Path(LEDGER_PATH)
+        ledger = EventLedger(
+            path.with_name(f"{path.stem}_replica{replica_number}{path.suffix}")
+        )
+        snapshots = SnapshotStore(SNAPSHOT_DIR)
+
+    owner = OwnerAgent(
+        replica_jid,
+        "",
+        "water_caretaker@localhost",
+        "fish_caretaker@localhost",
+        gui=False,
+        capacity_store=SharedCapacityStore(OWNER_STORE_PATH),
+        router_jid="owner@localhost",
+        ledger=ledger,
+        snapshot_store=snapshots,
+        snapshot_interval_s=SNAPSHOT_INTERVAL,
+    )
+    await spade.start_agents([owner])
+    logger.info("Owner replica %s started", replica_jid)
+
+    try:
+        while owner.is_alive():
+            await asyncio.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Shutting down owner replica %s...", replica_jid)
+        await owner.stop()
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(
+            "Usage: OWNER_REPLICAS=<count> python run_owner_replica.py <replica_number>"
+        )
+        sys.exit(1)
+
+    try:
+        replica_number = int(sys.argv[1])
+    except ValueError:
+        print("Error: Replica number must be an integer")
+        sys.exit(1)
+    if not 2 <= replica_number <= OWNER_REPLICAS:
+        print(
+            f"Error: Replica number must be between 2 and OWNER_REPLICAS ({OWNER_REPLICAS})"
+        )
+        sys.exit(1)
+
+    spade.run(main(replica_number))
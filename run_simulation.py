@@ -0,0 +1,152 @@
+"""
+Simulate a whole fishing day on a virtual clock, in seconds of wall time.
+Usage: python run_simulation.py [--fishers N] [--hours H] [--seed S] ...
+Example: python run_simulation.py --fishers 1000 --hours 24 --seed 7
+
+The owner, both caretakers and a scripted fisherman swarm run in this
+process on the in-memory transport and a SimulatedClock starting at
+midnight: every sleep, period, timeout, timestamp and quota window follows
+virtual time, which jumps ahead whenever all agents are waiting.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from src import FishCaretakerAgent, OwnerAgent, WaterCaretakerAgent
+from src.clock import SimulatedClock
+from src.fisher_agent import console
+from src.fisher_swarm import ScriptedFisherAgent, SwarmSchedule
+from src.local_transport import bus, local_agent_class
+from src.logger_config import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger("Simulation")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulate a fishing day")
+    parser.add_argument("--fishers", type=int, default=1000)
+    parser.add_argument("--hours", type=float, default=24.0, help="Simulated hours")
+    parser.add_argument(
+        "--arrival-hours",
+        type=float,
+        default=12.0,
+        help="Fishermen arrive over the first ARRIVAL_HOURS hours",
+    )
+    parser.add_argument(
+        "--mean-stay", type=float, default=7200.0, help="Mean stay in seconds"
+    )
+    parser.add_argument(
+        "--catch-rate", type=float, default=1 / 1200, help="Mean catches per second"
+    )
+    parser.add_argument("--fisherman-limit", type=int, default=300)
+    parser.add_argument("--fish-takes-limit", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--start",
+        default=None,
+        help="Simulated start (ISO date/time, default: today 00:00)",
+    )
+    return parser.parse_args()
+
+
+async def simulate(args, clock: SimulatedClock) -> dict:
+    owner_jid = "owner@localhost"
+    water_caretaker_jid = "water_caretaker@localhost"
+    fish_caretaker_jid = "fish_caretaker@localhost"
+
+    owner = local_agent_class(OwnerAgent)(
+        owner_jid,
+        "",
+        water_caretaker_jid,
+        fish_caretaker_jid,
+        gui=False,
+        clock=clock,
+    )
+    owner.fisherman_limit = args.fisherman_limit
+    owner.fish_takes_limit = args.fish_takes_limit
+    water_caretaker = local_agent_class(WaterCaretakerAgent)(
+        water_caretaker_jid, "", owner_jid, seed=args.seed, clock=clock
+    )
+    fish_caretaker = local_agent_class(FishCaretakerAgent)(
+        fish_caretaker_jid, "", owner_jid, seed=args.seed, clock=clock
+    )
+    system = [owner, water_caretaker, fish_caretaker]
+    await asyncio.gather(*(agent.start() for agent in system))
+
+    plans = SwarmSchedule(
+        args.fishers,
+        arrival_rate=args.fishers / (args.arrival_hours * 3600),
+        mean_stay_s=args.mean_stay,
+        catch_rate=args.catch_rate,
+        seed=args.seed,
+    ).plan()
+    start_time = clock.monotonic()
+    fishers = [
+        local_agent_class(ScriptedFisherAgent)(
+            f"sim{plan.index}@localhost",
+            "",
+            owner_jid,
+            plan,
+            fish_caretaker_jid=fish_caretaker_jid,
+            start_time=start_time,
+            clock=clock,
+        )
+        for plan in plans
+    ]
+    for fisher in fishers:
+        # Idle handlers wake up on every receive timeout, which is most of the
+        # work in a simulation; scripted fishermen stop by themselves anyway
+        fisher.receive_timeout_s = 3600.0
+
+    # Each fisherman joins at the arrival time of their plan, so only the ones
+    # around the fishery have behaviours to run
+    async def arrivals():
+        for fisher in fishers:
+            delay = start_time + fisher.plan.arrival_s - clock.monotonic()
+            if delay > 0:
+                await clock.sleep(delay)
+            await fisher.start()
+
+    arriving = asyncio.create_task(arrivals())
+    await clock.sleep(args.hours * 3600)
+    arriving.cancel()
+    report = {
+        "fishers": len(fishers),
+        "planned_catches": sum(len(plan.catches) for plan in plans),
+        "still_fishing": sum(fisher.is_alive() for fisher in fishers),
+        "fishes_taken_today": owner.fishes_taken_count,
+        "catches_registered": len(fish_caretaker.catches),
+        "ph_samples": water_caretaker.ph_data.total,
+        "stock_samples": fish_caretaker.camera_data.total,
+        "messages": bus.delivered,
+    }
+    await asyncio.gather(*(f.stop() for f in fishers if f.is_alive()))
+    await asyncio.gather(*(agent.stop() for agent in system))
+    return report
+
+
+def main():
+    args = parse_args()
+    if args.start:
+        start = datetime.fromisoformat(args.start)
+    else:
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    clock = SimulatedClock(start)
+    console.quiet = True
+
+    started = time.perf_counter()
+    report = clock.run(simulate(args, clock))
+    wall_s = time.perf_counter() - started
+
+    logger.info("Simulation finished: %s", report)
+    print(
+        f"Simulated {args.hours:g} h from {start.isoformat()} in {wall_s:.1f} s of wall time"
+    )
+    for key, value in report.items():
+        print(f"  {key:<20} {value}")
+
+
+if __name__ == "__main__":
+    main()
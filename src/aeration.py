@@ -0,0 +1,63 @@
+"""
+Aeration pump of the WaterCaretakerAgent.
+
+The measurement behaviour only asks for aeration (`request()`); the pump
+runs its cycles in a behaviour of its own, so sampling never waits for it.
+
+States:
+    off      idle, a request starts a cycle at once
+    on       pumping for `run_s` seconds
+    resting  pump off for at least `rest_s` seconds before the next cycle
+
+A request while a cycle is pending or running is merged into it; a request
+while resting starts one more cycle once the rest is over.
+"""
+
+import asyncio
+from .clock import SYSTEM_CLOCK
+from .logger_config import get_logger
+
+logger = get_logger("Aeration")
+
+OFF = "off"
+ON = "on"
+RESTING = "resting"
+
+
+class AerationPump:
+    def __init__(self, clock=SYSTEM_CLOCK, run_s: float = 5.0, rest_s: float = 10.0):
+        self.clock = clock
+        self.run_s = run_s
+        self.rest_s = rest_s
+        self.state = OFF
+        self.cycles = 0  # cycles started
+        self.merged = 0  # requests merged into a pending or running cycle
+        self._requested = asyncio.Event()
+
+    def request(self) -> bool:
+        """
+        Ask for a pump cycle. Never blocks.
+
+        Returns:
+            bool: False if the request was merged into a pending or running cycle
+        """
+        if self._requested.is_set() or self.state == ON:
+            self.merged += 1
+            return False
+        self._requested.set()
+        return True
+
+    async def run_cycle(self):
+        """Wait for a request and run one full cycle (on, then resting)"""
+        await self._requested.wait()
+        self._requested.clear()
+        self.state = ON
+        self.cycles += 1
+        logger.info("Aeration started (pump ON), cycle %s", self.cycles)
+        try:
+            await self.clock.sleep(self.run_s)
+            logger.info("Aeration ended (pump OFF)")
+            self.state = RESTING
+            await self.clock.sleep(self.rest_s)
+        finally:
+            self.state = OFF
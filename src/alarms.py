@@ -0,0 +1,201 @@
+"""
+Alarm conditions of the caretaker agents.
+
+AlarmHysteresis turns a noisy score into excursions: it trips once the score
+stayed above `trip` for `trip_after` consecutive samples and re-arms only
+after `clear_after` consecutive samples below `clear` (< trip). A score
+hovering around the threshold therefore raises one alarm per excursion
+instead of one per sample.
+
+AlarmManager sits between an agent and the owner: every alarm the caretakers
+send goes through it, so a condition that holds for hours produces a handful
+of aggregated notifications instead of one message per tick.
+"""
+
+from datetime import datetime
+from typing import NamedTuple, Optional
+from .clock import SYSTEM_CLOCK
+from .metrics import ALARMS
+
+
+class AlarmHysteresis:
+    def __init__(
+        self, trip: float, clear: float, trip_after: int = 2, clear_after: int = 3
+    ):
+        if clear > trip:
+            raise ValueError("Clear threshold must not be above the trip threshold.")
+        if trip_after < 1 or clear_after < 1:
+            raise ValueError("Sample counts must be at least 1.")
+        self.trip = trip
+        self.clear = clear
+        self.trip_after = trip_after
+        self.clear_after = clear_after
+        self.active = False
+        self.excursions = 0  # alarms raised so far
+        self._streak = 0  # consecutive samples pointing to the other state
+
+    def update(self, score: float) -> Optional[bool]:
+        """
+        Feed the next score.
+
+        Returns:
+            True when the alarm trips, False when it clears, None otherwise
+        """
+        if not self.active:
+            self._streak = self._streak + 1 if score > self.trip else 0
+            if self._streak >= self.trip_after:
+                self.active, self._streak = True, 0
+                self.excursions += 1
+                return True
+        else:
+            self._streak = self._streak + 1 if score < self.clear else 0
+            if self._streak >= self.clear_after:
+                self.active, self._streak = False, 0
+                return False
+        return None
+
+
+class AlarmPolicy(NamedTuple):
+    """How often one alarm type may reach the owner"""
+
+    suppress_s: float = 300.0  # quiet time after each notification
+    escalate_at: tuple = (10, 60)  # occurrences in an episode raising the level
+    reset_s: float = 300.0  # an episode ends after this long without occurrences
+
+
+LEVELS = ("warning", "major", "critical")
+
+
+class AlarmNotification(NamedTuple):
+    kind: str  # alarm type, the protocol the notification is sent with
+    level: str
+    occurrences: int  # occurrences covered by this notification
+    since: float  # epoch time of the first of them
+    suppressed: int  # occurrences not notified on their own so far
+    payload: dict  # payload of the latest occurrence
+
+    def summary(self) -> str:
+        since = datetime.fromtimestamp(self.since).isoformat(timespec="seconds")
+        return f"{self.occurrences} occurrences since {since}"
+
+    def body(self) -> dict:
+        """Message payload: the latest alarm plus the aggregation fields"""
+        return {
+            **self.payload,
+            "level": self.level,
+            "occurrences": self.occurrences,
+            "since": datetime.fromtimestamp(self.since).isoformat(),
+            "suppressed": self.suppressed,
+            "summary": self.summary(),
+        }
+
+
+class _AlarmState:
+    __slots__ = (
+        "count",
+        "level",
+        "last_seen",
+        "notified_at",
+        "pending",
+        "pending_since",
+        "payload",
+        "suppressed",
+    )
+
+    def __init__(self, now: float):
+        self.count = 0  # occurrences in the current episode
+        self.level = 0
+        self.last_seen = now
+        self.notified_at = None
+        self.pending = 0  # occurrences since the last notification
+        self.pending_since = now
+        self.payload = {}
+        self.suppressed = 0
+
+
+class AlarmManager:
+    """
+    Rate limits the alarms an agent sends, per alarm type.
+
+    The first occurrence of an episode is notified at once; further ones
+    within `suppress_s` of a notification are counted and reported together
+    in one "N occurrences since T" notification once the window is over (see
+    `due()`). Reaching a new escalation level is notified immediately.
+    """
+
+    def __init__(
+        self,
+        clock=SYSTEM_CLOCK,
+        policies: Optional[dict] = None,
+        default: AlarmPolicy = AlarmPolicy(),
+    ):
+        self.clock = clock
+        self.policies = policies or {}
+        self.default = default
+        self.states: dict[str, _AlarmState] = {}
+
+    def policy(self, kind: str) -> AlarmPolicy:
+        return self.policies.get(kind, self.default)
+
+    def suppressed(self, kind: str) -> int:
+        """Occurrences of `kind` suppressed so far"""
+        state = self.states.get(kind)
+        return state.suppressed if state else 0
+
+    def raise_alarm(self, kind: str, payload: dict) -> Optional[AlarmNotification]:
+        """
+        Record an occurrence of alarm `kind`.
+
+        Returns:
+            AlarmNotification to send now, or None if it was suppressed
+        """
+        policy = self.policy(kind)
+        now = self.clock.time()
+        state = self.states.get(kind)
+        if state is None:
+            state = self.states[kind] = _AlarmState(now)
+        elif now - state.last_seen > policy.reset_s:
+            # A new episode: its first occurrence is notified at once
+            state.count, state.level, state.notified_at = 0, 0, None
+        if state.pending == 0:
+            state.pending_since = now
+        state.count += 1
+        state.pending += 1
+        state.last_seen = now
+        state.payload = payload
+
+        level = sum(state.count >= at for at in policy.escalate_at)
+        escalated = level > state.level
+        state.level = level
+        if (
+            state.notified_at is None
+            or escalated
+            or now - state.notified_at >= policy.suppress_s
+        ):
+            return self._notify(kind, state, now)
+        state.suppressed += 1
+        ALARMS.inc(kind, "suppressed")
+        return None
+
+    def due(self) -> list:
+        """Aggregated notifications of suppressed occurrences whose window is over"""
+        now = self.clock.time()
+        return [
+            self._notify(kind, state, now)
+            for kind, state in self.states.items()
+            if state.pending and now - state.notified_at >= self.policy(kind).suppress_s
+        ]
+
+    def _notify(self, kind: str, state: _AlarmState, now: float) -> AlarmNotification:
+        notification = AlarmNotification(
+            kind,
+            LEVELS[min(state.level, len(LEVELS) - 1)],
+            state.pending,
+            state.pending_since,
+            state.suppressed,
+            state.payload,
+        )
+        state.notified_at = now
+        state.pending = 0
+        ALARMS.inc(kind, "notified")
+        return notification
@@ -0,0 +1,272 @@
+import math
+import sys
+import time
+from array import array
+from datetime import datetime
+from typing import Iterator, Optional
+
+
+class CatchTotals:
+    """Running count and mass of a group of catches"""
+
+    __slots__ = ("count", "mass")
+
+    def __init__(self):
+        self.count = 0
+        self.mass = 0.0
+
+    def add(self, mass: float):
+        self.count += 1
+        self.mass += mass
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "mass": round(self.mass, 3)}
+
+    def __repr__(self):
+        return f"CatchTotals(count={self.count}, mass={self.mass:.3f})"
+
+
+class _Symbols:
+    """Interning table: each distinct string is stored once and referred to by a small int"""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+
+    def id(self, name: str) -> int:
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return symbol
+
+
+class CatchRegistry:
+    """
+    Append-only registry of caught fish with running aggregates.
+
+    Records are stored column-wise in typed arrays (fisher, species and size
+    as ids into interning tables, mass and catch time as doubles), so a catch
+    costs ~30 bytes instead of a dict per fish. Count and mass per species,
+    size class, fisher and time bucket are updated on every registration, so
+    the usual questions are answered in O(1) without scanning the records;
+    only `records()` with filters walks the columns.
+    """
+
+    def __init__(self, bucket_s: int = 3600):
+        self.bucket_s = bucket_s
+        self._fishers = _Symbols()
+        self._species = _Symbols()
+        self._sizes = _Symbols()
+        # Species and size come from fisher messages: any number of distinct values
+        self._fisher_col = array("I")
+        self._species_col = array("I")
+        self._size_col = array("I")
+        self._mass_col = array("d")
+        self._time_col = array("d")  # epoch seconds
+        # Row numbers of every fisher's catches, indexed by fisher id
+        self._rows_by_fisher: list[array] = []
+
+        self.total = CatchTotals()
+        self.species_totals: dict[str, CatchTotals] = {}
+        self.size_totals: dict[str, CatchTotals] = {}
+        self.fisher_totals: dict[str, CatchTotals] = {}
+        # bucket start (epoch s) -> totals
+        self.bucket_totals: dict[int, CatchTotals] = {}
+
+    def __len__(self) -> int:
+        return len(self._mass_col)
+
+    @staticmethod
+    def _timestamp(value) -> float:
+        if isinstance(value, (int, float)):
+            return float(value)
+        if value:
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except (TypeError, ValueError):
+                pass
+        return time.time()
+
+    @staticmethod
+    def _totals(table: dict, key) -> CatchTotals:
+        totals = table.get(key)
+        if totals is None:
+            totals = table[key] = CatchTotals()
+        return totals
+
+    def add(self, fisherman: str, fish_data: dict) -> int:
+        """
+        Register one catch.
+
+        Args:
+            fisherman: JID of the fisher who took the fish
+            fish_data: dict with species, size, mass and time (ISO string or epoch seconds)
+
+        Returns:
+            int: row number of the new record
+        """
+        species = str(fish_data.get("species") or "Unknown")
+        size = str(fish_data.get("size") or "Unknown")
+        try:
+            mass = float(fish_data.get("mass") or 0.0)
+        except (TypeError, ValueError):
+            mass = 0.0
+        if not math.isfinite(mass):
+            mass = 0.0
+        timestamp = self._timestamp(fish_data.get("time"))
+
+        fisher_id = self._fishers.id(fisherman)
+        species_id = self._species.id(species)
+        size_id = self._sizes.id(size)
+        if fisher_id == len(self._rows_by_fisher):
+            self._rows_by_fisher.append(array("I"))
+        row = len(self._mass_col)
+        self._fisher_col.append(fisher_id)
+        self._species_col.append(species_id)
+        self._size_col.append(size_id)
+        self._mass_col.append(mass)
+        self._time_col.append(timestamp)
+        self._rows_by_fisher[fisher_id].append(row)
+
+        # Aggregates are keyed by the interned names
+        self.total.add(mass)
+        self._totals(self.species_totals, self._species.names[species_id]).add(mass)
+        self._totals(self.size_totals, self._sizes.names[size_id]).add(mass)
+        self._totals(self.fisher_totals, self._fishers.names[fisher_id]).add(mass)
+        bucket = int(timestamp // self.bucket_s) * self.bucket_s
+        self._totals(self.bucket_totals, bucket).add(mass)
+        return row
+
+    def record(self, row: int) -> dict:
+        """The catch stored at `row`, as the fish data dict it was registered from"""
+        return {
+            "fisherman": self._fishers.names[self._fisher_col[row]],
+            "species": self._species.names[self._species_col[row]],
+            "size": self._sizes.names[self._size_col[row]],
+            "mass": self._mass_col[row],
+            "time": datetime.fromtimestamp(self._time_col[row]).isoformat(),
+        }
+
+    def records(
+        self,
+        fisherman: Optional[str] = None,
+        species: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Iterator[dict]:
+        """
+        Catches matching every given filter, in registration order.
+
+        Args:
+            fisherman: only this fisher's catches (uses the per-fisher index)
+            species: only this species
+            since: only catches at or after this epoch time
+            until: only catches before this epoch time
+        """
+        if fisherman is not None:
+            fisher_id = self._fishers.ids.get(fisherman)
+            if fisher_id is None:
+                return
+            rows = self._rows_by_fisher[fisher_id]
+        else:
+            rows = range(len(self))
+
+        species_id = None
+        if species is not None:
+            species_id = self._species.ids.get(species)
+            if species_id is None:
+                return
+
+        for row in rows:
+            if species_id is not None and self._species_col[row] != species_id:
+                continue
+            timestamp = self._time_col[row]
+            if since is not None and timestamp < since:
+                continue
+            if until is not None and timestamp >= until:
+                continue
+            yield self.record(row)
+
+    def fisher_count(self, fisherman: str) -> int:
+        totals = self.fisher_totals.get(fisherman)
+        return totals.count if totals else 0
+
+    def species_count(self, species: str) -> int:
+        totals = self.species_totals.get(species)
+        return totals.count if totals else 0
+
+    def summary(self) -> dict:
+        """All aggregates as plain dicts (JSON-serialisable)"""
+        return {
+            "total": self.total.as_dict(),
+            "species": {k: v.as_dict() for k, v in self.species_totals.items()},
+            "size": {k: v.as_dict() for k, v in self.size_totals.items()},
+            "fisher": {k: v.as_dict() for k, v in self.fisher_totals.items()},
+            "bucket": {k: v.as_dict() for k, v in sorted(self.bucket_totals.items())},
+        }
+
+    _COLUMNS = ("_fisher_col", "_species_col", "_size_col", "_mass_col", "_time_col")
+    _TABLES = ("species_totals", "size_totals", "fisher_totals", "bucket_totals")
+
+    def to_state(self) -> dict:
+        """Copy of the registry for a snapshot: symbol tables, columns and totals"""
+        return {
+            "bucket_s": self.bucket_s,
+            "symbols": {
+                "fishers": list(self._fishers.names),
+                "species": list(self._species.names),
+                "sizes": list(self._sizes.names),
+            },
+            # array copies are memcpy-cheap; encoding happens off the event loop
+            "columns": {
+                name: array(column.typecode, column)
+                for name, column in (
+                    (name, getattr(self, name)) for name in self._COLUMNS
+                )
+            },
+            "totals": {
+                "total": [self.total.count, self.total.mass],
+                **{
+                    table: [
+                        [k, v.count, v.mass] for k, v in getattr(self, table).items()
+                    ]
+                    for table in self._TABLES
+                },
+            },
+        }
+
+    def load_state(self, state: dict):
+        """Replace the contents of the registry with a `to_state()` copy"""
+        self.__init__(state["bucket_s"])
+        for attr, key in (
+            ("_fishers", "fishers"),
+            ("_species", "species"),
+            ("_sizes", "sizes"),
+        ):
+            symbols = getattr(self, attr)
+            for name in state["symbols"][key]:
+                symbols.id(name)
+        for name in self._COLUMNS:
+            column, values = getattr(self, name), state["columns"][name]
+            # Snapshots may hold narrower columns (u16 species/size ids)
+            column.extend(
+                values if values.typecode == column.typecode else values.tolist()
+            )
+        for fisher_id in range(len(self._fishers.names)):
+            self._rows_by_fisher.append(array("I"))
+        for row, fisher_id in enumerate(self._fisher_col):
+            self._rows_by_fisher[fisher_id].append(row)
+
+        totals = state["totals"]
+        self.total.count, self.total.mass = totals["total"]
+        for table in self._TABLES:
+            target = getattr(self, table)
+            for key, count, mass in totals[table]:
+                if isinstance(key, str):
+                    key = sys.intern(key)
+                entry = target[key] = CatchTotals()
+                entry.count, entry.mass = count, mass
+
+    def clear(self):
+        self.__init__(self.bucket_s)
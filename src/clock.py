@@ -0,0 +1,182 @@
+"""
+Clocks the agents take their time from.
+
+Every agent has a `clock`. Behaviours sleep with `clock.sleep()`, run
+periodically through the `PeriodicBehaviour` below and read timestamps and
+quota windows from `clock.now()` / `clock.time()`. By default that is the
+wall clock (SYSTEM_CLOCK).
+
+SimulatedClock is a discrete-event clock for running days of fishery
+activity in seconds. Its event loop never sleeps: whenever every task is
+waiting (on a sleep, a receive timeout, a period), virtual time jumps
+straight to the next scheduled timer. Agents must be started inside
+`SimulatedClock.run()`, on the in-process transport.
+
+Work done in threads (ledger commits, snapshot writes) takes no virtual time,
+but virtual time may move on while the loop waits for it, so simulations
+that need to be reproducible run without a ledger.
+"""
+
+import asyncio
+import heapq
+import itertools
+import selectors
+import time
+from contextlib import suppress
+from datetime import datetime
+from typing import Coroutine, Optional, Union
+from spade.behaviour import CyclicBehaviour
+from spade.container import Container
+
+
+class Clock:
+    """Wall clock"""
+
+    def time(self) -> float:
+        """Epoch seconds"""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Seconds for measuring intervals"""
+        return time.monotonic()
+
+    def now(self) -> datetime:
+        """Local date and time"""
+        return datetime.now()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def sleep_until(self, timestamp: float):
+        """Sleep until epoch time `timestamp`"""
+        delay = timestamp - self.time()
+        if delay > 0:
+            await self.sleep(delay)
+
+
+SYSTEM_CLOCK = Clock()
+
+
+class _VirtualSelector:
+    """Selector that advances the clock instead of blocking while timers are pending"""
+
+    def __init__(self, selector: selectors.BaseSelector, clock: "SimulatedClock"):
+        self._selector = selector
+        self._clock = clock
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # No timer at all: only I/O or another thread can wake the loop
+            return self._selector.select(None)
+        self._clock.advance(timeout)
+        return []
+
+
+class _TimerHandle(asyncio.TimerHandle):
+    """TimerHandle ordered by deadline, then by scheduling order"""
+
+    __slots__ = ("_seq",)
+    _counter = itertools.count()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._seq = next(self._counter)
+
+    def __lt__(self, other):
+        if self._when == other._when:
+            return self._seq < other._seq
+        return self._when < other._when
+
+
+class SimulatedEventLoop(asyncio.SelectorEventLoop):
+    """Event loop running on a SimulatedClock"""
+
+    def __init__(self, clock: "SimulatedClock"):
+        super().__init__(_VirtualSelector(selectors.DefaultSelector(), clock))
+        self.clock = clock
+
+    def time(self) -> float:
+        return self.clock.elapsed
+
+    def call_at(self, when, callback, *args, context=None):
+        # As in BaseEventLoop.call_at, but timers due at the same time run in
+        # the order they were scheduled: virtual time stands still between
+        # callbacks, so equal deadlines are common and heapq is not stable
+        if when is None:
+            raise TypeError("when cannot be None")
+        self._check_closed()
+        timer = _TimerHandle(when, callback, args, self, context)
+        heapq.heappush(self._scheduled, timer)
+        timer._scheduled = True
+        return timer
+
+
+class SimulatedClock(Clock):
+    """Discrete-event clock starting at `start` (a datetime or epoch seconds)"""
+
+    def __init__(self, start: Optional[Union[datetime, float]] = None):
+        if start is None:
+            start = datetime.now()
+        self.start = start.timestamp() if isinstance(start, datetime) else float(start)
+        self.elapsed = 0.0  # virtual seconds since `start`
+
+    def time(self) -> float:
+        return self.start + self.elapsed
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time())
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self.elapsed += seconds
+
+    def run(self, main: Coroutine):
+        """Run `main` to completion on a simulated event loop (like spade.run)"""
+        loop = SimulatedEventLoop(self)
+        asyncio.set_event_loop(loop)
+        # Agents take their loop from the SPADE container
+        Container().loop = loop
+        try:
+            return loop.run_until_complete(main)
+        finally:
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    loop.run_until_complete(task)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+
+class PeriodicBehaviour(CyclicBehaviour):
+    """spade.behaviour.PeriodicBehaviour, timed by the agent's clock"""
+
+    def __init__(self, period: float):
+        super().__init__()
+        if period < 0:
+            raise ValueError("Period must be greater or equal than zero.")
+        self.period = period
+        self._next_activation = None
+
+    async def _run(self):
+        clock = self.agent.clock
+        now = clock.monotonic()
+        if self._next_activation is None:
+            self._next_activation = now
+        if now < self._next_activation:
+            await clock.sleep(self._next_activation - now)
+            return
+        await self.run()
+        if self.period <= 0:
+            self._next_activation = clock.monotonic()
+        else:
+            while self._next_activation <= clock.monotonic():
+                self._next_activation += self.period
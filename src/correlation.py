@@ -0,0 +1,127 @@
+import asyncio
+import base64
+import itertools
+import os
+from typing import Any, Optional
+from spade.message import Message
+from .logger_config import get_logger
+
+logger = get_logger("Correlation")
+
+# Random per-process prefix + counter: unique across agents and restarts,
+# ordered within a process and far shorter than a uuid4 string
+_ID_PREFIX = base64.b32encode(os.urandom(5)).decode("ascii").lower()
+_id_counter = itertools.count(1)
+
+
+def new_id() -> str:
+    """Compact, monotonic id for the reply-with and conversation-id fields"""
+    return f"{_ID_PREFIX}{next(_id_counter):x}"
+
+
+class PendingRequest:
+    """An outstanding request waiting for its response"""
+
+    def __init__(self, conversation_id, reply_with, protocol, data, future, timer):
+        self.conversation_id = conversation_id
+        self.reply_with = reply_with
+        self.protocol = protocol
+        self.data = data  # whatever the caller needs to handle the response
+        self.future = future  # resolves to the response Message, or None on timeout
+        self.timer = timer
+
+
+class PendingRequests:
+    """
+    Correlation table of outstanding requests, keyed by conversation-id.
+
+    Every request gets its own future, so any number of requests can be in
+    flight at once and each response resolves exactly the request it answers
+    (matched by `in-reply-to` against the request's `reply-with`, falling back
+    to `conversation-id`). Requests without a response within the timeout are
+    dropped and their future resolves to None, like `Behaviour.receive`.
+    """
+
+    def __init__(self, default_timeout: float = 30.0):
+        self.default_timeout = default_timeout
+        self._by_conversation: dict[str, PendingRequest] = {}
+        self._by_reply_with: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_conversation)
+
+    def __contains__(self, conversation_id) -> bool:
+        return conversation_id in self._by_conversation
+
+    def register(
+        self,
+        conversation_id: str,
+        reply_with: str,
+        protocol: str = "",
+        data: Any = None,
+        timeout: Optional[float] = None,
+    ) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        timer = loop.call_later(
+            self.default_timeout if timeout is None else timeout,
+            self._expire,
+            conversation_id,
+        )
+        self._by_conversation[conversation_id] = PendingRequest(
+            conversation_id, reply_with, protocol, data, future, timer
+        )
+        self._by_reply_with[reply_with] = conversation_id
+        return future
+
+    def _pop(self, conversation_id) -> Optional[PendingRequest]:
+        request = self._by_conversation.pop(conversation_id, None)
+        if request is not None:
+            self._by_reply_with.pop(request.reply_with, None)
+            request.timer.cancel()
+        return request
+
+    def _expire(self, conversation_id):
+        request = self._pop(conversation_id)
+        if request is not None:
+            logger.warning(
+                "Request %s (%s) timed out without a response",
+                conversation_id,
+                request.protocol,
+            )
+            if not request.future.done():
+                request.future.set_result(None)
+
+    def resolve(self, msg: Message) -> Optional[PendingRequest]:
+        """
+        Match a response with its request and complete the request's future.
+
+        Returns:
+            PendingRequest: the answered request, or None for unknown or late responses
+        """
+        conversation_id = self._by_reply_with.get(msg.metadata.get("in-reply-to"))
+        if conversation_id is None:
+            conversation_id = msg.metadata.get("conversation-id")
+        request = self._pop(conversation_id)
+        if request is not None and not request.future.done():
+            request.future.set_result(msg)
+        return request
+
+    async def wait_all(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for the outstanding requests to be
+        answered or to expire.
+
+        Returns:
+            bool: True if no request is left outstanding
+        """
+        futures = [request.future for request in self._by_conversation.values()]
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+        return not self._by_conversation
+
+    def cancel_all(self):
+        for conversation_id in list(self._by_conversation):
+            request = self._pop(conversation_id)
+            if not request.future.done():
+                request.future.set_result(None)
@@ -0,0 +1,332 @@
+"""
+Vectorised anomaly detection for sensor streams.
+
+Samples are buffered per stream and evaluated in micro-batches: every
+detector configured for a stream scores the whole batch in one NumPy pass
+and carries just enough state (the tail of its window, running means, CUSUM
+sums) to continue seamlessly with the next batch. A score is computed for
+every sample, so evaluating once per second or once per thousand samples
+gives the same results.
+
+Detectors:
+    ZScoreDetector  z-score of each sample within the last `window` samples
+    EwmaDetector    deviation from an exponentially weighted mean, in EW std devs
+    CusumDetector   two-sided CUSUM of standardised samples (sustained shifts)
+    MadDetector     modified z-score against a rolling median and MAD (robust to spikes)
+"""
+
+import abc
+import math
+from typing import Optional
+import numpy as np
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+
+
+class Detector(abc.ABC):
+    name = "detector"
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+
+    @abc.abstractmethod
+    def scores(self, batch: np.ndarray) -> np.ndarray:
+        """Score of every sample in `batch` (NaN while warming up), updating the state"""
+
+    def alarms(self, scores: np.ndarray) -> np.ndarray:
+        return np.abs(scores) > self.threshold  # NaN (warming up) never alarms
+
+
+class ZScoreDetector(Detector):
+    """
+    Same values as misc.RollingZScore: the window includes the sample itself
+    and uses the population standard deviation.
+    """
+
+    name = "zscore"
+
+    def __init__(self, window: int = 10, threshold: float = 3.0):
+        super().__init__(threshold)
+        if window < 2:
+            raise ValueError("Window size must be at least 2.")
+        self.window = window
+        self._tail = np.empty(0)
+
+    def scores(self, batch):
+        data = np.concatenate((self._tail, batch))
+        self._tail = data[-(self.window - 1) :]
+        offset = len(data) - len(batch)  # position of the batch in `data`
+        z = np.full(len(batch), np.nan)
+        # Windows still filling up exist only at the start of the stream
+        for end in range(max(offset, 1), min(self.window - 1, len(data))):
+            z[end - offset] = self._z(data[: end + 1])
+        # Two passes per window (mean, then deviations): running sums of
+        # squares cancel catastrophically when an outlier enters the window
+        first = max(offset, self.window - 1)
+        if first < len(data):
+            windows = sliding_window_view(data, self.window)[first - self.window + 1 :]
+            z[first - offset :] = self._z(windows)
+        return z
+
+    @staticmethod
+    def _z(windows: np.ndarray):
+        """Z-score of the last sample of each window (rows, or a single window)"""
+        mean = windows.mean(axis=-1, keepdims=True)
+        deviations = windows - mean
+        std = np.sqrt((deviations * deviations).mean(axis=-1))
+        last = deviations[..., -1]
+        mean = mean[..., 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(std > 1e-12 * (1 + np.abs(mean)), last / std, 0.0)
+
+
+def _ewm(u: np.ndarray, alpha: float, y0: float) -> np.ndarray:
+    """y[t] = (1 - alpha) * y[t-1] + alpha * u[t], vectorised in chunks that cannot overflow"""
+    beta = 1.0 - alpha
+    if beta <= 0.0:
+        return u.astype(float, copy=True)
+    chunk = max(1, int(150 / -math.log10(beta))) if beta < 1.0 else len(u) or 1
+    out = np.empty(len(u))
+    for begin in range(0, len(u), chunk):
+        part = u[begin : begin + chunk]
+        powers = beta ** np.arange(1, len(part) + 1)
+        out[begin : begin + len(part)] = powers * (
+            y0 + alpha * np.cumsum(part / powers)
+        )
+        y0 = out[begin + len(part) - 1]
+    return out
+
+
+class EwmaDetector(Detector):
+    """Deviation of each sample from the EW mean of the samples before it"""
+
+    name = "ewma"
+
+    def __init__(self, alpha: float = 0.2, threshold: float = 3.0):
+        super().__init__(threshold)
+        if not 0 < alpha <= 1:
+            raise ValueError("Alpha must be in (0, 1].")
+        self.alpha = alpha
+        self.mean: Optional[float] = None
+        self.variance = 0.0
+
+    def scores(self, batch):
+        z = np.full(len(batch), np.nan)
+        if not len(batch):
+            return z
+        offset = 0
+        if self.mean is None:
+            self.mean = float(batch[0])
+            offset = 1
+        x = batch[offset:]
+        if not len(x):
+            return z
+
+        means = _ewm(x, self.alpha, self.mean)
+        prev_means = np.concatenate(([self.mean], means[:-1]))
+        deviation = x - prev_means
+        beta = 1.0 - self.alpha
+        variances = _ewm(beta * deviation * deviation, self.alpha, self.variance)
+        prev_variances = np.concatenate(([self.variance], variances[:-1]))
+        std = np.sqrt(prev_variances)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z[offset:] = np.where(std > 0, deviation / std, np.nan)
+
+        self.mean = float(means[-1])
+        self.variance = float(variances[-1])
+        return z
+
+
+class CusumDetector(Detector):
+    """
+    Two-sided CUSUM of (x - target) / sigma with slack `k`. Target and sigma
+    are learnt from the first `warmup` samples unless given. The score is
+    the upper sum, or minus the lower sum when that one is larger.
+    """
+
+    name = "cusum"
+
+    def __init__(
+        self,
+        k: float = 0.5,
+        threshold: float = 5.0,
+        warmup: int = 30,
+        target: Optional[float] = None,
+        sigma: Optional[float] = None,
+    ):
+        super().__init__(threshold)
+        self.k = k
+        self.warmup = warmup
+        self.target = target
+        self.sigma = sigma
+        self.upper = 0.0
+        self.lower = 0.0
+        self._warmup_samples: list[np.ndarray] = []
+
+    @staticmethod
+    def _lindley(steps: np.ndarray, s0: float) -> np.ndarray:
+        # S[t] = max(0, S[t-1] + steps[t]) without a Python loop
+        c = s0 + np.cumsum(steps)
+        return c - np.minimum(np.minimum.accumulate(c), 0.0)
+
+    def scores(self, batch):
+        z = np.full(len(batch), np.nan)
+        offset = 0
+        if self.target is None or self.sigma is None:
+            self._warmup_samples.append(batch)
+            seen = np.concatenate(self._warmup_samples)
+            if len(seen) < self.warmup:
+                return z
+            learnt = seen[: self.warmup]
+            if self.target is None:
+                self.target = float(learnt.mean())
+            if self.sigma is None:
+                self.sigma = float(learnt.std())
+            self._warmup_samples = []
+            offset = len(batch) - (len(seen) - self.warmup)
+
+        x = batch[offset:]
+        if not len(x):
+            return z
+        standardised = (x - self.target) / max(self.sigma, 1e-12)
+        upper = self._lindley(standardised - self.k, self.upper)
+        lower = self._lindley(-standardised - self.k, self.lower)
+        self.upper = float(upper[-1])
+        self.lower = float(lower[-1])
+        z[offset:] = np.where(upper >= lower, upper, -lower)
+        return z
+
+
+class MadDetector(Detector):
+    """Modified z-score 0.6745 * (x - median) / MAD over the last `window` samples"""
+
+    name = "mad"
+
+    def __init__(self, window: int = 31, threshold: float = 3.5):
+        super().__init__(threshold)
+        if window < 3:
+            raise ValueError("Window size must be at least 3.")
+        self.window = window
+        self._tail = np.empty(0)
+
+    def scores(self, batch):
+        data = np.concatenate((self._tail, batch))
+        self._tail = data[-(self.window - 1) :]
+        z = np.full(len(batch), np.nan)
+        if len(data) < self.window:
+            return z
+        # batch samples that have a full window behind them
+        full = min(len(batch), len(data) - self.window + 1)
+        tail = np.ascontiguousarray(data[len(data) - self.window - full + 1 :])
+        step = tail.strides[0]
+        windows = as_strided(
+            tail, shape=(full, self.window), strides=(step, step), writeable=False
+        )
+        median = _row_medians(windows)
+        mad = _row_medians(np.abs(windows - median[:, None]))
+        x = batch[len(batch) - full :]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z[len(batch) - full :] = np.where(mad > 0, 0.6745 * (x - median) / mad, 0.0)
+        return z
+
+
+def _row_medians(rows: np.ndarray) -> np.ndarray:
+    """np.median(rows, axis=1) by partial sort, without np.median's per-call overhead"""
+    k = rows.shape[1] // 2
+    if rows.shape[1] % 2:
+        return np.partition(rows, k, axis=1)[:, k]
+    part = np.partition(rows, (k - 1, k), axis=1)
+    return (part[:, k - 1] + part[:, k]) / 2
+
+
+def default_detectors() -> list[Detector]:
+    return [ZScoreDetector(), EwmaDetector(), CusumDetector(), MadDetector()]
+
+
+class StreamResult:
+    """Outcome of one evaluation of a stream"""
+
+    def __init__(self, stream: str, samples: int):
+        self.stream = stream
+        self.samples = samples  # samples in the micro-batch
+        # detector -> score of the latest sample
+        self.scores: dict[str, Optional[float]] = {}
+        self.alarms: dict[str, int] = {}  # detector -> samples over its threshold
+        # detector -> score of largest magnitude in the micro-batch
+        self.peaks: dict[str, Optional[float]] = {}
+        self.thresholds: dict[str, float] = {}
+
+    def proximity(self, detectors=None) -> Optional[float]:
+        """
+        How close the latest sample came to alarming.
+
+        Args:
+            detectors: names of the detectors to consider (default: all)
+
+        Returns:
+            float: largest |score| / threshold (1.0 at the threshold), None
+            while the detectors are warming up
+        """
+        proximities = [
+            abs(score) / self.thresholds[name]
+            for name, score in self.scores.items()
+            if score is not None and (detectors is None or name in detectors)
+        ]
+        return max(proximities) if proximities else None
+
+    def score(self, detector: str) -> Optional[float]:
+        return self.scores.get(detector)
+
+    def peak(self, detector: str) -> Optional[float]:
+        return self.peaks.get(detector)
+
+    def alarming(self) -> list[str]:
+        return [name for name, count in self.alarms.items() if count]
+
+
+class DetectionEngine:
+    """Per-stream sample buffers and detector sets, evaluated in micro-batches"""
+
+    def __init__(self, streams: Optional[dict[str, list[Detector]]] = None):
+        self.detectors: dict[str, list[Detector]] = {}
+        self._pending: dict[str, list[float]] = {}
+        for stream, detectors in (streams or {}).items():
+            self.configure(stream, detectors)
+
+    def configure(self, stream: str, detectors: list[Detector]):
+        """Set the detectors of `stream` (state starts from scratch)"""
+        self.detectors[stream] = detectors
+        self._pending.setdefault(stream, [])
+
+    def push(self, stream: str, value: float):
+        self._pending[stream].append(value)
+
+    def extend(self, stream: str, values):
+        self._pending[stream].extend(values)
+
+    def evaluate(self) -> dict[str, StreamResult]:
+        """Score every sample pushed since the last evaluation"""
+        results = {}
+        for stream, detectors in self.detectors.items():
+            pending = self._pending[stream]
+            if not pending:
+                continue
+            batch = np.asarray(pending, dtype=float)
+            self._pending[stream] = []
+            result = StreamResult(stream, len(batch))
+            for detector in detectors:
+                scores = detector.scores(batch)
+                last = scores[-1]
+                result.scores[detector.name] = None if np.isnan(last) else float(last)
+                result.thresholds[detector.name] = detector.threshold
+                magnitudes = np.abs(scores)
+                if np.isnan(magnitudes).all():
+                    result.peaks[detector.name] = None
+                else:
+                    result.peaks[detector.name] = float(
+                        scores[np.nanargmax(magnitudes)]
+                    )
+                result.alarms[detector.name] = int(
+                    np.count_nonzero(detector.alarms(scores))
+                )
+            results[stream] = result
+        return results
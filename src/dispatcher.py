@@ -0,0 +1,213 @@
+"""
+Single entry point for all messages of an agent.
+
+Instead of one CyclicBehaviour (and one mailbox) per protocol, the agent runs
+one ProtocolDispatcher that reads every message, looks its handler up by the
+"protocol" metadata field and hands it to a bounded pool of workers:
+
+- messages with the same key (by default the requesting fisher's JID) always
+  go to the same worker, so one fisher's requests are handled in order;
+- messages with different keys are handled concurrently by different workers;
+- every worker queue is bounded and the dispatcher never waits on one: a
+  request for a backed-up worker is refused at once with the `on_busy`
+  reply, and a message that cannot be refused (exit registration, alarms)
+  goes to the worker's overflow line, which a separate task feeds into the
+  queue in order, so one slow key never holds up the others;
+- protocols can be rate limited per key, checked before the message reaches
+  a handler, so rejected messages are never decoded or logged.
+"""
+
+import asyncio
+import zlib
+from collections import deque
+from typing import Callable, Optional
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+from spade.template import Template
+from .logger_config import get_logger
+from .metrics import DISPATCH_OVERFLOW, HANDLER_SECONDS, RATE_LIMITED
+from .protocols import Protocols
+
+logger = get_logger("Dispatcher")
+
+
+class ProtocolDispatcher(CyclicBehaviour):
+    """
+    Routes messages to handlers through a protocol lookup table.
+
+    A handler is any object with an `async handle(msg)` method - usually one
+    of the agent's Handle*Behaviour classes, which get `set_agent` called so
+    they can use `self.agent` and `self.send` as if they were running on
+    their own.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        queue_size: int = 256,
+        key: Optional[Callable[[Message], str]] = None,
+        on_busy: Optional[Callable[[Message], Optional[Message]]] = None,
+    ):
+        super().__init__()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.key = key or self.default_key
+        # Builds the reply to a request whose worker queue is full (None: no
+        # refusal for that protocol, the message waits for the queue instead)
+        self.on_busy = on_busy
+        self.routes: dict[str, list[tuple[Optional[Template], object]]] = {}
+        self.limits: dict[str, tuple[object, Optional[Callable]]] = {}
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        # Per worker: messages waiting for room in its full queue, in arrival order
+        self._overflow: list[deque] = []
+        self._drainers: dict[int, asyncio.Task] = {}
+        self.dispatched = 0
+        self.unrouted = 0
+
+    @staticmethod
+    def default_key(msg: Message) -> str:
+        return msg.metadata.get("on-behalf-of") or str(msg.sender)
+
+    def route(self, protocol: Protocols, handler, template: Optional[Template] = None):
+        """
+        Register `handler` for messages of `protocol`.
+
+        Args:
+            protocol: protocol in the message's "protocol" metadata
+            handler: object with an `async handle(msg)` method
+            template: extra conditions (sender, performative...) the message must match
+        """
+        self.routes.setdefault(protocol.value, []).append((template, handler))
+
+    def limit(
+        self,
+        protocols,
+        limiter,
+        on_reject: Optional[Callable[[Message], Optional[Message]]] = None,
+    ):
+        """
+        Rate limit messages of `protocols` per key.
+
+        Args:
+            protocols: Protocols whose messages take a token
+            limiter: object with an `allow(key) -> bool` method (e.g. quota.RateLimiter)
+            on_reject: builds the reply sent for a rejected message (None: drop it)
+        """
+        for protocol in protocols:
+            self.limits[protocol.value] = (limiter, on_reject)
+
+    def combined_template(self) -> Template:
+        """Template matching every message some route accepts"""
+        combined = None
+        for protocol, routes in self.routes.items():
+            for template, _ in routes:
+                if template is None:
+                    template = Template(metadata={"protocol": protocol})
+                combined = template if combined is None else combined | template
+        return combined
+
+    def handler_for(self, msg: Message):
+        for template, handler in self.routes.get(msg.metadata.get("protocol"), ()):
+            if template is None or template.match(msg):
+                return handler
+        return None
+
+    async def on_start(self):
+        for handlers in self.routes.values():
+            for _, handler in handlers:
+                if hasattr(handler, "set_agent"):
+                    handler.set_agent(self.agent)
+        self._queues = [asyncio.Queue(self.queue_size) for _ in range(self.workers)]
+        self._overflow = [deque() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    async def on_end(self):
+        for task in self._tasks + list(self._drainers.values()):
+            task.cancel()
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues) + sum(
+            len(line) for line in self._overflow
+        )
+
+    async def _work(self, queue: asyncio.Queue):
+        role = getattr(self.agent, "metrics_role", type(self.agent).__name__)
+        while True:
+            handler, msg = await queue.get()
+            try:
+                with HANDLER_SECONDS.time(role, msg.metadata.get("protocol", "")):
+                    await handler.handle(msg)
+            except Exception:
+                logger.exception(
+                    "Handler %s failed on %s from %s",
+                    type(handler).__name__,
+                    msg.metadata.get("protocol"),
+                    msg.sender,
+                )
+            finally:
+                queue.task_done()
+
+    async def run(self):
+        msg = await self.receive(timeout=30)
+        if not msg:
+            return
+
+        protocol = msg.metadata.get("protocol")
+        key = self.key(msg)
+        limit = self.limits.get(protocol)
+        if limit is not None and not limit[0].allow(key):
+            RATE_LIMITED.inc(
+                getattr(self.agent, "metrics_role", type(self.agent).__name__), protocol
+            )
+            reply = limit[1](msg) if limit[1] else None
+            if reply is not None:
+                await self.send(reply)
+            return
+
+        handler = self.handler_for(msg)
+        if handler is None:
+            self.unrouted += 1
+            logger.warning(
+                "No handler for %s from %s", msg.metadata.get("protocol"), msg.sender
+            )
+            return
+
+        # crc32 rather than hash(): stable across processes and runs
+        worker = zlib.crc32(key.encode()) % self.workers
+        # Nothing may overtake a message still waiting in the overflow line
+        if self._overflow[worker]:
+            await self.overflow(worker, handler, msg)
+            return
+        try:
+            self._queues[worker].put_nowait((handler, msg))
+        except asyncio.QueueFull:
+            await self.overflow(worker, handler, msg)
+            return
+        self.dispatched += 1
+
+    async def overflow(self, worker: int, handler, msg: Message):
+        """Handle a message for a backed-up worker without blocking the others"""
+        role = getattr(self.agent, "metrics_role", type(self.agent).__name__)
+        protocol = msg.metadata.get("protocol", "")
+        reply = self.on_busy(msg) if self.on_busy else None
+        if reply is not None:
+            DISPATCH_OVERFLOW.inc(role, protocol, "refused")
+            await self.send(reply)
+            return
+        DISPATCH_OVERFLOW.inc(role, protocol, "deferred")
+        self._overflow[worker].append((handler, msg))
+        if worker not in self._drainers:
+            self._drainers[worker] = asyncio.create_task(self._drain(worker))
+        self.dispatched += 1
+
+    async def _drain(self, worker: int):
+        """Move the worker's overflow line into its queue as room frees up"""
+        line, queue = self._overflow[worker], self._queues[worker]
+        try:
+            while line:
+                # Stays at the head of the line until it is in the queue
+                await queue.put(line[0])
+                line.popleft()
+        finally:
+            del self._drainers[worker]
@@ -1,26 +1,89 @@
-import json, asyncio
-from uuid import uuid4 as uuid
+import asyncio
 from typing import Optional
-from spade.behaviour import CyclicBehaviour, PeriodicBehaviour
+from spade.behaviour import CyclicBehaviour
 from spade.agent import Agent
 from spade.template import Template
 from spade.message import Message
+from .alarms import AlarmManager, AlarmPolicy
+from .catch_registry import CatchRegistry
+from .clock import SYSTEM_CLOCK, PeriodicBehaviour
+from .correlation import new_id
+from .detectors import DetectionEngine, default_detectors
+from .ledger import CATCH
 from .logger_config import get_logger
-
-from .misc import get_random_data, calculate_z_score
+from .message_codec import CodecError, pack_body, unpack_body
+from .metrics import HANDLER_SECONDS, MetricsAgentMixin
+from .persistence import DurableStateMixin
 from .protocols import Protocols
+from .sampling import AdaptiveSampler
+from .sensor_buffer import SensorBuffer
+from .sensor_simulator import FISH_COUNT_PROFILE, SimulatedSensor, run_seed
 
 logger = get_logger("FishCaretakerAgent")
 
 
-class FishCaretakerAgent(Agent):
-
-    def __init__(self, jid, password, owner_jid):
+class FishCaretakerAgent(DurableStateMixin, MetricsAgentMixin, Agent):
+
+    def __init__(
+        self,
+        jid,
+        password,
+        owner_jid,
+        history_size=3600,
+        ledger=None,
+        snapshot_store=None,
+        snapshot_interval_s=60.0,
+        detectors=None,
+        seed=None,
+        camera_sensor=None,
+        sonar_sensor=None,
+        recorder=None,
+        replay=None,
+        clock=None,
+    ):
         super().__init__(jid, password)
-        self.camera_data = []
-        self.sonar_data = []
-        self.fishes_taken = {}
+        self.clock = clock or SYSTEM_CLOCK
+        if camera_sensor is None or sonar_sensor is None:
+            seed = run_seed(seed)
+            logger.info("Simulated stock sensors seed: %s", seed)
+        self.camera_sensor = camera_sensor or SimulatedSensor(
+            "camera", FISH_COUNT_PROFILE, seed
+        )
+        self.sonar_sensor = sonar_sensor or SimulatedSensor(
+            "sonar", FISH_COUNT_PROFILE, seed
+        )
+        self.recorder = recorder  # TraceRecorder keeping every camera/sonar sample
+        self.replay = replay  # TraceReplay to take the samples from instead
+        # Sensor history is bounded to the last `history_size` samples per stream
+        self.camera_data = SensorBuffer(history_size)
+        self.sonar_data = SensorBuffer(history_size)
+        # Anomaly detectors per stream ("camera", "sonar"), evaluated by ManageRestocking
+        self.detection = DetectionEngine(
+            detectors or {"camera": default_detectors(), "sonar": default_detectors()}
+        )
+        self.stock_anomalies = set()  # (stream, detector) pairs currently alarming
+        # Stock sampling slows down to one read per 5 s while no detector is
+        # close to its threshold and reads 2 samples a second otherwise
+        self.stock_sampler = AdaptiveSampler(slow_s=5.0, fast_s=1.0, batch=2)
+        # CUSUM accumulates and sits near its threshold on plain noise, so it
+        # does not steer the sampling rate
+        self.sampling_detectors = ("zscore", "ewma", "mad")
+        self.catches = CatchRegistry()
+        # Durable record of catch registrations (see ledger and persistence)
+        self.ledger = ledger
+        self.snapshot_store = snapshot_store
+        self.snapshot_interval_s = snapshot_interval_s
         self.z_score_needs_restocking_alarm_point = 0.5
+        # The stocking condition is checked every second; the alarm manager
+        # lets one notification through per 5 minutes and aggregates the rest
+        self.alarms = AlarmManager(
+            self.clock,
+            {
+                Protocols.SEND_NEEDS_STOCKING_ALARM.value: AlarmPolicy(
+                    suppress_s=300.0, escalate_at=(600, 3600), reset_s=120.0
+                )
+            },
+        )
         self.owner_jid = owner_jid
 
         self.feeding_parameters = {"portion": 1, "interval_s": 2}
@@ -32,30 +95,118 @@ class FishCaretakerAgent(Agent):
         self.order_food_need = False
         self.order_amount_kg = 25.0
 
+    def register_catch(self, fisherman: str, fish_data: dict) -> int:
+        """
+        Register a fish taken by `fisherman` in the catch registry.
+
+        Returns:
+            int: row number of the catch in the registry
+        """
+        self.record(CATCH, fisherman, fish_data)
+        return self.catches.add(fisherman, fish_data)
+
+    def add_stock_sample(self, stream: str, value: float, timestamp=None):
+        """Store a camera or sonar sample and queue it for the detectors"""
+        buffer = self.camera_data if stream == "camera" else self.sonar_data
+        buffer.append(value)
+        self.detection.push(stream, value)
+        if self.recorder is not None:
+            if timestamp is None:
+                timestamp = self.clock.time()
+            self.recorder.record(stream, value, timestamp)
+
+    def apply_event(self, event):
+        """Replay one ledger event recorded by this agent"""
+        if event.kind == CATCH:
+            # Catches without a time are dated by their registration
+            fish_data = {**event.data, "time": event.data.get("time") or event.time}
+            self.catches.add(event.subject, fish_data)
+
+    def snapshot_state(self):
+        return {"catches": self.catches.to_state()}
+
+    def load_state(self, state):
+        self.catches.load_state(state["catches"])
+
     # ========== DEI ==========
 
     class MonitorFishState(CyclicBehaviour):
         async def run(self):
-            self.agent.camera_data.append(self.collect_camera_data())
-            self.agent.sonar_data.append(self.collect_sonar_data())
-            await asyncio.sleep(1)
+            sampler = self.agent.stock_sampler
+            now = self.agent.clock.time()
+            camera = self.collect_camera_data(sampler.size)
+            sonar = self.collect_sonar_data(sampler.size)
+            # A micro-batch covers the interval since the previous read
+            for i, (camera_data, sonar_data) in enumerate(zip(camera, sonar)):
+                timestamp = now - (sampler.size - 1 - i) * sampler.spacing
+                self.agent.add_stock_sample("camera", camera_data, timestamp)
+                self.agent.add_stock_sample("sonar", sonar_data, timestamp)
+            await self.agent.clock.sleep(sampler.interval)
+
+        def collect_camera_data(self, n=1):
+            return self.agent.camera_sensor.read_many(n).tolist()
+
+        def collect_sonar_data(self, n=1):
+            return self.agent.sonar_sensor.read_many(n).tolist()
+
+    class ReplayFishState(CyclicBehaviour):
+        """Feed recorded camera and sonar samples instead of reading the sensors"""
+
+        def match(self, message) -> bool:
+            # Never reads the mailbox
+            return False
 
-        def collect_camera_data(self):
-            return max(0, get_random_data(20, 5))
-
-        def collect_sonar_data(self):
-            return max(0, get_random_data(20, 5))
+        async def run(self):
+            async for stream, timestamp, value in self.agent.replay.samples(
+                ("camera", "sonar")
+            ):
+                self.agent.add_stock_sample(stream, value, timestamp)
+            self.kill()
 
     class ManageRestocking(CyclicBehaviour):
         async def run(self):
-            needs_stocking, z_score = self.if_needs_stocking()
-            if needs_stocking:
-                await self.send_needs_stocking_alarm(z_score)
-            await asyncio.sleep(1)
-
-        def if_needs_stocking(self) -> tuple[bool, Optional[float]]:
-            camera_z_score: Optional[float] = calculate_z_score(self.agent.camera_data)
-            sonar_z_score: Optional[float] = calculate_z_score(self.agent.sonar_data)
+            # Scores every sample collected since the previous run in one pass
+            results = self.agent.detection.evaluate()
+            if results:
+                self.report_anomalies(results)
+                self.agent.stock_sampler.update(self.urgency(results))
+                needs_stocking, z_score = self.if_needs_stocking(results)
+                if needs_stocking:
+                    await self.send_needs_stocking_alarm(z_score)
+            for notification in self.agent.alarms.due():
+                await self.send_alarm(notification)
+            await self.agent.clock.sleep(self.agent.stock_sampler.interval)
+
+        def urgency(self, results) -> Optional[float]:
+            """How close the latest stock samples came to a detector threshold"""
+            proximities = [
+                result.proximity(self.agent.sampling_detectors)
+                for result in results.values()
+            ]
+            proximities = [p for p in proximities if p is not None]
+            return max(proximities) if proximities else None
+
+        def report_anomalies(self, results):
+            """Log detectors that start or stop alarming on a stream"""
+            for stream, result in results.items():
+                for detector, count in result.alarms.items():
+                    key = (stream, detector)
+                    if count and key not in self.agent.stock_anomalies:
+                        self.agent.stock_anomalies.add(key)
+                        logger.warning(
+                            "Stock anomaly on %s: %s peak score %s",
+                            stream,
+                            detector,
+                            result.peak(detector),
+                        )
+                    elif not count and key in self.agent.stock_anomalies:
+                        self.agent.stock_anomalies.discard(key)
+                        logger.info("Stock anomaly on %s cleared: %s", stream, detector)
+
+        def if_needs_stocking(self, results) -> tuple[bool, Optional[float]]:
+            camera, sonar = results.get("camera"), results.get("sonar")
+            camera_z_score = camera.score("zscore") if camera else None
+            sonar_z_score = sonar.score("zscore") if sonar else None
 
             if camera_z_score is not None and sonar_z_score is not None:
                 camera_z_score = round(float(camera_z_score), 2)
@@ -69,28 +220,40 @@ class FishCaretakerAgent(Agent):
             return False, None
 
         async def send_needs_stocking_alarm(self, z_score: Optional[float]):
-            logger.warning(f"ALERT: Not enough fish! z_score: {z_score}")
             payload = {
                 "z_score": f"{z_score if z_score else 'N/A'}",
                 "message": "Not enough fish - fishery needs stocking",
             }
+            notification = self.agent.alarms.raise_alarm(
+                Protocols.SEND_NEEDS_STOCKING_ALARM.value, payload
+            )
+            if notification is None:
+                logger.debug("Needs stocking alarm suppressed, z_score: %s", z_score)
+                return
+            await self.send_alarm(notification)
+
+        async def send_alarm(self, notification):
+            logger.warning(
+                "ALERT: Not enough fish! z_score: %s (%s, %s)",
+                notification.payload.get("z_score"),
+                notification.level,
+                notification.summary(),
+            )
             try:
                 msg = Message(
                     to=self.agent.owner_jid,
-                    body=json.dumps(payload),
                     metadata={
                         "performative": "request",
-                        "protocol": Protocols.SEND_NEEDS_STOCKING_ALARM.value,
+                        "protocol": notification.kind,
                         "language": "JSON",
-                        "reply-with": str(uuid()),
-                        "conversation-id": str(uuid()),
+                        "reply-with": new_id(),
+                        "conversation-id": new_id(),
                     },
                 )
+                pack_body(msg, notification.body())
                 await self.send(msg)
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"Exception while sending nedds stocking alarm. Reason: {e}"
-                )
+            except CodecError as e:
+                logger.error("Could not encode needs stocking alarm: %s", e)
 
     class RegisterFishDataBehaviour(CyclicBehaviour):
         """Handle fish data registration from fishermen (register_fish_data_request)"""
@@ -98,52 +261,123 @@ class FishCaretakerAgent(Agent):
         async def run(self):
             msg = await self.receive(timeout=30)
             if msg:
-                try:
-                    conversation_id = msg.metadata.get("conversation-id")
-                    in_reply_to = msg.metadata.get("reply-with")
-                    fish_data = json.loads(msg.body)
-                    species = fish_data.get("species", "Unknown")
-                    size = fish_data.get("size", "Unknown")
-                    mass = fish_data.get("mass", 0)
-                    time = fish_data.get("time", "")
-
-                    logger.info(
-                        f"[DEI] Received fish data registration from {msg.sender}: species={species}, size={size}, mass={mass}kg, time={time}"
-                    )
+                with HANDLER_SECONDS.time(
+                    self.agent.metrics_role, msg.metadata.get("protocol", "")
+                ):
+                    await self.handle(msg)
 
-                    # Process fish data (update fish stock estimates, etc.)
-                    # This is where you would update the fish stock database
-                    # For now, just log it
+        async def handle(self, msg):
+            try:
+                conversation_id = msg.metadata.get("conversation-id")
+                in_reply_to = msg.metadata.get("reply-with")
+                fish_data = unpack_body(msg)
+                species = fish_data.get("species", "Unknown")
+                size = fish_data.get("size", "Unknown")
+                mass = fish_data.get("mass", 0)
+                time = fish_data.get("time", "")
+
+                logger.info(
+                    "[DEI] Received fish data registration from %s: species=%s, size=%s, mass=%skg, time=%s",
+                    msg.sender,
+                    species,
+                    size,
+                    mass,
+                    time,
+                )
 
-                    # Register data in dict
-                    if msg.sender not in self.agent.fishes_taken.keys():
-                        self.agent.fishes_taken[msg.sender] = []
-                    self.agent.fishes_taken[msg.sender].append(fish_data)
+                # Register data in the catch registry, log only what changed
+                fisherman = str(msg.sender)
+                self.agent.register_catch(fisherman, fish_data)
+                catches = self.agent.catches
+                logger.info(
+                    "Catch registered: %s now has %s fishes, %s total %s, all species %s",
+                    fisherman,
+                    catches.fisher_count(fisherman),
+                    species,
+                    catches.species_count(species),
+                    catches.total.count,
+                )
 
-                    logger.info(f"Currently taken fishes: {self.agent.fishes_taken}")
+                # The catch stays registered; its event is retried until written
+                recorded = await self.agent.sync_ledger()
 
-                    # Send confirmation
-                    reply = msg.make_reply()
-                    reply.metadata["protocol"] = (
-                        Protocols.REGISTER_FISH_DATA_RESPONSE.value
-                    )
-                    reply.body = json.dumps(
+                # Send confirmation
+                reply = msg.make_reply()
+                reply.metadata["protocol"] = Protocols.REGISTER_FISH_DATA_RESPONSE.value
+                if recorded:
+                    pack_body(
+                        reply,
                         {
                             "status": "registered",
                             "message": "Fish data registered successfully.",
-                        }
+                        },
                     )
                     reply.metadata["performative"] = "agree"
-                    reply.metadata["language"] = "JSON"
-                    reply.metadata["reply-with"] = str(uuid())
-                    reply.metadata["in-reply-to"] = in_reply_to
-                    reply.metadata["conversation-id"] = conversation_id
+                else:
+                    pack_body(
+                        reply,
+                        {
+                            "status": "failed",
+                            "message": "Fish data could not be recorded.",
+                        },
+                    )
+                    reply.metadata["performative"] = "failure"
+                reply.metadata["language"] = "JSON"
+                reply.metadata["reply-with"] = new_id()
+                reply.metadata["in-reply-to"] = in_reply_to
+                reply.metadata["conversation-id"] = conversation_id
+
+                logger.debug("[DEI] Fish data registration confirmed")
 
-                    logger.debug("[DEI] Fish data registration confirmed")
+                await self.send(reply)
+            except CodecError:
+                logger.error("[DEI] Error parsing fish data from message")
 
-                    await self.send(reply)
-                except json.JSONDecodeError:
-                    logger.error("[DEI] Error parsing fish data from message")
+    class RegisterFishDataBatchBehaviour(CyclicBehaviour):
+        """Handle batched fish data registrations forwarded by the owner (register_fish_data_batch_request)"""
+
+        async def run(self):
+            msg = await self.receive(timeout=30)
+            if msg:
+                with HANDLER_SECONDS.time(
+                    self.agent.metrics_role, msg.metadata.get("protocol", "")
+                ):
+                    await self.handle(msg)
+
+        async def handle(self, msg):
+            try:
+                catches = unpack_body(msg).get("catches", [])
+            except (CodecError, AttributeError):
+                logger.error("[DEI] Error parsing fish data batch from message")
+                return
+
+            catches = [c for c in catches if isinstance(c, dict)]
+            for fish_data in catches:
+                fisherman = fish_data.pop("fisherman", str(msg.sender))
+                self.agent.register_catch(fisherman, fish_data)
+
+            logger.info(
+                "[DEI] Registered fish data batch from %s: %s fishes (%s in total)",
+                msg.sender,
+                len(catches),
+                len(self.agent.catches),
+            )
+
+            reply = msg.make_reply()
+            reply.metadata["protocol"] = (
+                Protocols.REGISTER_FISH_DATA_BATCH_RESPONSE.value
+            )
+            reply.metadata["language"] = "JSON"
+            reply.metadata["reply-with"] = new_id()
+            reply.metadata["in-reply-to"] = msg.metadata.get("reply-with")
+            reply.metadata["conversation-id"] = msg.metadata.get("conversation-id")
+            if await self.agent.sync_ledger():
+                reply.metadata["performative"] = "agree"
+                pack_body(reply, {"status": "registered", "registered": len(catches)})
+            else:
+                reply.metadata["performative"] = "failure"
+                pack_body(reply, {"status": "failed", "registered": 0})
+            await self.send(reply)
 
     ##TODO - add to some behaviour vvvv
     async def set_diversity_target_response(self):
@@ -183,7 +417,6 @@ class FishCaretakerAgent(Agent):
     #     # def check_fish_state(self):
     #     #     return sum(self.agent.camera_data)/len(self.agent.camera_data) > 10 and sum(self.agent.sonar_data)/len(self.agent.sonar_data) > 10
 
-
     # ========== Feeder ==========
 
     # class FeedingBehaviour(PeriodicBehaviour):
@@ -248,7 +481,6 @@ class FishCaretakerAgent(Agent):
     #         )
     #         await self.send(reply)
 
-
     class FeedingBehaviour(PeriodicBehaviour):
         """
         Realizuje obowiązki Feedera:
@@ -271,7 +503,10 @@ class FishCaretakerAgent(Agent):
 
         async def set_feeding_parameters_response(self):
             if self.agent.feeding_update_event.is_set():
-                logger.info(f"[Feeder] set_feeding_parameters_response: {self.agent.feeding_parameters}")
+                logger.info(
+                    "[Feeder] set_feeding_parameters_response: %s",
+                    self.agent.feeding_parameters,
+                )
                 self.agent.feeding_update_event.clear()
 
         async def feed(self):
@@ -286,7 +521,11 @@ class FishCaretakerAgent(Agent):
 
             eaten = min(portion, self.agent.food_supplies_kg)
             self.agent.food_supplies_kg -= eaten
-            logger.info(f"[Feeder] Feeding done: {eaten:.2f} kg. Supplies left: {self.agent.food_supplies_kg:.2f} kg")
+            logger.info(
+                "[Feeder] Feeding done: %.2f kg. Supplies left: %.2f kg",
+                eaten,
+                self.agent.food_supplies_kg,
+            )
 
         async def check_food_supplies(self):
             """git
@@ -306,19 +545,26 @@ class FishCaretakerAgent(Agent):
             """
             Zamawianie karmy (symulacja).
             """
-            logger.warning("[Feeder] Low stock -> ordering food... (simulation: email sent)")
+            logger.warning(
+                "[Feeder] Low stock -> ordering food... (simulation: email sent)"
+            )
             # symulacja czasu zamówienia/dostawy
-            await asyncio.sleep(1)
+            await self.agent.clock.sleep(1)
 
             self.agent.food_supplies_kg += float(self.agent.order_amount_kg)
             self.agent.order_food_need = False
 
-            logger.info(f"[Feeder] Food delivered: +{self.agent.order_amount_kg:.2f} kg. Supplies now: {self.agent.food_supplies_kg:.2f} kg")
-
+            logger.info(
+                "[Feeder] Food delivered: +%.2f kg. Supplies now: %.2f kg",
+                self.agent.order_amount_kg,
+                self.agent.food_supplies_kg,
+            )
 
     # ========== Setup ==========
 
     async def setup(self):
+        self.restore_state()
+        self.setup_snapshots()
         logger.info("Agent setup complete")
 
         await self.DEI_setup()
@@ -327,8 +573,11 @@ class FishCaretakerAgent(Agent):
 
     async def DEI_setup(self):
 
-        # Monitor fish state
-        self.add_behaviour(self.MonitorFishState())
+        # Monitor fish state, from the sensors or a recorded trace
+        if self.replay is not None:
+            self.add_behaviour(self.ReplayFishState())
+        else:
+            self.add_behaviour(self.MonitorFishState())
 
         # Check if needs restocking and raise an alarm
         self.add_behaviour(self.ManageRestocking())
@@ -344,6 +593,18 @@ class FishCaretakerAgent(Agent):
         register_fish_data_behaviour = self.RegisterFishDataBehaviour()
         self.add_behaviour(register_fish_data_behaviour, fish_data_template)
 
+        # Batched registrations forwarded by the owner
+        fish_data_batch_template = Template(
+            metadata={
+                "protocol": Protocols.REGISTER_FISH_DATA_BATCH_REQUEST.value,
+                "performative": "request",
+                "language": "JSON",
+            }
+        )
+        self.add_behaviour(
+            self.RegisterFishDataBatchBehaviour(), fish_data_batch_template
+        )
+
     # async def FishHealthManager_setup(self):
     #     fish_health_manager_behaviour = self.FishHealthManagerBehaviour()
 
@@ -359,6 +620,8 @@ class FishCaretakerAgent(Agent):
         # self.add_behaviour(self.HandleSetFeedingParametersRequestBehaviour(), feeder_req_template)
 
         # Karmienie cykliczne – okres bierzemy z parametrów (startowo 20s)
-        feeding_behaviour = self.FeedingBehaviour(period=int(self.feeding_parameters.get("interval_s", 20)))
+        feeding_behaviour = self.FeedingBehaviour(
+            period=int(self.feeding_parameters.get("interval_s", 20))
+        )
 
         self.add_behaviour(feeding_behaviour)
@@ -1,7 +1,4 @@
-import json
 import asyncio
-from uuid import uuid4 as uuid
-from datetime import datetime
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
 from spade.template import Template
@@ -9,7 +6,11 @@ from spade.message import Message
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
+from .clock import SYSTEM_CLOCK
+from .correlation import PendingRequests, new_id
 from .logger_config import get_logger
+from .message_codec import CodecError, pack_body, unpack_body
+from .metrics import MetricsAgentMixin
 from .protocols import Protocols
 
 # Rich console for UI (user-facing terminal)
@@ -19,19 +20,40 @@ console = Console()
 logger = get_logger("FisherAgent")
 
 
-class FisherAgent(Agent):
-    def __init__(self, jid, password, owner_jid, fish_caretaker_jid=None):
+class FisherAgent(MetricsAgentMixin, Agent):
+    # How long response handlers wait for a message before looping again
+    receive_timeout_s = 30.0
+
+    def __init__(self, jid, password, owner_jid, fish_caretaker_jid=None, clock=None):
         super().__init__(jid, password)
+        self.clock = clock or SYSTEM_CLOCK  # catch and exit times
         self.owner_jid = owner_jid
         self.fish_caretaker_jid = fish_caretaker_jid
         self.is_on_fishery = False
         self.fishes_caught = []
         self.pending_fish_catch = None  # Store caught fish waiting for permission
-        # Pending requests for async response handling
-        self.pending_take_fish_request = None  # Stores fish data while waiting
-        self.pending_fish_data_registration = None
-        self.pending_fish_size_registration = None
-        self.pending_exit_registration = False
+        # Outstanding requests by conversation-id, so many can be in flight at once
+        self.pending_requests = PendingRequests(default_timeout=30.0)
+
+    def track_request(self, msg: Message, data=None, timeout=None) -> asyncio.Future:
+        """
+        Register an outgoing request in the correlation table.
+
+        Returns:
+            asyncio.Future: resolves to the response message (None on timeout)
+        """
+        return self.pending_requests.register(
+            msg.metadata["conversation-id"],
+            msg.metadata["reply-with"],
+            protocol=msg.metadata.get("protocol", ""),
+            data=data,
+            timeout=timeout,
+        )
+
+    async def stop(self):
+        # Responses can no longer arrive, so no timeout timer may outlive the agent
+        self.pending_requests.cancel_all()
+        await super().stop()
 
     class UserInputBehaviour(CyclicBehaviour):
         """Handle user input to trigger actions"""
@@ -111,22 +133,24 @@ class FisherAgent(Agent):
             try:
                 msg = Message(
                     to=self.agent.owner_jid,
-                    body=json.dumps(payload),
                     metadata={
                         "performative": "query_if",
                         "protocol": Protocols.IF_CAN_ENTER_REQUEST.value,
                         "language": "JSON",
-                        "reply-with": str(uuid()),
-                        "conversation-id": str(uuid()),
+                        "reply-with": new_id(),
+                        "conversation-id": new_id(),
                     },
                 )
-                logger.debug(f"Sending entrance request to {self.agent.owner_jid}")
-                self.agent.pending_entrance_request = True
+                pack_body(msg, payload)
+                logger.debug("Sending entrance request to %s", self.agent.owner_jid)
+                response = self.agent.track_request(msg)
                 await self.send(msg)
                 console.print("[cyan]Request sent. Waiting for response...[/cyan]")
-            except json.JSONDecodeError as e:
+                return response
+            except CodecError as e:
                 logger.error(
-                    f"Failed to encode request_enter_fishery message payload. Reason: {e}"
+                    "Failed to encode request_enter_fishery message payload. Reason: %s",
+                    e,
                 )
 
         async def handle_take_fish(self):
@@ -147,7 +171,10 @@ class FisherAgent(Agent):
                 f"[green]Caught:[/green] {fish_species} (size: {fish_size}, mass: {estimated_mass}kg)"
             )
             logger.info(
-                f"Caught fish: {fish_species}, size: {fish_size}, mass: {estimated_mass}kg"
+                "Caught fish: %s, size: %s, mass: %skg",
+                fish_species,
+                fish_size,
+                estimated_mass,
             )
 
             # Store fish data for processing
@@ -218,37 +245,70 @@ class FisherAgent(Agent):
             try:
                 msg = Message(
                     to=self.agent.owner_jid,
-                    body=json.dumps(
-                        {
-                            "species": species,
-                            "size": size,
-                            "mass": mass,
-                        }
-                    ),
                     metadata={
                         "performative": "query_if",
                         "protocol": Protocols.IF_CAN_TAKE_FISH_REQUEST.value,
                         "language": "JSON",
-                        "reply-with": str(uuid()),
-                        "conversation-id": str(uuid()),
+                        "reply-with": new_id(),
+                        "conversation-id": new_id(),
+                    },
+                )
+                pack_body(
+                    msg,
+                    {
+                        "species": species,
+                        "size": size,
+                        "mass": mass,
                     },
                 )
                 logger.info(
-                    f"Requesting permission to take fish: {species} ({size}, {mass}kg)"
+                    "Requesting permission to take fish: %s (%s, %skg)",
+                    species,
+                    size,
+                    mass,
                 )
                 # Store pending request data
-                self.agent.pending_take_fish_request = {
-                    "species": species,
-                    "size": size,
-                    "mass": mass,
-                }
+                response = self.agent.track_request(
+                    msg, {"species": species, "size": size, "mass": mass}
+                )
                 await self.send(msg)
                 console.print(
                     "[cyan]Permission request sent. Waiting for response...[/cyan]"
                 )
-            except json.JSONDecodeError as e:
+                return response
+            except CodecError as e:
                 logger.error(
-                    f"Failed to encode request_teke_fish_ermission message payload. Reason: {e}"
+                    "Failed to encode request_teke_fish_ermission message payload. Reason: %s",
+                    e,
+                )
+
+        async def request_take_fish_batch(self, catches: list[dict]):
+            """
+            Request permission for several caught fishes in one message (asynchronous).
+
+            The owner answers with one allow/deny decision per fish and registers
+            the approved ones with the fish caretaker itself.
+            """
+            try:
+                msg = Message(
+                    to=self.agent.owner_jid,
+                    metadata={
+                        "performative": "query_if",
+                        "protocol": Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST.value,
+                        "language": "JSON",
+                        "reply-with": new_id(),
+                        "conversation-id": new_id(),
+                    },
+                )
+                pack_body(msg, {"catches": catches})
+                logger.info("Requesting permission to take %s fishes", len(catches))
+                response = self.agent.track_request(msg, catches)
+                await self.send(msg)
+                return response
+            except (CodecError, TypeError) as e:
+                logger.error(
+                    "Failed to encode request_take_fish_batch message payload. Reason: %s",
+                    e,
                 )
 
         async def register_fish_data(self, species: str, size: str, mass: float):
@@ -263,26 +323,28 @@ class FisherAgent(Agent):
                 "species": species,
                 "size": size,
                 "mass": mass,
-                "time": datetime.now().isoformat(),
+                "time": self.agent.clock.now().isoformat(),
             }
             try:
                 msg = Message(
                     to=self.agent.fish_caretaker_jid,
-                    body=json.dumps(fish_data),
                     metadata={
                         "performative": "request",
                         "protocol": Protocols.REGISTER_FISH_DATA_REQUEST.value,
                         "language": "JSON",
-                        "conversation-id": str(uuid()),
-                        "reply-with": str(uuid()),
+                        "conversation-id": new_id(),
+                        "reply-with": new_id(),
                     },
                 )
-                logger.info(f"Registering fish data: {species}")
-                self.agent.pending_fish_data_registration = fish_data
+                pack_body(msg, fish_data)
+                logger.info("Registering fish data: %s", species)
+                response = self.agent.track_request(msg, fish_data)
                 await self.send(msg)
-            except json.JSONDecodeError as e:
+                return response
+            except CodecError as e:
                 logger.error(
-                    f"Failed to encode register_fish_data message payload. Reason: {e}"
+                    "Failed to encode register_fish_data message payload. Reason: %s",
+                    e,
                 )
 
         async def register_exit(self):
@@ -290,41 +352,47 @@ class FisherAgent(Agent):
             try:
                 msg = Message(
                     to=self.agent.owner_jid,
-                    body=json.dumps(
-                        {
-                            "fisherman": str(self.agent.jid),
-                            "fishes_taken": len([f for f in self.agent.fishes_caught]),
-                            "exit_time": datetime.now().isoformat(),
-                        }
-                    ),
                     metadata={
                         "performative": "inform",
                         "protocol": Protocols.REGISTER_EXIT_REQUEST.value,
                         "language": "JSON",
-                        "conversation-id": str(uuid()),
-                        "reply-with": str(uuid()),
+                        "conversation-id": new_id(),
+                        "reply-with": new_id(),
                     },
                 )
-                self.agent.pending_exit_registration = True
+                pack_body(
+                    msg,
+                    {
+                        "fisherman": str(self.agent.jid),
+                        "fishes_taken": len([f for f in self.agent.fishes_caught]),
+                        "exit_time": self.agent.clock.now().isoformat(),
+                    },
+                )
+                response = self.agent.track_request(msg)
                 logger.info("Sending exit registration")
                 await self.send(msg)
                 # Exit registration uses 'inform' performative, acknowledgment handled separately
-            except json.JSONDecodeError as e:
+                return response
+            except CodecError as e:
                 logger.error(
-                    f"Failed to encode register_exit message payload. Reason: {e}"
+                    "Failed to encode register_exit message payload. Reason: %s", e
                 )
 
     class HandleIfCanEnterResponseBehaviour(CyclicBehaviour):
         """Handle responses to entrance requests asynchronously (if_can_enter_response, register_enter)"""
 
         async def run(self):
-            msg = await self.receive(timeout=30)
+            msg = await self.receive(timeout=self.agent.receive_timeout_s)
             if msg:
                 performative = msg.metadata.get("performative", "")
                 logger.info(
-                    f"Received entrance response: {performative} from {msg.sender}"
+                    "Received entrance response: %s from %s", performative, msg.sender
                 )
 
+                if self.agent.pending_requests.resolve(msg) is None:
+                    logger.warning("Entrance response to an unknown or expired request")
+                    return
+
                 if self.agent.is_on_fishery:
                     return
 
@@ -344,7 +412,10 @@ class FisherAgent(Agent):
                         console.print(
                             f"[yellow]\n Unknown response: {performative}[/yellow]"
                         )
-                        logger.warning(f"Unknown response performative: {performative}")
+                        logger.warning(
+                            "Unknown response performative: %s",
+                            performative,
+                        )
 
         def register_enter(self):
             self.agent.is_on_fishery = True
@@ -353,27 +424,32 @@ class FisherAgent(Agent):
         """Handle responses to take fish permission requests asynchronously"""
 
         async def run(self):
-            msg = await self.receive(timeout=30)
+            msg = await self.receive(timeout=self.agent.receive_timeout_s)
 
             if msg:
                 performative = msg.metadata.get("performative", "")
                 logger.info(
-                    f"Received take fish response: {performative} from {msg.sender}"
+                    "Received take fish response: %s from %s", performative, msg.sender
                 )
 
-                if self.agent.pending_take_fish_request:
-                    fish_data = self.agent.pending_take_fish_request
-                    self.agent.pending_take_fish_request = None
+                request = self.agent.pending_requests.resolve(msg)
+                if request is None:
+                    logger.warning(
+                        "Take fish response to an unknown or expired request"
+                    )
+                elif request.data:
+                    fish_data = request.data
 
                     if performative == "agree":
                         try:
-                            response_data = json.loads(msg.body)
+                            response_data = unpack_body(msg)
                             if response_data.get("permission") == "granted":
                                 console.print(
                                     "[bold green]✓ \nPermission granted to take fish.[/bold green]"
                                 )
                                 logger.info(
-                                    f"\nPermission granted to take fish: {fish_data['species']}"
+                                    "\nPermission granted to take fish: %s",
+                                    fish_data["species"],
                                 )
 
                                 # Register fish data with DEI
@@ -389,7 +465,7 @@ class FisherAgent(Agent):
                                 )
                             else:
                                 raise ValueError("Permission not granted")
-                        except (json.JSONDecodeError, ValueError, KeyError):
+                        except (CodecError, ValueError, KeyError):
                             console.print(
                                 "[bold green]✓ \nPermission granted to take fish.[/bold green]"
                             )
@@ -400,19 +476,23 @@ class FisherAgent(Agent):
                                 fish_data["mass"],
                             )
                             self.register_take_fish(fish_data)
-                    elif performative == "disconfirm":
+                    elif performative in ("refuse", "disconfirm"):
                         console.print(
                             "[bold red]✗ \nPermission denied to take fish.[/bold red]"
                         )
                         logger.info(
-                            f"Permission denied, releasing fish: {fish_data['species']}"
+                            "Permission denied, releasing fish: %s",
+                            fish_data["species"],
                         )
 
                     else:
                         console.print(
                             f"[yellow]\nUnknown response: {performative}[/yellow]"
                         )
-                        logger.warning(f"Unknown response performative: {performative}")
+                        logger.warning(
+                            "Unknown response performative: %s",
+                            performative,
+                        )
 
         def register_take_fish(self, fish_data: dict):
             self.agent.fishes_caught.append(
@@ -420,7 +500,7 @@ class FisherAgent(Agent):
                     "species": fish_data["species"],
                     "size": fish_data["size"],
                     "mass": fish_data["mass"],
-                    "time": datetime.now().isoformat(),
+                    "time": self.agent.clock.now().isoformat(),
                 }
             )
 
@@ -433,58 +513,95 @@ class FisherAgent(Agent):
                 "species": species,
                 "size": size,
                 "mass": mass,
-                "time": datetime.now().isoformat(),
+                "time": self.agent.clock.now().isoformat(),
             }
             try:
                 msg = Message(
                     to=self.agent.fish_caretaker_jid,
-                    body=json.dumps(fish_data),
                     metadata={
                         "performative": "request",
                         "protocol": Protocols.REGISTER_FISH_DATA_REQUEST.value,
                         "language": "JSON",
-                        "conversation-id": str(uuid()),
-                        "reply-with": str(uuid()),
+                        "conversation-id": new_id(),
+                        "reply-with": new_id(),
                     },
                 )
-                logger.info(f"Registering fish data: {species}")
-                self.agent.pending_fish_data_registration = fish_data
+                pack_body(msg, fish_data)
+                logger.info("Registering fish data: %s", species)
+                self.agent.track_request(msg, fish_data)
                 await self.send(msg)
-            except json.JSONDecodeError as e:
+            except CodecError as e:
                 logger.error(
-                    f"Failed to encode request_enter_fishery message payload. Reason: {e}"
+                    "Failed to encode request_enter_fishery message payload. Reason: %s",
+                    e,
+                )
+
+    class HandleTakeFishBatchResponseBehaviour(CyclicBehaviour):
+        """Handle responses to batched take fish permission requests asynchronously"""
+
+        async def run(self):
+            msg = await self.receive(timeout=self.agent.receive_timeout_s)
+            if msg:
+                request = self.agent.pending_requests.resolve(msg)
+                if request is None:
+                    logger.warning(
+                        "Take fish batch response for unknown conversation %s",
+                        msg.metadata.get("conversation-id"),
+                    )
+                    return
+                catches = request.data
+
+                try:
+                    decisions = unpack_body(msg).get("decisions", [])
+                except (CodecError, AttributeError):
+                    logger.error("Error parsing take fish batch response")
+                    return
+
+                granted = 0
+                for fish_data, allow in zip(catches, decisions):
+                    if allow:
+                        # Already registered with DEI by the owner
+                        self.agent.fishes_caught.append(
+                            {
+                                "species": fish_data["species"],
+                                "size": fish_data["size"],
+                                "mass": fish_data["mass"],
+                                "time": self.agent.clock.now().isoformat(),
+                            }
+                        )
+                        granted += 1
+                logger.info("Take fish batch: %s/%s granted", granted, len(catches))
+                console.print(
+                    f"[bold green]✓ \n{granted} of {len(catches)} fishes can be taken.[/bold green]"
                 )
 
     class HandleFishDataResponseBehaviour(CyclicBehaviour):
         """Handle responses to fish data registration asynchronously"""
 
         async def run(self):
-            msg = await self.receive(timeout=30)
+            msg = await self.receive(timeout=self.agent.receive_timeout_s)
             if msg:
                 performative = msg.metadata.get("performative", "")
-                if (
-                    performative == "agree"
-                    and self.agent.pending_fish_data_registration
-                ):
-                    logger.debug("Fish data registration confirmed")
-                    self.agent.pending_fish_data_registration = None
+                request = self.agent.pending_requests.resolve(msg)
+                if performative == "agree" and request is not None:
+                    logger.debug(
+                        "Fish data registration confirmed: %s", request.data["species"]
+                    )
 
     class HandleExitResponseBehaviour(CyclicBehaviour):
         """Handle responses to exit registration asynchronously"""
 
         async def run(self):
-            from .owner_agent import OwnerAgent
-
-            msg = await self.receive(timeout=30)
+            msg = await self.receive(timeout=self.agent.receive_timeout_s)
             if msg:
                 performative = msg.metadata.get("performative", "")
-                if performative == "inform" and self.agent.pending_exit_registration:
+                request = self.agent.pending_requests.resolve(msg)
+                if performative == "inform" and request is not None:
                     logger.debug("Exit registration acknowledged")
-                    self.agent.pending_exit_registration = False
 
     async def setup(self):
         fisherman_name = str(self.jid).split("@")[0]
-        logger.info(f"Agent {self.jid} starting")
+        logger.info("Agent %s starting", self.jid)
         console.print(
             Panel(
                 f"[bold green]Fisherman Agent[/bold green] [cyan]{fisherman_name}[/cyan] is ready!\n"
@@ -499,7 +616,10 @@ class FisherAgent(Agent):
         user_input_behaviour = self.UserInputBehaviour()
         self.add_behaviour(user_input_behaviour)
 
-        # --- Setup response handlers for asynchronous protocol responses
+        self.setup_response_handlers()
+
+    def setup_response_handlers(self):
+        """Setup response handlers for asynchronous protocol responses"""
 
         # Entrance response handler
         if_can_enter_response_template = Template(
@@ -523,6 +643,18 @@ class FisherAgent(Agent):
         take_fish_response_behaviour = self.HandleTakeFishResponseBehaviour()
         self.add_behaviour(take_fish_response_behaviour, take_fish_response_template)
 
+        # Batched take fish response handler
+        take_fish_batch_response_template = Template(
+            metadata={
+                "protocol": Protocols.IF_CAN_TAKE_FISH_BATCH_RESPONSE.value,
+                "language": "JSON",
+            }
+        )
+        self.add_behaviour(
+            self.HandleTakeFishBatchResponseBehaviour(),
+            take_fish_batch_response_template,
+        )
+
         # Fish data registration response handler
         fish_data_response_template = Template(
             metadata={
@@ -0,0 +1,264 @@
+"""
+Headless, scripted fishermen used to put load on the OwnerAgent.
+
+Each ScriptedFisherAgent follows a pre-generated plan (arrival time, catch
+times, stay duration) drawn from a seeded RNG, so the same seed always
+produces the same sequence of requests. The agents reuse the request methods
+of FisherAgent.UserInputBehaviour and never show the Rich menu.
+"""
+
+import asyncio
+import random
+from .fisher_agent import FisherAgent
+from .logger_config import get_logger
+
+logger = get_logger("FisherSwarm")
+
+# (species, size, mass in kg) of the fish a scripted fisherman can catch
+FISH_CATALOGUE = [
+    ("Carp", "S", 0.8),
+    ("Carp", "M", 1.5),
+    ("Carp", "L", 3.2),
+    ("Pike", "M", 2.1),
+    ("Pike", "L", 4.5),
+    ("Perch", "S", 0.3),
+    ("Bream", "M", 1.1),
+    ("Tench", "M", 1.4),
+]
+
+
+class FishermanPlan:
+    """Schedule of a single scripted fisherman. All times are in seconds."""
+
+    def __init__(self, index, arrival_s, stay_s, catch_times_s, catches):
+        self.index = index
+        self.arrival_s = arrival_s  # offset from the start of the swarm
+        self.stay_s = stay_s  # time spent in the fishery after admission
+        self.catch_times_s = catch_times_s  # offsets from admission
+        self.catches = catches  # (species, size, mass) for each catch time
+
+
+class SwarmSchedule:
+    """
+    Generates reproducible plans for a swarm of fishermen.
+
+    Arrivals form a Poisson process with rate `arrival_rate` (fishermen per
+    second). Each fisherman stays for an exponentially distributed time with
+    mean `mean_stay_s` and catches fish as a Poisson process whose rate is
+    drawn per fisherman from a gamma distribution with mean `catch_rate`
+    (catches per second) and coefficient of variation `catch_rate_spread`.
+    """
+
+    def __init__(
+        self,
+        fishers,
+        arrival_rate=1.0,
+        mean_stay_s=60.0,
+        catch_rate=0.05,
+        catch_rate_spread=0.5,
+        seed=42,
+    ):
+        self.fishers = fishers
+        self.arrival_rate = arrival_rate
+        self.mean_stay_s = mean_stay_s
+        self.catch_rate = catch_rate
+        self.catch_rate_spread = catch_rate_spread
+        self.seed = seed
+
+    def _fisher_catch_rate(self, rng):
+        if self.catch_rate_spread <= 0:
+            return self.catch_rate
+        shape = 1 / self.catch_rate_spread**2
+        return rng.gammavariate(shape, self.catch_rate / shape)
+
+    def plan(self) -> list[FishermanPlan]:
+        arrivals = random.Random(self.seed)
+        plans = []
+        arrival_s = 0.0
+        for index in range(1, self.fishers + 1):
+            arrival_s += arrivals.expovariate(self.arrival_rate)
+
+            # Independent stream per fisherman, so changing one fisherman's
+            # draws never shifts the plans of the others
+            rng = random.Random(self.seed * 1_000_003 + index)
+            stay_s = rng.expovariate(1 / self.mean_stay_s)
+            rate = self._fisher_catch_rate(rng)
+
+            catch_times_s = []
+            t = 0.0
+            while rate > 0:
+                t += rng.expovariate(rate)
+                if t >= stay_s:
+                    break
+                catch_times_s.append(t)
+            catches = [rng.choice(FISH_CATALOGUE) for _ in catch_times_s]
+
+            plans.append(
+                FishermanPlan(index, arrival_s, stay_s, catch_times_s, catches)
+            )
+        return plans
+
+
+class ScriptedFisherAgent(FisherAgent):
+    """FisherAgent driven by a FishermanPlan instead of console input"""
+
+    def __init__(
+        self,
+        jid,
+        password,
+        owner_jid,
+        plan: FishermanPlan,
+        fish_caretaker_jid=None,
+        start_time=None,
+        entrance_timeout_s=10.0,
+        entrance_retry_s=5.0,
+        max_entrance_attempts=3,
+        exit_timeout_s=10.0,
+        batch_size=1,
+        clock=None,
+    ):
+        super().__init__(jid, password, owner_jid, fish_caretaker_jid, clock)
+        self.plan = plan
+        self.start_time = start_time  # clock.monotonic() of the swarm start
+        self.entrance_timeout_s = entrance_timeout_s
+        self.entrance_retry_s = entrance_retry_s
+        self.max_entrance_attempts = max_entrance_attempts
+        # How long to wait for outstanding answers before stopping
+        self.exit_timeout_s = exit_timeout_s
+        # >1: ask for permission for `batch_size` catches at a time
+        self.batch_size = batch_size
+
+    class ScriptedFishingBehaviour(FisherAgent.UserInputBehaviour):
+        """Follow the agent's plan: enter, take fish, exit, then stop the agent"""
+
+        def match(self, message) -> bool:
+            # Responses go to the response behaviours, never to this one
+            return False
+
+        async def on_start(self):
+            pass
+
+        async def sleep_until(self, start, offset_s):
+            delay = start + offset_s - self.agent.clock.monotonic()
+            if delay > 0:
+                await self.agent.clock.sleep(delay)
+
+        @staticmethod
+        def agreed(response: asyncio.Future) -> bool:
+            msg = response.result()
+            return msg is not None and msg.metadata.get("performative") == "agree"
+
+        async def wait_for_agree(self, in_flight: set, timeout_s: float) -> bool:
+            """
+            Wait up to `timeout_s` for an agree to any of the in-flight
+            entrance requests, or until all of them have been answered.
+
+            Answered requests are removed from `in_flight`; a missing response
+            (timeout or undecodable reply) counts as a refusal.
+            """
+            deadline = self.agent.clock.monotonic() + timeout_s
+            while in_flight:
+                remaining = deadline - self.agent.clock.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    in_flight, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                in_flight -= done
+                if any(self.agreed(response) for response in done):
+                    return True
+            return False
+
+        async def enter(self) -> bool:
+            # Requests stay in flight after their attempt times out, so an
+            # agree arriving late still counts instead of holding a slot
+            in_flight = set()
+            for attempt in range(1, self.agent.max_entrance_attempts + 1):
+                response = await self.request_enter_fishery()
+                if response is not None:
+                    in_flight.add(response)
+                if await self.wait_for_agree(in_flight, self.agent.entrance_timeout_s):
+                    return True
+                if in_flight:
+                    logger.warning(
+                        "%s: no entrance response (attempt %s)",
+                        self.agent.jid,
+                        attempt,
+                    )
+                if attempt < self.agent.max_entrance_attempts:
+                    await self.agent.clock.sleep(self.agent.entrance_retry_s)
+
+            # Out of attempts: every request ends with a response or its
+            # correlation timeout, and a late admission is given back at once
+            if in_flight:
+                await asyncio.wait(in_flight)
+            if any(self.agreed(response) for response in in_flight):
+                logger.warning("%s: admitted after giving up, leaving", self.agent.jid)
+                await self.leave()
+            return False
+
+        async def leave(self):
+            """Register the exit and wait for the answers still outstanding"""
+            await self.register_exit()
+            self.agent.is_on_fishery = False
+            # Stopping the agent drops late responses, so wait for the exit
+            # acknowledgement and any fish data registrations first
+            if not await self.agent.pending_requests.wait_all(
+                self.agent.exit_timeout_s
+            ):
+                logger.warning(
+                    "%s: left with %s requests unanswered",
+                    self.agent.jid,
+                    len(self.agent.pending_requests),
+                )
+
+        async def run(self):
+            plan = self.agent.plan
+            start = self.agent.start_time
+            if start is None:
+                start = self.agent.clock.monotonic()
+            await self.sleep_until(start, plan.arrival_s)
+
+            if await self.enter():
+                entered = self.agent.clock.monotonic()
+                batch = []
+                responses = []  # requests stay in flight while the next fish is caught
+                for offset_s, (species, size, mass) in zip(
+                    plan.catch_times_s, plan.catches
+                ):
+                    await self.sleep_until(entered, offset_s)
+                    fish_data = {"species": species, "size": size, "mass": mass}
+                    if self.agent.batch_size > 1:
+                        batch.append(fish_data)
+                        if len(batch) >= self.agent.batch_size:
+                            responses.append(await self.request_take_fish_batch(batch))
+                            batch = []
+                        continue
+                    self.agent.pending_fish_catch = fish_data
+                    responses.append(
+                        await self.request_take_fish_permission(species, size, mass)
+                    )
+
+                if batch:
+                    responses.append(await self.request_take_fish_batch(batch))
+                await self.sleep_until(entered, plan.stay_s)
+                # Don't leave before every catch has been answered (or timed out)
+                await asyncio.gather(*(r for r in responses if r is not None))
+                await self.leave()
+                logger.info(
+                    "%s: left after %s catch attempts",
+                    self.agent.jid,
+                    len(plan.catches),
+                )
+            else:
+                logger.warning("%s: gave up entering the fishery", self.agent.jid)
+
+            self.kill()
+            await self.agent.stop()
+
+    async def setup(self):
+        logger.debug("Scripted agent %s starting", self.jid)
+        self.add_behaviour(self.ScriptedFishingBehaviour())
+        self.setup_response_handlers()
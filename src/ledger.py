@@ -0,0 +1,253 @@
+"""
+Durable event ledger for the state agents would otherwise only keep in memory.
+
+Admissions, exits, granted fish takes and catch registrations are appended to
+an SQLite table (WAL mode) as they happen, and OwnerAgent/FishCaretakerAgent
+rebuild their state from it on startup.
+
+Appending never touches the disk on the event loop: events go to a queue and
+a writer thread inserts everything that accumulated while the previous commit
+was running in one transaction (group commit), so a burst of N messages costs
+one disk sync instead of N. Handlers that promise something to a fisher await
+`committed()` before replying, which resolves once the event's batch is on
+disk. A batch that cannot be written is retried, in order, until it is; the
+waiters meanwhile get a LedgerError, so the handler can refuse and undo its
+change instead of promising something that is not on disk.
+
+One process owns a ledger file: sequence numbers are assigned in memory.
+"""
+
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+from .logger_config import get_logger
+
+logger = get_logger("Ledger")
+
+# Event kinds
+ADMIT = "admit"  # subject: fisher JID
+EXIT = "exit"  # subject: fisher JID
+TAKE = "take"  # data: {"count": granted fish takes}
+CATCH = "catch"  # subject: fisher JID, data: fish data
+RESET = "reset"  # start of a new fishing day: quotas start from zero
+
+
+class LedgerError(RuntimeError):
+    """Events could not be written to the ledger"""
+
+
+class LedgerEvent(NamedTuple):
+    seq: int
+    time: float
+    source: str  # JID of the agent that recorded the event
+    kind: str
+    subject: str
+    data: dict
+
+
+class EventLedger:
+    def __init__(
+        self,
+        path="data/ledger.sqlite",
+        max_batch: int = 1000,
+        clock: Callable[[], float] = time.time,
+        retry_delay_s: float = 0.1,
+        max_retry_delay_s: float = 5.0,
+    ):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_batch = max_batch
+        self.clock = clock  # event timestamps (a simulated clock's time in simulations)
+        # Backoff between attempts to write a failed batch (doubling up to the max)
+        self.retry_delay_s = retry_delay_s
+        self.max_retry_delay_s = max_retry_delay_s
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # FULL: every commit (= every batch) is synced to disk
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "seq INTEGER PRIMARY KEY, time REAL NOT NULL, source TEXT NOT NULL, "
+            "kind TEXT NOT NULL, subject TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS events_source ON events (source, seq)"
+        )
+        (last,) = self._db.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM events"
+        ).fetchone()
+
+        self._lock = threading.Lock()
+        self.last_seq = last  # last sequence number handed out
+        self.committed_seq = last  # last sequence number on disk
+        self.batches = 0
+        self._waiters: list[tuple[int, asyncio.Future]] = []
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closing = threading.Event()
+        self._thread = threading.Thread(
+            target=self._write_loop, name="EventLedgerWriter", daemon=True
+        )
+        self._thread.start()
+
+    def append(
+        self, source: str, kind: str, subject: str = "", data: Optional[dict] = None
+    ) -> int:
+        """
+        Queue an event for the next group commit. Never blocks.
+
+        Returns:
+            int: sequence number of the event
+        """
+        row = (self.clock(), source, kind, subject, json.dumps(data or {}))
+        with self._lock:
+            self.last_seq += 1
+            self._queue.put((self.last_seq, *row))
+            return self.last_seq
+
+    async def committed(self, seq: Optional[int] = None):
+        """
+        Wait until event `seq` (by default every event appended so far) is on disk.
+
+        Raises:
+            LedgerError: the batch holding the event (or an earlier one) could
+                not be written; it is retried, but nothing may be promised yet
+        """
+        if seq is None:
+            seq = self.last_seq
+        with self._lock:
+            if seq <= self.committed_seq:
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((seq, future))
+        await future
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            batch, markers, stop = [], [], False
+            # Everything that piled up during the previous commit goes into this one
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._commit(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+
+    def _write(self, batch) -> bool:
+        try:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO events (seq, time, source, kind, subject, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            self._db.execute("COMMIT")
+            return True
+        except sqlite3.Error as e:
+            logger.error("Could not write %d ledger events: %s", len(batch), e)
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            return False
+
+    def _commit(self, batch):
+        delay = self.retry_delay_s
+        # Later events are never written before this batch, so retry it until it is
+        while not self._write(batch):
+            error = LedgerError(
+                f"ledger events {batch[0][0]}-{batch[-1][0]} not written"
+            )
+            # Every waiter is behind this batch: none of them may promise anything
+            with self._lock:
+                failed, self._waiters = self._waiters, []
+            for _, future in failed:
+                future.get_loop().call_soon_threadsafe(_fail, future, error)
+            if self._closing.wait(delay):
+                logger.error(
+                    "Ledger closed, %d events (seq %d-%d) are lost",
+                    len(batch),
+                    batch[0][0],
+                    batch[-1][0],
+                )
+                return
+            delay = min(delay * 2, self.max_retry_delay_s)
+        self.batches += 1
+
+        with self._lock:
+            self.committed_seq = batch[-1][0]
+            ready = [f for seq, f in self._waiters if seq <= self.committed_seq]
+            self._waiters = [(s, f) for s, f in self._waiters if s > self.committed_seq]
+        for future in ready:
+            future.get_loop().call_soon_threadsafe(_release, future)
+
+    def flush(self):
+        """Block until every event appended so far is written"""
+        marker = threading.Event()
+        self._queue.put(marker)
+        marker.wait()
+
+    def events(
+        self,
+        source: Optional[str] = None,
+        kinds: Optional[Iterable[str]] = None,
+        after_seq: int = 0,
+    ) -> Iterator[LedgerEvent]:
+        """Recorded events in order, optionally only those of one agent / of some kinds"""
+        self.flush()
+        query = (
+            "SELECT seq, time, source, kind, subject, data FROM events WHERE seq > ?"
+        )
+        params: list = [after_seq]
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        if kinds is not None:
+            kinds = list(kinds)
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        query += " ORDER BY seq"
+        # Own connection, so reading never competes with the writer thread
+        db = sqlite3.connect(self.path) if self.path != ":memory:" else self._db
+        try:
+            for seq, time_, source_, kind, subject, data in db.execute(query, params):
+                yield LedgerEvent(seq, time_, source_, kind, subject, json.loads(data))
+        finally:
+            if db is not self._db:
+                db.close()
+
+    def close(self):
+        """Write pending events and stop the writer thread"""
+        if self._thread.is_alive():
+            self._closing.set()
+            self._queue.put(None)
+            self._thread.join()
+            self._db.close()
+
+
+def _release(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _fail(future: asyncio.Future, error: LedgerError):
+    if not future.done():
+        future.set_exception(error)
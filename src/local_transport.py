@@ -0,0 +1,108 @@
+"""
+In-process message transport for running the fishery without an XMPP server.
+
+Agents built with `local_agent_class` skip the XMPP connection entirely and
+exchange messages through a shared LocalMessageBus. Delivery still goes
+through `Agent.dispatch`, so behaviours receive messages exactly as before:
+each message is matched against the behaviour templates with the usual
+SPADE `Message`/`Template` semantics. Behaviour classes need no changes.
+
+Usage:
+    LocalOwnerAgent = local_agent_class(OwnerAgent)
+    owner = LocalOwnerAgent("owner@localhost", "", water_jid, fish_jid)
+"""
+
+from spade.behaviour import FSMBehaviour
+from spade.container import Container
+from spade.message import Message
+from .logger_config import get_logger
+
+logger = get_logger("LocalTransport")
+
+
+class LocalMessageBus:
+    """
+    Routes messages between agents registered in the SPADE container.
+
+    Used in place of the agent's container for sending. Every delivered
+    message is a copy, just like a message that went through the XMPP
+    server, so the receiver never shares state with the sender.
+    """
+
+    def __init__(self, container: Container = None):
+        self.container = container or Container()
+        self.delivered = 0
+        self.dropped = 0
+
+    def __getattr__(self, name):
+        # register(), loop, has_agent()... are served by the SPADE container
+        return getattr(self.container, name)
+
+    async def send(self, msg: Message, behaviour) -> None:
+        to = str(msg.to.bare) if msg.to else ""
+        if not self.container.has_agent(to):
+            self.dropped += 1
+            logger.warning("No local agent %s, message dropped: %s", to, msg.metadata)
+            return
+
+        agent = self.container.get_agent(to)
+        if not agent.is_alive():
+            self.dropped += 1
+            logger.debug("Local agent %s is stopped, message dropped", to)
+            return
+
+        copy = Message(
+            to=str(msg.to), sender=str(msg.sender), body=msg.body, thread=msg.thread
+        )
+        # Assigned directly: handlers may put None values (e.g. a missing
+        # in-reply-to) which the Message constructor would reject
+        copy.metadata = dict(msg.metadata)
+        agent.dispatch(copy)
+        self.delivered += 1
+
+
+bus = LocalMessageBus()
+
+
+class LocalTransportMixin:
+    """Agent mixin that replaces the XMPP client with the in-process LocalMessageBus"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_container(bus)
+
+    async def _async_start(self, auto_register: bool = True) -> None:
+        # Same sequence as spade.agent.Agent._async_start, minus the XMPP
+        # client, presence and connection
+        await self._hook_plugin_before_connection()
+        await self._hook_plugin_after_connection()
+
+        await self.setup()
+        self._alive.set()
+        for behaviour in self.behaviours:
+            if not behaviour.is_running:
+                behaviour.set_agent(self)
+                if issubclass(type(behaviour), FSMBehaviour):
+                    for _, state in behaviour.get_states().items():
+                        state.set_agent(self)
+                behaviour.start()
+        logger.debug("Local agent %s started", self.jid)
+
+    async def _async_stop(self) -> None:
+        for behaviour in self.behaviours:
+            behaviour.kill()
+        if self.web.is_started():
+            await self.web.runner.cleanup()
+        self._alive.clear()
+
+
+_local_classes = {}
+
+
+def local_agent_class(agent_class):
+    """Return a subclass of `agent_class` that uses the in-process transport"""
+    if agent_class not in _local_classes:
+        _local_classes[agent_class] = type(
+            f"Local{agent_class.__name__}", (LocalTransportMixin, agent_class), {}
+        )
+    return _local_classes[agent_class]
@@ -2,71 +2,172 @@
 Logging configuration for the fishery system.
 All system logs are written to logs/fishery_system.log
 User interface uses Rich library for beautiful terminal output.
+
+By default records go through a bounded queue to a background thread
+(QueueHandler/QueueListener), so formatting, disk writes and rotation never
+block the asyncio event loop. When the queue is full new records are dropped
+and counted (see `dropped_log_records`).
 """
+
+import atexit
+import copy
 import logging
 import os
+import queue
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+_listener = None
+
+# Log arguments of these types can be formatted later, on the listener thread
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records that do not fit are counted and dropped"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Tracebacks are resolved on the calling thread, their frames move on
+        if record.exc_info:
+            return super().prepare(record)
+        # A copy: other handlers of the logger must see the record unchanged
+        record = copy.copy(record)
+        # The listener thread does the %-formatting, unless an argument could
+        # change (or be unsafe to read) by the time it gets there
+        if record.args and not (
+            isinstance(record.args, tuple)
+            and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in record.args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def dropped_log_records() -> int:
+    """Number of log records dropped because the logging queue was full"""
+    handler = next(
+        (
+            h
+            for h in logging.getLogger("fishery_system").handlers
+            if isinstance(h, DroppingQueueHandler)
+        ),
+        None,
+    )
+    return handler.dropped if handler else 0
+
+
+def stop_logging():
+    """Flush queued records to disk and stop the background logging thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        dropped = dropped_log_records()
+        if dropped:
+            for handler in _listener.handlers:
+                handler.handle(
+                    logging.makeLogRecord(
+                        {
+                            "name": "fishery_system.Logging",
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": "%d log records were dropped (logging queue full)",
+                            "args": (dropped,),
+                        }
+                    )
+                )
+        _listener = None
+
 
+# Log arguments of these types can be formatted later, on the listener thread
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
 
-def setup_logging(log_dir="logs", log_file="fishery_system.log", level=logging.INFO):
+
+def setup_logging(
+    log_dir="logs",
+    log_file="fishery_system.log",
+    level=logging.INFO,
+    use_queue=True,
+    queue_size=10000,
+):
     """
     Setup logging configuration for the fishery system.
-    
+
     Args:
         log_dir: Directory to store log files
         log_file: Name of the log file
         level: Logging level (default: INFO)
-    
+        use_queue: Write the log file from a background thread (default: True)
+        queue_size: Records buffered for the background thread before dropping
+
     Returns:
         logger: Configured logger instance
     """
     # Create logs directory if it doesn't exist
     log_path = Path(log_dir)
     log_path.mkdir(exist_ok=True)
-    
+
     log_file_path = log_path / log_file
-    
+
     # Create logger
     logger = logging.getLogger("fishery_system")
     logger.setLevel(level)
-    
+
     # Remove existing handlers to avoid duplicates
+    stop_logging()
     logger.handlers.clear()
-    
+
     # Create formatter
     formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
     )
-    
+
     # File handler with rotation (max 10MB, keep 5 backups)
     file_handler = RotatingFileHandler(
         log_file_path,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5,
-        encoding='utf-8'
+        encoding="utf-8",
     )
     file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
-    
-    logger.addHandler(file_handler)
+
+    if use_queue:
+        global _listener
+        log_queue = queue.Queue(maxsize=queue_size)
+        _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        logger.addHandler(DroppingQueueHandler(log_queue))
+    else:
+        logger.addHandler(file_handler)
     logger.propagate = False
-    
+
     return logger
 
 
+atexit.register(stop_logging)
+
+
 def get_logger(name=None):
     """
     Get a logger instance for a specific agent or component.
-    
+
     Args:
         name: Name of the logger (usually agent class name)
-    
+
     Returns:
         logger: Logger instance
     """
     if name:
         return logging.getLogger(f"fishery_system.{name}")
     return logging.getLogger("fishery_system")
-
@@ -0,0 +1,345 @@
+"""
+Message body codecs.
+
+Every protocol in `Protocols` declares the schema of its payload in SCHEMAS.
+Bodies are JSON by default; with the "BIN" encoding the payload is packed
+with `struct` following the schema and base64-wrapped, so it still travels
+as an XMPP text body. The encoding is announced in the FIPA "encoding"
+metadata field (absent means JSON), while "language" keeps describing the
+content model, so existing templates keep matching and receivers decode
+whatever they get regardless of their own default.
+
+A payload the schema cannot represent exactly (unknown keys, wrong types)
+is sent as JSON instead. The outgoing encoding is JSON unless the
+MESSAGE_ENCODING environment variable (or `set_default_encoding`) says BIN.
+"""
+
+import base64
+import json
+import os
+import struct
+from array import array
+from typing import Optional
+from spade.message import Message
+from .protocols import Protocols
+
+JSON = "JSON"
+BIN = "BIN"
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+FISH = [("species", "str"), ("size", "str"), ("mass", "f64"), ("time", "str")]
+STATUS = [("status", "str"), ("message", "str")]
+# Added to every caretaker alarm by alarms.AlarmNotification
+ALARM = [
+    ("level", "str"),
+    ("occurrences", "i64"),
+    ("since", "str"),
+    ("suppressed", "i64"),
+    ("summary", "str"),
+]
+
+# Payload schemas: lists of (key, kind). A kind is "str", "f64", "i64",
+# "bool", ("list", kind) or ("struct", schema). Keys may be missing.
+SCHEMAS = {
+    Protocols.IF_CAN_ENTER_REQUEST: [("fisherman_data", ("struct", [("jid", "str")]))],
+    Protocols.IF_CAN_ENTER_RESPONSE: [("allow", "bool"), ("reason", "str")],
+    Protocols.IF_CAN_TAKE_FISH_REQUEST: FISH,
+    Protocols.IF_CAN_TAKE_FISH_RESPONSE: [
+        ("allow", "bool"),
+        ("message", "str"),
+        ("permission", "str"),
+    ],
+    Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST: [
+        ("catches", ("list", ("struct", FISH + [("fisherman", "str")])))
+    ],
+    Protocols.IF_CAN_TAKE_FISH_BATCH_RESPONSE: [
+        ("decisions", ("list", "bool")),
+        ("message", "str"),
+    ],
+    Protocols.REGISTER_EXIT_REQUEST: [
+        ("fisherman", "str"),
+        ("fishes_taken", "i64"),
+        ("exit_time", "str"),
+    ],
+    Protocols.REGISTER_EXIT_RESPONSE: STATUS,
+    Protocols.REGISTER_FISH_DATA_REQUEST: FISH,
+    Protocols.REGISTER_FISH_DATA_RESPONSE: STATUS,
+    Protocols.REGISTER_FISH_DATA_BATCH_REQUEST: [
+        ("catches", ("list", ("struct", FISH + [("fisherman", "str")])))
+    ],
+    Protocols.REGISTER_FISH_DATA_BATCH_RESPONSE: [
+        ("status", "str"),
+        ("registered", "i64"),
+    ],
+    Protocols.SEND_NEEDS_STOCKING_ALARM: [("z_score", "str"), ("message", "str")]
+    + ALARM,
+    Protocols.SEND_WATER_QUALITY_ALARM: [
+        ("z_score", "f64"),
+        (
+            "window",
+            (
+                "struct",
+                [
+                    ("size", "i64"),
+                    ("mean", "f64"),
+                    ("std_dev", "f64"),
+                    ("min", "f64"),
+                    ("max", "f64"),
+                ],
+            ),
+        ),
+        ("recent", ("list", "f64")),
+        ("sample_range", ("list", "i64")),
+    ]
+    + ALARM,
+    Protocols.WATER_QUALITY_WINDOW_REQUEST: [("last", "i64")],
+    Protocols.WATER_QUALITY_WINDOW_RESPONSE: [
+        ("first_index", "i64"),
+        ("ph_data", ("list", "f64")),
+    ],
+}
+
+
+class CodecError(ValueError):
+    """A body could not be encoded or decoded"""
+
+
+class JsonCodec:
+    name = JSON
+
+    def encode(self, payload) -> str:
+        try:
+            return json.dumps(payload)
+        except (TypeError, ValueError) as e:
+            raise CodecError(str(e)) from e
+
+    def decode(self, body: str):
+        if not body:
+            return {}
+        try:
+            return json.loads(body)
+        except json.JSONDecodeError as e:
+            raise CodecError(str(e)) from e
+
+
+class StructCodec:
+    """
+    Schema-driven binary codec.
+
+    A struct starts with a presence bitmask (one bit per schema key, None
+    counts as missing), followed by the present values in schema order.
+    Strings are u16 length-prefixed UTF-8, lists u32 count-prefixed; lists
+    of floats are packed as one contiguous array of doubles. The schema is
+    compiled once into pack/unpack closures.
+    """
+
+    name = BIN
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._pack, self._unpack = _compile(("struct", schema))
+
+    def encode(self, payload) -> str:
+        buf = bytearray()
+        try:
+            self._pack(buf, payload)
+        except (struct.error, OverflowError, UnicodeEncodeError) as e:
+            raise CodecError(str(e)) from e
+        return base64.b64encode(buf).decode("ascii")
+
+    def decode(self, body: str):
+        try:
+            data = base64.b64decode(body, validate=True)
+            value, offset = self._unpack(data, 0)
+        except (ValueError, struct.error, IndexError) as e:
+            raise CodecError(f"Malformed binary body: {e}") from e
+        if offset != len(data):
+            raise CodecError("Trailing bytes in binary body")
+        return value
+
+
+def _type_error(expected, value):
+    return CodecError(f"Expected {expected}, got {type(value).__name__}")
+
+
+def _compile(kind):
+    """Return (pack(buf, value), unpack(data, offset) -> (value, offset)) for `kind`"""
+    if kind == "str":
+
+        def pack(buf, value):
+            if type(value) is not str:
+                raise _type_error("str", value)
+            data = value.encode("utf-8")
+            buf += _U16.pack(len(data))
+            buf += data
+
+        def unpack(data, offset):
+            (length,) = _U16.unpack_from(data, offset)
+            end = offset + 2 + length
+            if end > len(data):
+                raise ValueError("string past end of body")
+            return data[offset + 2 : end].decode("utf-8"), end
+
+    elif kind in ("f64", "i64"):
+        packer = _F64 if kind == "f64" else _I64
+        allowed = (int, float) if kind == "f64" else (int,)
+
+        def pack(buf, value):
+            if type(value) is bool or not isinstance(value, allowed):
+                raise _type_error(kind, value)
+            buf += packer.pack(value)
+
+        def unpack(data, offset):
+            return packer.unpack_from(data, offset)[0], offset + 8
+
+    elif kind == "bool":
+
+        def pack(buf, value):
+            if type(value) is not bool:
+                raise _type_error("bool", value)
+            buf.append(value)
+
+        def unpack(data, offset):
+            return bool(data[offset]), offset + 1
+
+    elif kind[0] == "list" and kind[1] == "f64":
+
+        def pack(buf, value):
+            if not isinstance(value, (list, tuple)):
+                raise _type_error("list", value)
+            try:
+                values = array("d", value)
+            except TypeError as e:
+                raise CodecError(str(e)) from e
+            buf += _U32.pack(len(values))
+            buf += values.tobytes()
+
+        def unpack(data, offset):
+            (count,) = _U32.unpack_from(data, offset)
+            offset += 4
+            end = offset + 8 * count
+            if end > len(data):
+                raise ValueError("array past end of body")
+            values = array("d")
+            values.frombytes(data[offset:end])
+            return values.tolist(), end
+
+    elif kind[0] == "list":
+        pack_item, unpack_item = _compile(kind[1])
+
+        def pack(buf, value):
+            if not isinstance(value, (list, tuple)):
+                raise _type_error("list", value)
+            buf += _U32.pack(len(value))
+            for item in value:
+                pack_item(buf, item)
+
+        def unpack(data, offset):
+            (count,) = _U32.unpack_from(data, offset)
+            offset += 4
+            values = []
+            for _ in range(count):
+                item, offset = unpack_item(data, offset)
+                values.append(item)
+            return values, offset
+
+    else:
+        fields = [(key, *_compile(field_kind)) for key, field_kind in kind[1]]
+        keys = {key for key, *_ in fields}
+        mask_size = (len(fields) + 7) // 8
+
+        def pack(buf, value):
+            if type(value) is not dict:
+                raise _type_error("object", value)
+            if not keys.issuperset(value):
+                raise CodecError(f"Keys outside the schema: {set(value) - keys}")
+            mask = 0
+            start = len(buf)
+            buf += bytes(mask_size)
+            for bit, (key, pack_field, _) in enumerate(fields):
+                field = value.get(key)
+                if field is not None:
+                    mask |= 1 << bit
+                    pack_field(buf, field)
+            buf[start : start + mask_size] = mask.to_bytes(mask_size, "little")
+
+        def unpack(data, offset):
+            if offset + mask_size > len(data):
+                raise ValueError("struct past end of body")
+            mask = int.from_bytes(data[offset : offset + mask_size], "little")
+            offset += mask_size
+            value = {}
+            for bit, (key, _, unpack_field) in enumerate(fields):
+                if mask >> bit & 1:
+                    value[key], offset = unpack_field(data, offset)
+            return value, offset
+
+    return pack, unpack
+
+
+_JSON_CODEC = JsonCodec()
+CODECS = {protocol.value: StructCodec(schema) for protocol, schema in SCHEMAS.items()}
+
+# Every process picks its outgoing encoding from the environment
+default_encoding = os.environ.get("MESSAGE_ENCODING", JSON).upper()
+if default_encoding not in (JSON, BIN):
+    raise ValueError(f"Unknown MESSAGE_ENCODING: {default_encoding}")
+
+
+def set_default_encoding(encoding: str):
+    """Choose the encoding of outgoing bodies: "JSON" (default) or "BIN" """
+    global default_encoding
+    encoding = encoding.upper()
+    if encoding not in (JSON, BIN):
+        raise ValueError(f"Unknown message encoding: {encoding}")
+    default_encoding = encoding
+
+
+def encode_body(
+    protocol: str, payload, encoding: Optional[str] = None
+) -> tuple[str, str]:
+    """
+    Encode `payload` for `protocol`.
+
+    Returns:
+        tuple: (body, encoding actually used)
+    """
+    if (encoding or default_encoding) == BIN and protocol in CODECS:
+        try:
+            return CODECS[protocol].encode(payload), BIN
+        except CodecError:
+            pass  # not representable in the schema - JSON carries anything
+    return _JSON_CODEC.encode(payload), JSON
+
+
+def decode_body(protocol: str, body: str, encoding: Optional[str] = None):
+    if encoding in (None, JSON):
+        return _JSON_CODEC.decode(body)
+    if encoding != BIN or protocol not in CODECS:
+        raise CodecError(f"Cannot decode {protocol} body encoded as {encoding}")
+    return CODECS[protocol].decode(body)
+
+
+def pack_body(msg: Message, payload, encoding: Optional[str] = None):
+    """Set the body of `msg` (whose "protocol" metadata is already set) to `payload`"""
+    msg.body, used = encode_body(msg.metadata.get("protocol"), payload, encoding)
+    if used == JSON:
+        msg.metadata.pop("encoding", None)
+    else:
+        msg.metadata["encoding"] = used
+
+
+def unpack_body(msg: Message):
+    """
+    Decode the body of `msg`.
+
+    Raises:
+        CodecError: the body is malformed for its encoding
+    """
+    return decode_body(
+        msg.metadata.get("protocol"), msg.body, msg.metadata.get("encoding")
+    )
@@ -0,0 +1,401 @@
+"""
+Process-wide metrics registry shared by all agents.
+
+Counters and histograms are plain dict/list updates on the event loop thread,
+so instrumentation costs well under a microsecond per event and can stay on
+in production. Gauges are read from callbacks only when metrics are exported.
+
+Built-in metrics:
+    fishery_messages_in_total{agent,protocol}    messages dispatched to an agent
+    fishery_messages_out_total{agent,protocol}   messages sent by an agent
+    fishery_handler_seconds{agent,protocol}      handler latency histogram
+    fishery_admissions_total{result}             entrance decisions (allow/deny)
+    fishery_fish_takes_total{result}             take-fish decisions (granted/denied)
+    fishery_rate_limited_total{agent,protocol}   requests rejected by a per-fisher rate limit
+    fishery_mailbox_depth{agent}                 messages waiting in behaviour mailboxes
+    fishery_log_records_dropped                  log records lost to a full logging queue
+    + quota gauges registered by the OwnerAgent
+
+Export with `JsonLinesDumper` (periodic JSON lines) and `PrometheusServer`
+(text exposition format on 127.0.0.1), see `start_exporters`.
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Optional
+from spade.message import Message
+from .logger_config import dropped_log_records, get_logger
+
+logger = get_logger("Metrics")
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Gauge:
+    """Value set directly or read from a callback at export time"""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+        self.sources: dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+    def track(self, fn: Callable[[], float], *label_values):
+        self.sources[label_values] = fn
+
+    def samples(self):
+        values = dict(self.values)
+        for label_values, fn in list(self.sources.items()):
+            try:
+                values[label_values] = fn()
+            except Exception as e:  # a broken source must not break the export
+                logger.debug("Gauge %s%s failed: %s", self.name, label_values, e)
+        for label_values, value in values.items():
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help: str, labels: tuple = (), buckets=DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def samples(self):
+        for label_values, (counts, total, count) in self.values.items():
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": str(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+    TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+    def __init__(self):
+        self.metrics: dict[str, object] = {}
+
+    def _get_or_create(self, cls, name, help, labels, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, help, labels, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(
+                f"Metric {name} already registered as {type(metric).__name__}"
+            )
+        return metric
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self._get_or_create(Counter, name, help, tuple(labels))
+
+    def gauge(self, name, help, labels=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, tuple(labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, help, tuple(labels), buckets=buckets
+        )
+
+    def snapshot(self) -> dict:
+        """All current samples as a JSON-serialisable dict"""
+        return {
+            "timestamp": time.time(),
+            "metrics": [
+                {"name": name, "labels": labels, "value": value}
+                for metric in self.metrics.values()
+                for name, labels, value in metric.samples()
+            ],
+        }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {self.TYPES[type(metric)]}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ",".join(
+                        f'{key}="{_escape(value_)}"' for key, value_ in labels.items()
+                    )
+                    lines.append(f"{name}{{{rendered}}} {value}")
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+MESSAGES_IN = registry.counter(
+    "fishery_messages_in_total",
+    "Messages dispatched to an agent",
+    ("agent", "protocol"),
+)
+MESSAGES_OUT = registry.counter(
+    "fishery_messages_out_total", "Messages sent by an agent", ("agent", "protocol")
+)
+HANDLER_SECONDS = registry.histogram(
+    "fishery_handler_seconds", "Message handler latency", ("agent", "protocol")
+)
+ADMISSIONS = registry.counter(
+    "fishery_admissions_total", "Entrance decisions", ("result",)
+)
+FISH_TAKES = registry.counter(
+    "fishery_fish_takes_total", "Take-fish decisions", ("result",)
+)
+RATE_LIMITED = registry.counter(
+    "fishery_rate_limited_total",
+    "Requests rejected by a per-fisher rate limit",
+    ("agent", "protocol"),
+)
+ALARMS = registry.counter(
+    "fishery_alarms_total",
+    "Caretaker alarm occurrences, notified or suppressed",
+    ("alarm", "result"),
+)
+DISPATCH_OVERFLOW = registry.counter(
+    "fishery_dispatch_overflow_total",
+    "Messages whose dispatcher worker queue was full (refused or deferred)",
+    ("agent", "protocol", "result"),
+)
+MAILBOX_DEPTH = registry.gauge(
+    "fishery_mailbox_depth", "Messages waiting in behaviour mailboxes", ("agent",)
+)
+registry.gauge(
+    "fishery_log_records_dropped",
+    "Log records dropped because the logging queue was full",
+).track(dropped_log_records)
+
+# Live instrumented agents per role, read by the mailbox depth gauge
+_agents: dict[str, weakref.WeakSet] = {}
+
+
+def agent_role(agent) -> str:
+    """Metrics label of an agent: its class name without the transport prefix"""
+    name = type(agent).__name__
+    return name[len("Local") :] if name.startswith("Local") else name
+
+
+def _mailbox_depth(role) -> int:
+    return sum(
+        behaviour.mailbox_size()
+        for agent in list(_agents.get(role, ()))
+        for behaviour in agent.behaviours
+    )
+
+
+class MeteredContainer:
+    """Wraps an agent's container (or LocalMessageBus) to count outgoing messages"""
+
+    def __init__(self, container, role: str):
+        self.container = container
+        self.role = role
+
+    def __getattr__(self, name):
+        return getattr(self.container, name)
+
+    async def send(self, msg: Message, behaviour) -> None:
+        MESSAGES_OUT.inc(self.role, msg.metadata.get("protocol", ""))
+        await self.container.send(msg, behaviour)
+
+
+class MetricsAgentMixin:
+    """Agent mixin counting messages in/out and exposing its mailbox depth"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_role = agent_role(self)
+        self.set_container(self.container)
+        if self.metrics_role not in _agents:
+            _agents[self.metrics_role] = weakref.WeakSet()
+            role = self.metrics_role
+            MAILBOX_DEPTH.track(lambda: _mailbox_depth(role), role)
+        _agents[self.metrics_role].add(self)
+
+    def set_container(self, container) -> None:
+        # The local transport swaps the container after construction; keep
+        # the metering wrapper outermost either way
+        if isinstance(container, MeteredContainer):
+            container = container.container
+        super().set_container(MeteredContainer(container, agent_role(self)))
+
+    def dispatch(self, msg: Message):
+        MESSAGES_IN.inc(self.metrics_role, msg.metadata.get("protocol", ""))
+        return super().dispatch(msg)
+
+
+class JsonLinesDumper:
+    """Appends a registry snapshot to `path` every `interval_s` seconds"""
+
+    def __init__(
+        self, path, interval_s: float = 10.0, metrics: MetricsRegistry = registry
+    ):
+        self.path = path
+        self.interval_s = interval_s
+        self.metrics = metrics
+        self._task: Optional[asyncio.Task] = None
+
+    def _write(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            line = json.dumps(self.metrics.snapshot())
+            # File I/O off the event loop
+            await asyncio.to_thread(self._write, line)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+class PrometheusServer:
+    """Minimal HTTP endpoint serving GET /metrics in the Prometheus text format"""
+
+    def __init__(
+        self,
+        port: int = 9464,
+        host: str = "127.0.0.1",
+        metrics: MetricsRegistry = registry,
+    ):
+        self.host = host
+        self.port = port
+        self.metrics = metrics
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (
+                b"\r\n",
+                b"\n",
+                b"",
+            ):
+                pass  # headers are not needed
+            parts = request.decode("latin-1").split()
+            if (
+                len(parts) >= 2
+                and parts[0] == "GET"
+                and parts[1].split("?")[0] == "/metrics"
+            ):
+                status = "200 OK"
+                body = self.metrics.render_prometheus().encode("utf-8")
+            else:
+                status = "404 Not Found"
+                body = b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Prometheus metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def start_exporters(
+    port: Optional[int] = None, path: Optional[str] = None, interval_s: float = 10.0
+):
+    """
+    Start the exporters configured by arguments or the METRICS_PORT,
+    METRICS_FILE and METRICS_INTERVAL environment variables.
+
+    Returns:
+        list: started exporters (empty when metrics export is not configured)
+    """
+    port = port or int(os.environ.get("METRICS_PORT", "0"))
+    path = path or os.environ.get("METRICS_FILE")
+    interval_s = float(os.environ.get("METRICS_INTERVAL", interval_s))
+
+    exporters = []
+    if port:
+        server = PrometheusServer(port)
+        await server.start()
+        exporters.append(server)
+    if path:
+        dumper = JsonLinesDumper(path, interval_s)
+        dumper.start()
+        exporters.append(dumper)
+    return exporters
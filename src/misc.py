@@ -1,12 +1,8 @@
-from random import normalvariate
+from array import array
 import math
 from typing import Optional
 
 
-def get_random_data(mu: int, sigma: int):
-    return normalvariate(mu, sigma)  # mock normal distribution
-
-
 def calculate_z_score(data: list[float], n=10) -> Optional[float]:
     if len(data) < 2:
         return None
@@ -24,3 +20,93 @@ def calculate_z_score(data: list[float], n=10) -> Optional[float]:
         z_score = (recent_data[-1] - mean) / std_dev
 
     return z_score
+
+
+class RollingZScore:
+    """
+    Incremental z-score over the last `n` samples of a stream.
+
+    Keeps the window mean and the sum of squared deviations (M2) up to date
+    in O(1) per sample, so `z_score()` returns the same value as
+    `calculate_z_score(stream, n)` without rescanning the data.
+    The window is recomputed exactly once per full cycle (and whenever a large
+    outlier leaves it) to stop floating point drift from accumulating on
+    long-running streams.
+    """
+
+    def __init__(self, n: int = 10):
+        if n < 1:
+            raise ValueError("Window size must be at least 1.")
+        self.n = n
+        self._window = array("d", bytes(8 * n))
+        self._pos = 0
+        self.count = 0  # samples seen since creation
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return min(self.count, self.n)
+
+    def update(self, x: float) -> None:
+        """Add a new sample to the window (evicting the oldest one when full)."""
+        x = float(x)
+        n = self.n
+        pos = self._pos
+        if self.count < n:
+            # Welford's algorithm while the window is still filling up
+            size = self.count + 1
+            delta = x - self.mean
+            self.mean += delta / size
+            self._m2 += delta * (x - self.mean)
+        else:
+            old = self._window[pos]
+            old_mean = self.mean
+            old_m2 = self._m2
+            self.mean = old_mean + (x - old) / n
+            self._m2 += (x - old) * (x - self.mean + old - old_mean)
+            if self._m2 < old_m2 * 1e-6:
+                # Most of the spread just left the window - the downdate
+                # cancelled catastrophically, so recompute it exactly.
+                self._window[pos] = x
+                self._resync()
+        self._window[pos] = x
+        self.count += 1
+        pos += 1
+        if pos == n:
+            pos = 0
+            if self.count > n:
+                self._resync()
+        self._pos = pos
+
+    def _resync(self) -> None:
+        window = self._window
+        mean = sum(window) / self.n
+        self.mean = mean
+        self._m2 = sum((x - mean) ** 2 for x in window)
+
+    @property
+    def last(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        return self._window[self._pos - 1]
+
+    @property
+    def variance(self) -> float:
+        size = len(self)
+        if size == 0:
+            return 0.0
+        return max(self._m2, 0.0) / size
+
+    @property
+    def std_dev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def z_score(self) -> Optional[float]:
+        """Z-score of the latest sample, or None if fewer than two samples were seen."""
+        if self.count < 2:
+            return None
+
+        std_dev = self.std_dev
+        if std_dev == 0:
+            return 0.0
+        return (self.last - self.mean) / std_dev
@@ -1,10 +1,18 @@
-import json
 from spade.agent import Agent
-from spade.behaviour import CyclicBehaviour
+from spade.behaviour import CyclicBehaviour, OneShotBehaviour
+from spade.message import Message
 from spade.template import Template
 from .logger_config import get_logger
 from .protocols import Protocols
-from uuid import uuid4 as uuid
+from .dispatcher import ProtocolDispatcher
+from .clock import SYSTEM_CLOCK
+from .correlation import new_id
+from .ledger import ADMIT, EXIT, RESET, TAKE
+from .message_codec import JSON, CodecError, encode_body, pack_body, unpack_body
+from .metrics import ADMISSIONS, FISH_TAKES, MetricsAgentMixin, registry
+from .persistence import DurableStateMixin
+from .quota import RateLimiter, quota_window_start
+from datetime import datetime, time as dtime, timedelta
 
 import asyncio
 from rich.console import Console
@@ -80,10 +88,15 @@ class OwnerUserGUI(CyclicBehaviour, RichMenuBehaviourMixin):
         self._awaiting_stocking_answer = False
         console.print("[bold cyan]Enter action number:[/bold cyan] ", end="")
 
+    def match(self, message) -> bool:
+        # The console never reads the mailbox; all messages go to the dispatcher
+        return False
+
     def menu_items(self):
         return [
             ("1", "Show status"),
             ("2", "Show active fishermen list"),
+            ("4", "Fetch full pH history from water caretaker"),
             ("0", "Exit program"),
         ]
 
@@ -91,93 +104,88 @@ class OwnerUserGUI(CyclicBehaviour, RichMenuBehaviourMixin):
         loop = asyncio.get_running_loop()
 
         try:
-            # === 0) Jeśli czekamy na odpowiedź stocking, to NIE uruchamiamy nowego inputa ===
-            if self._awaiting_stocking_answer:
-                # czekamy aż ten sam future zwróci linię
-                if self._input_future is not None and self._input_future.done():
-                    ans = (self._input_future.result() or "").strip().lower()
-                    self._input_future = None
-                    self._awaiting_stocking_answer = False
-
-                    if ans in ("y", "yes", "n", "no"):
-                        console.print("[green][/green]")
-                        self.agent.recommend_stocking()
-                    else:
-                        console.print("[red]Restocking rejected[/red]")
-
-                    self.render_menu()
-                    console.print(
-                        "[bold cyan]Enter action number:[/bold cyan] ", end=""
-                    )
-                else:
-                    await asyncio.sleep(0.1)
-                return
-
-            # === 1) Najpierw sprawdź alarm ZANIM wystartujesz menu input ===
-            if self.agent.pending_stocking_prompt.is_set():
-                self.agent.pending_stocking_prompt.clear()
-
-                payload = self.agent.last_stocking_alarm or {}
-                console.print("\n")
-                console.print(
-                    Panel(
-                        f"[bold yellow]Fish stock low![/bold yellow]\n"
-                        f"{payload}\n\n"
-                        f"[bold]Do you want to restock? (y/n)[/bold]\n"
-                        f"[dim]Write answer and press Enter[/dim]",
-                        title="STOCKING DECISION",
-                        border_style="yellow",
-                    )
-                )
-
-                # jeśli menu input już działa, użyj go jako "odpowiedzi"
-                if self._input_future is None:
-                    self._input_future = loop.run_in_executor(
-                        None, lambda: console.input("> ")
-                    )
-
-                self._awaiting_stocking_answer = True
-                return
-
-            # === 2) Normalny tryb: uruchom input menu tylko jeśli nie ma ===
+            # One input line is read at a time; a stocking alarm that arrives
+            # while it is pending reuses it as the y/n answer
             if self._input_future is None:
+                prompt = "> " if self._awaiting_stocking_answer else ""
                 self._input_future = loop.run_in_executor(
-                    None, lambda: console.input("")
+                    None, lambda: console.input(prompt)
                 )
 
-            # jeśli user wpisał już wybór
-            if self._input_future.done():
-                choice = (self._input_future.result() or "").strip()
-                self._input_future = None
+            waiting = {self._input_future}
+            alarm = None
+            if not self._awaiting_stocking_answer:
+                alarm = asyncio.ensure_future(self.agent.pending_stocking_prompt.wait())
+                waiting.add(alarm)
 
-                if choice == "1":
-                    self.show_status()
-                elif choice == "2":
-                    self.show_fishermen()
-                elif choice == "3":
-                    self.agent.recommend_stocking()
-                    console.print(
-                        "[yellow]Stocking recommendation triggered (see logs).[/yellow]"
-                    )
-                elif choice == "0":
-                    console.print("[yellow]Exiting...[/yellow]")
-                    await self.agent.stop()
-                    self.kill()
-                    return
-                elif choice:
-                    console.print("[red]Invalid input. Please choose from menu.[/red]")
+            # Sleeps until the user enters a line or an alarm comes in
+            await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if alarm is not None and not alarm.done():
+                alarm.cancel()
 
+            if self._input_future.done():
+                line = (self._input_future.result() or "").strip()
+                self._input_future = None
+                if self._awaiting_stocking_answer:
+                    self._awaiting_stocking_answer = False
+                    self.handle_stocking_answer(line.lower())
+                else:
+                    await self.handle_choice(line)
+                    if self.is_killed():
+                        return
                 self.render_menu()
                 console.print("[bold cyan]Enter action number:[/bold cyan] ", end="")
-                return
-
-            await asyncio.sleep(0.1)
+            else:
+                self.agent.pending_stocking_prompt.clear()
+                self.show_stocking_prompt()
+                self._awaiting_stocking_answer = True
 
         except (EOFError, KeyboardInterrupt):
             console.print("\n[yellow]Exiting...[/yellow]")
             await self.agent.stop()
             self.kill()
 
+    async def handle_choice(self, choice):
+        if choice == "1":
+            self.show_status()
+        elif choice == "2":
+            self.show_fishermen()
+        elif choice == "3":
+            self.agent.recommend_stocking()
+            console.print(
+                "[yellow]Stocking recommendation triggered (see logs).[/yellow]"
+            )
+        elif choice == "4":
+            self.agent.request_water_quality_window()
+            console.print("[cyan]pH history requested...[/cyan]")
+        elif choice == "0":
+            console.print("[yellow]Exiting...[/yellow]")
+            await self.agent.stop()
+            self.kill()
+        elif choice:
+            console.print("[red]Invalid input. Please choose from menu.[/red]")
+
+    def handle_stocking_answer(self, ans):
+        if ans in ("y", "yes", "n", "no"):
+            console.print("[green][/green]")
+            self.agent.recommend_stocking()
+        else:
+            console.print("[red]Restocking rejected[/red]")
+
+    def show_stocking_prompt(self):
+        payload = self.agent.last_stocking_alarm or {}
+        console.print("\n")
+        console.print(
+            Panel(
+                f"[bold yellow]Fish stock low![/bold yellow]\n"
+                f"{payload}\n\n"
+                f"[bold]Do you want to restock? (y/n)[/bold]\n"
+                f"[dim]Write answer and press Enter[/dim]",
+                title="STOCKING DECISION",
+                border_style="yellow",
+            )
+        )
+
     def show_status(self):
         t = Table(title="Owner Status", show_header=True, header_style="bold magenta")
         t.add_column("Property", style="cyan")
@@ -185,17 +193,18 @@ class OwnerUserGUI(CyclicBehaviour, RichMenuBehaviourMixin):
 
         t.add_row(
             "Active fishermen",
-            f"{len(self.agent.active_fishermen)}/{self.agent.fisherman_limit}",
+            f"{self.agent.get_fisherman_count()}/{self.agent.fisherman_limit}",
         )
         t.add_row(
             "Fishes taken today",
-            f"{self.agent.fishes_taken_count}/{self.agent.fish_takes_limit}",
+            f"{self.agent.get_fishes_taken_count()}/{self.agent.fish_takes_limit}",
         )
 
         console.print(t)
 
     def show_fishermen(self):
-        if not self.agent.active_fishermen:
+        active_fishermen = self.agent.get_active_fishermen()
+        if not active_fishermen:
             console.print("[dim]No active fishermen.[/dim]")
             return
 
@@ -203,28 +212,94 @@ class OwnerUserGUI(CyclicBehaviour, RichMenuBehaviourMixin):
         t.add_column("#", style="cyan", width=3)
         t.add_column("JID", style="green")
 
-        for i, jid in enumerate(sorted(self.agent.active_fishermen), 1):
+        for i, jid in enumerate(sorted(active_fishermen), 1):
             t.add_row(str(i), jid)
 
         console.print(t)
 
 
-class OwnerAgent(Agent):
-
-    def __init__(self, jid, password, water_caretaker_jid, fish_caretaker_jid):
+class OwnerAgent(DurableStateMixin, MetricsAgentMixin, Agent):
+
+    # Fixed answers to rate-limited requests, encoded once: request protocol -> (response protocol, body)
+    RATE_LIMITED_REPLIES = {
+        request.value: (response.value, encode_body(response.value, payload, JSON)[0])
+        for request, response, payload in [
+            (
+                Protocols.IF_CAN_ENTER_REQUEST,
+                Protocols.IF_CAN_ENTER_RESPONSE,
+                {"allow": False, "reason": "Too many requests, try again later."},
+            ),
+            (
+                Protocols.IF_CAN_TAKE_FISH_REQUEST,
+                Protocols.IF_CAN_TAKE_FISH_RESPONSE,
+                {"allow": False, "message": "Too many requests, try again later."},
+            ),
+            (
+                Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST,
+                Protocols.IF_CAN_TAKE_FISH_BATCH_RESPONSE,
+                {"decisions": [], "message": "Too many requests, try again later."},
+            ),
+        ]
+    }
+
+    def __init__(
+        self,
+        jid,
+        password,
+        water_caretaker_jid,
+        fish_caretaker_jid,
+        gui=True,
+        capacity_store=None,
+        router_jid=None,
+        dispatcher_workers=8,
+        ledger=None,
+        snapshot_store=None,
+        snapshot_interval_s=60.0,
+        fisher_rate=5.0,
+        fisher_burst=20,
+        quota_reset_time=dtime(0, 0),
+        clock=None,
+    ):
         super().__init__(jid, password)
+        # Time source of quota windows, rate limits and timestamps (see clock)
+        self.clock = clock or SYSTEM_CLOCK
+
+        self.gui = gui  # False runs the owner headless (benchmarks, simulations)
+
+        # Sharded mode (see owner_sharding): admission state lives in a store
+        # shared by all replicas and requests arrive through the router
+        self.capacity_store = capacity_store
+        self.router_jid = router_jid
+
+        # Durable record of admissions, exits and fish takes (see ledger),
+        # snapshotted every `snapshot_interval_s` (see persistence)
+        self.ledger = ledger
+        self.snapshot_store = snapshot_store
+        self.snapshot_interval_s = snapshot_interval_s
+
+        # One behaviour reads every message and routes it by protocol
+        self.dispatcher = ProtocolDispatcher(
+            workers=dispatcher_workers, key=self.get_requester, on_busy=self.busy_reply
+        )
+        # Requests per second (and burst) one fisher may send; exits are never limited
+        self.rate_limiter = RateLimiter(fisher_rate, fisher_burst, self.clock.monotonic)
 
         self.water_caretaker_jid = water_caretaker_jid
         self.fish_caretaker_jid = fish_caretaker_jid
 
         # Track active fishermen by JID to prevent double-counting
-        self.active_fishermen = set()  # Set of JIDs currently in the fishery
+        # Set of JIDs currently in the fishery (admitted by this agent)
+        self.active_fishermen = set()
         self.fisherman_limit = 10  # Maximum number of fishermen
         self.fishes_taken_count = 0
         self.fish_takes_limit = 50  # Daily limit for fish takes
+        # Daily quotas restart at `quota_reset_time` (local time), see QuotaResetBehaviour
+        self.quota_reset_time = quota_reset_time
+        self.quota_window_start = quota_window_start(self.clock.now(), quota_reset_time)
 
         self.pending_stocking_prompt = asyncio.Event()
         self.last_stocking_alarm = None
+        self.last_water_quality_window = None  # full pH history fetched on demand
 
     def check_if_entrance_possible(self, fisherman_jid):
         """
@@ -249,12 +324,167 @@ class OwnerAgent(Agent):
 
     def check_if_can_take_fish(self):
         """Check if fisherman can take fish based on daily limit"""
-        return self.fishes_taken_count < self.fish_takes_limit
+        return self.get_fishes_taken_count() < self.fish_takes_limit
+
+    def admit_fisherman(self, fisherman_jid):
+        """
+        Check the entrance conditions and register the fisherman in one step.
+
+        Args:
+            fisherman_jid: JID of the fisherman requesting entrance
+
+        Returns:
+            tuple: (allowed: bool, reason: str)
+        """
+        if self.capacity_store is not None:
+            allow, reason = self.capacity_store.admit(
+                fisherman_jid, self.fisherman_limit, str(self.jid)
+            )
+        else:
+            allow, reason = self.check_if_entrance_possible(fisherman_jid)
+        if allow:
+            self.active_fishermen.add(fisherman_jid)
+            self.record(ADMIT, fisherman_jid)
+        ADMISSIONS.inc("allow" if allow else "deny")
+        return allow, reason
+
+    def release_fisherman(self, fisherman_jid):
+        """Remove fisherman from the fishery; False if they were not inside"""
+        if self.capacity_store is not None:
+            self.active_fishermen.discard(fisherman_jid)
+            released = self.capacity_store.release(fisherman_jid)
+        elif fisherman_jid in self.active_fishermen:
+            self.active_fishermen.remove(fisherman_jid)
+            released = True
+        else:
+            released = False
+        if released:
+            self.record(EXIT, fisherman_jid)
+        return released
+
+    def take_fish(self):
+        """Check the daily limit and count the fish take in one step"""
+        if self.capacity_store is not None:
+            granted = self.capacity_store.take_fish(self.fish_takes_limit) == 1
+        else:
+            granted = self.check_if_can_take_fish()
+        if granted:
+            self.fishes_taken_count += 1
+            self.record(TAKE, data={"count": 1})
+        FISH_TAKES.inc("granted" if granted else "denied")
+        return granted
+
+    def take_fish_batch(self, count):
+        """
+        Grant as many of `count` fish takes as the daily limit allows, atomically.
+
+        Returns:
+            list: allow/deny decision for each requested fish (granted ones first)
+        """
+        if self.capacity_store is not None:
+            granted = self.capacity_store.take_fish(self.fish_takes_limit, count)
+        else:
+            granted = max(
+                0, min(count, self.fish_takes_limit - self.fishes_taken_count)
+            )
+        self.fishes_taken_count += granted
+        if granted:
+            self.record(TAKE, data={"count": granted})
+        FISH_TAKES.inc("granted", amount=granted)
+        FISH_TAKES.inc("denied", amount=count - granted)
+        return [True] * granted + [False] * (count - granted)
+
+    def return_fish(self, count):
+        """Give back `count` granted fish takes, e.g. when they could not be recorded"""
+        if self.capacity_store is not None:
+            self.capacity_store.return_fish(count)
+        self.fishes_taken_count -= count
+        self.record(TAKE, data={"count": -count})
 
     def get_fisherman_count(self):
         """Get current number of active fishermen"""
+        if self.capacity_store is not None:
+            return self.capacity_store.active_count()
         return len(self.active_fishermen)
 
+    def get_active_fishermen(self):
+        """Get JIDs of all active fishermen (across replicas in sharded mode)"""
+        if self.capacity_store is not None:
+            return self.capacity_store.active_fishermen()
+        return set(self.active_fishermen)
+
+    def get_fishes_taken_count(self):
+        """Get number of fishes taken today (across replicas in sharded mode)"""
+        if self.capacity_store is not None:
+            return self.capacity_store.fishes_taken()
+        return self.fishes_taken_count
+
+    def reset_daily_quota(self, window_start: datetime):
+        """Start a new daily quota window: fish takes count from zero again"""
+        self.quota_window_start = window_start
+        self.fishes_taken_count = 0
+        if self.capacity_store is not None:
+            self.capacity_store.start_quota_window(window_start.timestamp())
+        self.record(RESET, data={"window_start": window_start.timestamp()})
+        logger.info("Daily quota reset, new window from %s", window_start)
+
+    def apply_event(self, event):
+        """Replay one ledger event recorded by this agent"""
+        if event.kind == ADMIT:
+            self.active_fishermen.add(event.subject)
+        elif event.kind == EXIT:
+            self.active_fishermen.discard(event.subject)
+        elif event.kind == TAKE:
+            # Takes of an earlier day (e.g. the agent was down at the reset) don't count
+            if event.time >= self.quota_window_start.timestamp():
+                self.fishes_taken_count += event.data.get("count", 0)
+        elif event.kind == RESET:
+            self.fishes_taken_count = 0
+
+    def snapshot_state(self):
+        return {
+            "active_fishermen": sorted(self.active_fishermen),
+            "fishes_taken_count": self.fishes_taken_count,
+            "quota_window_start": self.quota_window_start.timestamp(),
+        }
+
+    def load_state(self, state):
+        self.active_fishermen = set(state["active_fishermen"])
+        if state.get("quota_window_start", 0) >= self.quota_window_start.timestamp():
+            self.fishes_taken_count = state["fishes_taken_count"]
+
+    def get_requester(self, msg):
+        """JID of the fisherman behind a request, also when it was forwarded by the router"""
+        if self.router_jid and str(msg.sender.bare) == str(self.router_jid):
+            return msg.metadata.get("on-behalf-of", str(msg.sender))
+        return str(msg.sender)
+
+    def make_reply(self, msg):
+        """msg.make_reply() addressed to the requesting fisherman"""
+        reply = msg.make_reply()
+        reply.to = self.get_requester(msg)
+        return reply
+
+    def rate_limited_reply(self, msg):
+        """Refusal for a request over the fisher's rate limit, built without decoding it"""
+        protocol, body = self.RATE_LIMITED_REPLIES[msg.metadata.get("protocol")]
+        reply = self.make_reply(msg)
+        reply.metadata.pop("encoding", None)
+        reply.metadata["protocol"] = protocol
+        reply.metadata["performative"] = "refuse"
+        reply.metadata["language"] = "JSON"
+        reply.metadata["reply-with"] = new_id()
+        reply.metadata["in-reply-to"] = msg.metadata.get("reply-with")
+        reply.metadata["conversation-id"] = msg.metadata.get("conversation-id")
+        reply.body = body
+        return reply
+
+    def busy_reply(self, msg):
+        """Refusal for a request whose dispatcher worker is backed up (None if it cannot be refused)"""
+        if msg.metadata.get("protocol") not in self.RATE_LIMITED_REPLIES:
+            return None
+        return self.rate_limited_reply(msg)
+
     def recommend_stocking(self):
         """Recommend stocking for end user"""
         logger.info("Restocking needed")
@@ -270,7 +500,16 @@ class OwnerAgent(Agent):
             },
         )
         b = self.ReceiveNeedsStockingAlarmBehaviour()
-        self.add_behaviour(b, t)
+        self.dispatcher.route(Protocols.SEND_NEEDS_STOCKING_ALARM, b, t)
+
+    def request_water_quality_window(self, last=None):
+        """
+        Ask the water caretaker for its retained pH history.
+
+        Water quality alarms only carry a bounded summary; this fetches the
+        full window (or the last `last` samples) in a separate request.
+        """
+        self.add_behaviour(self.RequestWaterQualityWindowBehaviour(last))
 
     def register_stocking(self):
         # @TODO Add this to owner GUI
@@ -279,189 +518,440 @@ class OwnerAgent(Agent):
     class ReceiveNeedsStockingAlarmBehaviour(CyclicBehaviour):
         async def run(self):
             msg = await self.receive(timeout=30)
-            if not msg:
-                return
+            if msg:
+                await self.handle(msg)
 
-            logger.warning(f"NEEDS STOCKING alarm received: {msg.body}")
+        async def handle(self, msg):
+            logger.warning("NEEDS STOCKING alarm received: %s", msg.body)
 
             # zapisz payload (jeśli JSON – można sparsować)
             try:
-                self.agent.last_stocking_alarm = (
-                    json.loads(msg.body) if msg.body else {}
-                )
+                self.agent.last_stocking_alarm = unpack_body(msg)
             except Exception:
                 self.agent.last_stocking_alarm = {"raw": msg.body}
 
             # ustaw flagę dla GUI
             self.agent.pending_stocking_prompt.set()
 
+    class QuotaResetBehaviour(CyclicBehaviour):
+        """Resets the daily quotas at the start of every quota window"""
+
+        def match(self, message) -> bool:
+            # Only sleeps; without this every message would pile up in its mailbox
+            return False
+
+        async def run(self):
+            next_reset = self.agent.quota_window_start + timedelta(days=1)
+            await self.agent.clock.sleep_until(next_reset.timestamp())
+            # After a suspend, skip straight to the current window
+            current = quota_window_start(
+                self.agent.clock.now(), self.agent.quota_reset_time
+            )
+            self.agent.reset_daily_quota(max(next_reset, current))
+
     class HandleIfCanEnterRequestBehaviour(CyclicBehaviour):
         async def run(self):
             msg = await self.receive(timeout=30)
             if msg:
-                conversation_id = msg.metadata.get("conversation-id")
-                in_reply_to = msg.metadata.get("reply-with")
-                fisherman_jid = str(msg.sender)
+                await self.handle(msg)
 
-                logger.info(
-                    f"Received entrance request from {fisherman_jid}: '{msg.body}'"
-                )
+        async def handle(self, msg):
+            conversation_id = msg.metadata.get("conversation-id")
+            in_reply_to = msg.metadata.get("reply-with")
+            fisherman_jid = self.agent.get_requester(msg)
 
-                allow, reason = self.agent.check_if_entrance_possible(fisherman_jid)
+            logger.info(
+                "Received entrance request from %s: '%s'", fisherman_jid, msg.body
+            )
 
-                reply = msg.make_reply()
-                reply.metadata["protocol"] = Protocols.IF_CAN_ENTER_RESPONSE.value
-                reply.metadata["language"] = "JSON"
-                reply.metadata["in-reply-to"] = in_reply_to
-                reply.metadata["conversation-id"] = conversation_id
-                reply.metadata["reply-with"] = str(uuid())
+            allow, reason = self.agent.admit_fisherman(fisherman_jid)
+            if not await self.agent.sync_ledger() and allow:
+                # Never promise an admission that is not on disk
+                self.agent.release_fisherman(fisherman_jid)
+                allow, reason = False, "Entrance could not be recorded, try again."
 
-                try:
-                    if allow:
-                        # Add fisherman to active set
-                        self.agent.active_fishermen.add(fisherman_jid)
-                        reply.body = json.dumps({"allow": True, "reason": ""})
-                        reply.metadata["performative"] = "agree"
-                        logger.info(
-                            f"Sending entrance approval to {fisherman_jid}. Current fishermen: {self.agent.get_fisherman_count()}/{self.agent.fisherman_limit}"
-                        )
-                    else:
-                        reply.body = json.dumps({"allow": False, "reason": reason})
-                        reply.metadata["performative"] = "refuse"
+            reply = self.agent.make_reply(msg)
+            reply.metadata["protocol"] = Protocols.IF_CAN_ENTER_RESPONSE.value
+            reply.metadata["language"] = "JSON"
+            reply.metadata["in-reply-to"] = in_reply_to
+            reply.metadata["conversation-id"] = conversation_id
+            reply.metadata["reply-with"] = new_id()
 
-                        logger.warning(
-                            f"Sending entrance denial to {fisherman_jid}. Reason: {reason}. Current: {self.agent.get_fisherman_count()}/{self.agent.fisherman_limit}"
-                        )
-                    await self.send(reply)
-                except json.JSONDecodeError as e:
-                    logger.error(
-                        f"Exception while sending if_can_enter response message. Reason: {e}"
+            try:
+                if allow:
+                    pack_body(reply, {"allow": True, "reason": ""})
+                    reply.metadata["performative"] = "agree"
+                    logger.info(
+                        "Sending entrance approval to %s. Current fishermen: %s/%s",
+                        fisherman_jid,
+                        self.agent.get_fisherman_count(),
+                        self.agent.fisherman_limit,
+                    )
+                else:
+                    pack_body(reply, {"allow": False, "reason": reason})
+                    reply.metadata["performative"] = "refuse"
+
+                    logger.warning(
+                        "Sending entrance denial to %s. Reason: %s. Current: %s/%s",
+                        fisherman_jid,
+                        reason,
+                        self.agent.get_fisherman_count(),
+                        self.agent.fisherman_limit,
                     )
+                await self.send(reply)
+            except CodecError as e:
+                logger.error(
+                    "Exception while sending if_can_enter response message. Reason: %s",
+                    e,
+                )
 
     class HandleIfCanTakeFishBehaviour(CyclicBehaviour):
-        """Handle requests for permission to take fish (if_can_take_fish_request)"""
+        """Handle requests for permission to take fish (if_can_take_fish_request and its batch variant)"""
 
         async def run(self):
             msg = await self.receive(timeout=30)
             if msg:
+                await self.handle(msg)
+
+        async def handle(self, msg):
+            if (
+                msg.metadata.get("protocol")
+                == Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST.value
+            ):
+                await self.handle_batch(msg)
+            else:
                 try:
                     in_reply_to = msg.metadata.get("reply-with")
                     conversation_id = msg.metadata.get("conversation-id")
-                    fish_data = json.loads(msg.body)
+                    fish_data = unpack_body(msg)
                     species = fish_data.get("species", "Unknown")
                     size = fish_data.get("size", "Unknown")
                     mass = fish_data.get("mass", 0)
 
                     logger.info(
-                        f"Received take fish permission request from {msg.sender}: {species} ({size}, {mass}kg)"
+                        "Received take fish permission request from %s: %s (%s, %skg)",
+                        self.agent.get_requester(msg),
+                        species,
+                        size,
+                        mass,
                     )
 
-                    can_take = self.agent.check_if_can_take_fish()
+                    can_take = self.agent.take_fish()
+                    recorded = await self.agent.sync_ledger()
+                    if can_take and not recorded:
+                        # Never promise a fish take that is not on disk
+                        self.agent.return_fish(1)
+                        can_take = False
 
-                    reply = msg.make_reply()
+                    reply = self.agent.make_reply(msg)
                     reply.metadata["protocol"] = (
                         Protocols.IF_CAN_TAKE_FISH_RESPONSE.value
                     )
                     reply.metadata["language"] = "JSON"
-                    reply.metadata["reply-with"] = str(uuid())
+                    reply.metadata["reply-with"] = new_id()
                     reply.metadata["conversation-id"] = conversation_id
                     reply.metadata["in-reply-to"] = in_reply_to
 
                     if can_take:
-                        reply.body = json.dumps(
+                        pack_body(
+                            reply,
                             {
                                 "allow": True,
                                 "message": "You can take this fish.",
-                            }
+                            },
                         )
                         reply.metadata["performative"] = "agree"
-                        self.agent.fishes_taken_count += 1
                         logger.info(
-                            f"Permission granted. Fishes taken today: {self.agent.fishes_taken_count}/{self.agent.fish_takes_limit}"
+                            "Permission granted. Fishes taken today: %s/%s",
+                            self.agent.get_fishes_taken_count(),
+                            self.agent.fish_takes_limit,
                         )
                     else:
-                        reply.body = json.dumps(
-                            {
-                                "allow": False,
-                                "message": "Daily fish take limit exceeded.",
-                            }
+                        message = (
+                            "Daily fish take limit exceeded."
+                            if recorded
+                            else "Fish take could not be recorded, try again."
                         )
+                        pack_body(reply, {"allow": False, "message": message})
                         reply.metadata["performative"] = "refuse"
                         logger.warning(
-                            f"Permission denied. Daily limit reached: {self.agent.fishes_taken_count}/{self.agent.fish_takes_limit}"
+                            "Permission denied: %s Fishes taken today: %s/%s",
+                            message,
+                            self.agent.get_fishes_taken_count(),
+                            self.agent.fish_takes_limit,
                         )
 
                     await self.send(reply)
-                except json.JSONDecodeError:
+                except CodecError:
                     logger.error("Error parsing fish data from message")
 
+        async def handle_batch(self, msg):
+            """
+            Decide on N catches at once and forward the approved ones to the
+            fish caretaker in a single batched registration.
+            """
+            try:
+                catches = unpack_body(msg).get("catches", [])
+            except (CodecError, AttributeError):
+                logger.error("Error parsing fish batch from message")
+                return
+
+            requester = self.agent.get_requester(msg)
+            decisions = self.agent.take_fish_batch(len(catches))
+            granted = sum(decisions)
+            if not await self.agent.sync_ledger() and granted:
+                # Never promise fish takes that are not on disk
+                self.agent.return_fish(granted)
+                decisions, granted = [False] * len(catches), 0
+            logger.info(
+                "Take fish batch from %s: %s/%s granted. Fishes taken today: %s/%s",
+                requester,
+                granted,
+                len(catches),
+                self.agent.get_fishes_taken_count(),
+                self.agent.fish_takes_limit,
+            )
+
+            reply = self.agent.make_reply(msg)
+            reply.metadata["protocol"] = Protocols.IF_CAN_TAKE_FISH_BATCH_RESPONSE.value
+            reply.metadata["language"] = "JSON"
+            reply.metadata["reply-with"] = new_id()
+            reply.metadata["conversation-id"] = msg.metadata.get("conversation-id")
+            reply.metadata["in-reply-to"] = msg.metadata.get("reply-with")
+            reply.metadata["performative"] = "agree" if granted else "refuse"
+            pack_body(
+                reply,
+                {
+                    "decisions": decisions,
+                    "message": f"{granted} of {len(catches)} fish can be taken.",
+                },
+            )
+            await self.send(reply)
+
+            if granted and self.agent.fish_caretaker_jid:
+                # A gateway may send catches of many fishermen in one batch
+                now = self.agent.clock.now().isoformat()
+                approved = [
+                    {
+                        "fisherman": catch.get("fisherman", requester),
+                        "species": catch.get("species", "Unknown"),
+                        "size": catch.get("size", "Unknown"),
+                        "mass": catch.get("mass", 0),
+                        "time": catch.get("time", now),
+                    }
+                    for catch, allow in zip(catches, decisions)
+                    if allow
+                ]
+                registration = Message(
+                    to=self.agent.fish_caretaker_jid,
+                    metadata={
+                        "performative": "request",
+                        "protocol": Protocols.REGISTER_FISH_DATA_BATCH_REQUEST.value,
+                        "language": "JSON",
+                        "reply-with": new_id(),
+                        "conversation-id": msg.metadata.get("conversation-id")
+                        or new_id(),
+                    },
+                )
+                pack_body(registration, {"catches": approved})
+                await self.send(registration)
+
+    class HandleFishDataBatchResponseBehaviour(CyclicBehaviour):
+        """Handle fish caretaker confirmations of batched fish data registrations"""
+
+        async def run(self):
+            msg = await self.receive(timeout=30)
+            if msg:
+                await self.handle(msg)
+
+        async def handle(self, msg):
+            logger.debug("Fish data batch registration confirmed: %s", msg.body)
+
     class HandleExitRegistrationBehaviour(CyclicBehaviour):
         """Handle exit registration from fishermen (register_exit_request)"""
 
         async def run(self):
             msg = await self.receive(timeout=30)
             if msg:
-                try:
-                    in_reply_to = msg.metadata.get("reply-with")
-                    conversation_id = msg.metadata.get("conversation-id")
-                    exit_data = json.loads(msg.body)
-                    fisherman = exit_data.get("fisherman", "Unknown")
-                    fishes_taken = exit_data.get("fishes_taken", 0)
-                    exit_time = exit_data.get("exit_time", "")
+                await self.handle(msg)
 
-                    fisherman_jid = str(msg.sender)
-                    logger.info(
-                        f"Received exit registration from {fisherman_jid}: fisherman={fisherman}, fishes_taken={fishes_taken}, exit_time={exit_time}"
+        async def handle(self, msg):
+            try:
+                in_reply_to = msg.metadata.get("reply-with")
+                conversation_id = msg.metadata.get("conversation-id")
+                exit_data = unpack_body(msg)
+                fisherman = exit_data.get("fisherman", "Unknown")
+                fishes_taken = exit_data.get("fishes_taken", 0)
+                exit_time = exit_data.get("exit_time", "")
+
+                fisherman_jid = self.agent.get_requester(msg)
+                logger.info(
+                    "Received exit registration from %s: fisherman=%s, fishes_taken=%s, exit_time=%s",
+                    fisherman_jid,
+                    fisherman,
+                    fishes_taken,
+                    exit_time,
+                )
+
+                # Remove fisherman from active set
+                if self.agent.release_fisherman(fisherman_jid):
+                    logger.info("Removed %s from active fishermen", fisherman_jid)
+                else:
+                    logger.warning(
+                        "Exit registration from %s who was not in active fishermen list",
+                        fisherman_jid,
                     )
 
-                    # Remove fisherman from active set
-                    if fisherman_jid in self.agent.active_fishermen:
-                        self.agent.active_fishermen.remove(fisherman_jid)
-                        logger.info(f"Removed {fisherman_jid} from active fishermen")
-                    else:
-                        logger.warning(
-                            f"Exit registration from {fisherman_jid} who was not in active fishermen list"
-                        )
+                # The exit stands either way; its event is retried until written
+                recorded = await self.agent.sync_ledger()
 
-                    # Acknowledge exit
-                    reply = msg.make_reply()
-                    reply.metadata["protocol"] = Protocols.REGISTER_EXIT_RESPONSE.value
-                    reply.metadata["language"] = "JSON"
-                    reply.metadata["reply-with"] == str(uuid())
-                    reply.metadata["conversation-id"] = conversation_id
-                    reply.metadata["in-reply-to"] = in_reply_to
-                    reply.body = json.dumps(
+                # Acknowledge exit
+                reply = self.agent.make_reply(msg)
+                reply.metadata["protocol"] = Protocols.REGISTER_EXIT_RESPONSE.value
+                reply.metadata["language"] = "JSON"
+                reply.metadata["reply-with"] = new_id()
+                reply.metadata["conversation-id"] = conversation_id
+                reply.metadata["in-reply-to"] = in_reply_to
+                if recorded:
+                    pack_body(
+                        reply,
                         {
                             "status": "acknowledged",
                             "message": "Exit registered successfully.",
-                        }
+                        },
                     )
                     reply.metadata["performative"] = "inform"
-
-                    logger.info(
-                        f"Exit acknowledged. Current fishermen on fishery: {self.agent.get_fisherman_count()}/{self.agent.fisherman_limit}"
+                else:
+                    pack_body(
+                        reply,
+                        {"status": "failed", "message": "Exit could not be recorded."},
                     )
+                    reply.metadata["performative"] = "failure"
 
-                    await self.send(reply)
-                except json.JSONDecodeError:
-                    logger.error("Error parsing exit data from message")
+                logger.info(
+                    "Exit acknowledged. Current fishermen on fishery: %s/%s",
+                    self.agent.get_fisherman_count(),
+                    self.agent.fisherman_limit,
+                )
+
+                await self.send(reply)
+            except CodecError:
+                logger.error("Error parsing exit data from message")
 
     class ReceiveWaterQualityAlarmBehaviour(CyclicBehaviour):
         async def run(self):
-            msg = await self.receive()
+            msg = await self.receive(timeout=30)
+            if msg:
+                await self.handle(msg)
+
+        async def handle(self, msg):
+            logger.warning("Water alarm received: [%s] %s", msg.sender, msg.body)
+
+    class RequestWaterQualityWindowBehaviour(OneShotBehaviour):
+        def __init__(self, last=None):
+            super().__init__()
+            self.last = last
+
+        async def run(self):
+            payload = {} if self.last is None else {"last": self.last}
+            msg = Message(
+                to=self.agent.water_caretaker_jid,
+                metadata={
+                    "performative": "request",
+                    "protocol": Protocols.WATER_QUALITY_WINDOW_REQUEST.value,
+                    "language": "JSON",
+                    "reply-with": new_id(),
+                    "conversation-id": new_id(),
+                },
+            )
+            pack_body(msg, payload)
+            logger.info("Requesting pH history from water caretaker")
+            await self.send(msg)
+
+    class ReceiveWaterQualityWindowBehaviour(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=30)
             if msg:
-                logger.warning(f"Water alarm received: [{msg.sender}] {msg.body}")
+                await self.handle(msg)
+
+        async def handle(self, msg):
+            try:
+                window = unpack_body(msg)
+            except CodecError:
+                logger.error("Error parsing pH history from message")
+                return
+
+            self.agent.last_water_quality_window = window
+            samples = window.get("ph_data", [])
+            first_index = window.get("first_index", 0)
+            logger.info(
+                "Received pH history: %s samples (index %s-%s)",
+                len(samples),
+                first_index,
+                first_index + len(samples) - 1,
+            )
+            console.print(f"[green]pH history received:[/green] {len(samples)} samples")
 
     async def setup(self):
-        logger.info(f"Agent {self.jid} starting")
+        logger.info("Agent %s starting", self.jid)
+        self.restore_state()
 
         self.setup_if_can_enter()
         self.setup_take_fish_permission()
         self.setup_exit_registration()
         self.setup_water_alarm()
         self.setup_stocking_alarm()
+        self.setup_quotas()
+        self.add_behaviour(self.dispatcher, self.dispatcher.combined_template())
+        self.setup_metrics()
+        self.setup_snapshots()
+
+        if self.gui:
+            self.add_behaviour(OwnerUserGUI())
+
+    def setup_quotas(self):
+        # Takes of earlier windows were already skipped while restoring; the
+        # shared store catches up with a reset missed while every replica was down
+        if self.capacity_store is not None:
+            self.capacity_store.start_quota_window(self.quota_window_start.timestamp())
+        self.add_behaviour(self.QuotaResetBehaviour())
+        self.dispatcher.limit(
+            [
+                Protocols.IF_CAN_ENTER_REQUEST,
+                Protocols.IF_CAN_TAKE_FISH_REQUEST,
+                Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST,
+            ],
+            self.rate_limiter,
+            self.rate_limited_reply,
+        )
 
-        self.add_behaviour(OwnerUserGUI())
+    def setup_metrics(self):
+        """Quota usage gauges, read when metrics are exported"""
+        jid = str(self.jid)
+        for name, help, fn in [
+            (
+                "fishery_fishermen_active",
+                "Fishermen in the fishery",
+                self.get_fisherman_count,
+            ),
+            (
+                "fishery_fisherman_limit",
+                "Maximum number of fishermen",
+                lambda: self.fisherman_limit,
+            ),
+            ("fishery_fishes_taken", "Fishes taken today", self.get_fishes_taken_count),
+            (
+                "fishery_fish_takes_limit",
+                "Daily fish take limit",
+                lambda: self.fish_takes_limit,
+            ),
+            (
+                "fishery_dispatch_queue_depth",
+                "Messages waiting for a dispatcher worker",
+                self.dispatcher.queue_depth,
+            ),
+        ]:
+            registry.gauge(name, help, ("agent",)).track(fn, jid)
 
     def setup_if_can_enter(self):
         fisher_template = Template(
@@ -474,7 +964,9 @@ class OwnerAgent(Agent):
         )
 
         handle_request_behaviour = self.HandleIfCanEnterRequestBehaviour()
-        self.add_behaviour(handle_request_behaviour, fisher_template)
+        self.dispatcher.route(
+            Protocols.IF_CAN_ENTER_REQUEST, handle_request_behaviour, fisher_template
+        )
 
     def setup_take_fish_permission(self):
         """Setup handler for take fish permission requests"""
@@ -487,8 +979,37 @@ class OwnerAgent(Agent):
             },
         )
 
+        take_fish_batch_template = Template(
+            to=self.jid,
+            metadata={
+                "protocol": Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST.value,
+                "performative": "query_if",
+                "language": "JSON",
+            },
+        )
+
         take_fish_behaviour = self.HandleIfCanTakeFishBehaviour()
-        self.add_behaviour(take_fish_behaviour, take_fish_template)
+        self.dispatcher.route(
+            Protocols.IF_CAN_TAKE_FISH_REQUEST, take_fish_behaviour, take_fish_template
+        )
+        self.dispatcher.route(
+            Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST,
+            take_fish_behaviour,
+            take_fish_batch_template,
+        )
+
+        fish_data_batch_response_template = Template(
+            to=self.jid,
+            metadata={
+                "protocol": Protocols.REGISTER_FISH_DATA_BATCH_RESPONSE.value,
+                "language": "JSON",
+            },
+        )
+        self.dispatcher.route(
+            Protocols.REGISTER_FISH_DATA_BATCH_RESPONSE,
+            self.HandleFishDataBatchResponseBehaviour(),
+            fish_data_batch_response_template,
+        )
 
     def setup_exit_registration(self):
         """Setup handler for exit registration"""
@@ -502,7 +1023,9 @@ class OwnerAgent(Agent):
         )
 
         exit_behaviour = self.HandleExitRegistrationBehaviour()
-        self.add_behaviour(exit_behaviour, exit_template)
+        self.dispatcher.route(
+            Protocols.REGISTER_EXIT_REQUEST, exit_behaviour, exit_template
+        )
 
     def setup_water_alarm(self):
         water_alarm_template = Template(
@@ -516,4 +1039,22 @@ class OwnerAgent(Agent):
         )
         water_alarm_behaviour = self.ReceiveWaterQualityAlarmBehaviour()
 
-        self.add_behaviour(water_alarm_behaviour, water_alarm_template)
+        self.dispatcher.route(
+            Protocols.SEND_WATER_QUALITY_ALARM,
+            water_alarm_behaviour,
+            water_alarm_template,
+        )
+
+        water_window_template = Template(
+            to=self.jid,
+            sender=self.water_caretaker_jid,
+            metadata={
+                "protocol": Protocols.WATER_QUALITY_WINDOW_RESPONSE.value,
+                "language": "JSON",
+            },
+        )
+        self.dispatcher.route(
+            Protocols.WATER_QUALITY_WINDOW_RESPONSE,
+            self.ReceiveWaterQualityWindowBehaviour(),
+            water_window_template,
+        )
@@ -0,0 +1,254 @@
+"""
+Horizontal sharding of OwnerAgent admission.
+
+Several OwnerAgent replicas can serve one logical owner address:
+
+- OwnerRouterAgent listens on the logical address and forwards each fisher
+  request to a replica chosen by consistent hashing of the fisher JID, so a
+  fisher always talks to the same replica while the replica set is stable.
+  The original sender travels in the "on-behalf-of" metadata field and the
+  replica answers the fisher directly.
+- SharedCapacityStore keeps the active fishermen and the fish take counter in
+  one SQLite database (WAL mode) that every replica updates atomically, so the
+  global fisherman_limit and fish_takes_limit hold across replicas and
+  processes.
+"""
+
+import bisect
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from spade.agent import Agent
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+from .logger_config import get_logger
+from .protocols import Protocols
+
+logger = get_logger("OwnerSharding")
+
+# Protocols sent by fishermen to the owner - the ones the router forwards
+FISHER_PROTOCOLS = {
+    Protocols.IF_CAN_ENTER_REQUEST.value,
+    Protocols.IF_CAN_TAKE_FISH_REQUEST.value,
+    Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST.value,
+    Protocols.REGISTER_EXIT_REQUEST.value,
+}
+
+
+class ConsistentHashRing:
+    """Maps keys to nodes; adding or removing a node only moves ~1/N of the keys"""
+
+    def __init__(self, nodes: list[str], vnodes: int = 64):
+        if not nodes:
+            raise ValueError("At least one node is required.")
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), "big"
+        )
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class SharedCapacityStore:
+    """
+    Admission state shared by all owner replicas.
+
+    Every check-and-update runs inside a single `BEGIN IMMEDIATE` transaction,
+    which takes SQLite's write lock up front, so concurrent replicas (threads
+    or processes) can never admit more than `limit` fishermen or grant more
+    than `limit` fish takes between them.
+    """
+
+    def __init__(self, path="data/owner_state.sqlite"):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS active_fishermen (jid TEXT PRIMARY KEY, replica TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO counters (name, value) VALUES ('fishes_taken', 0)"
+        )
+        # Start (epoch s) of the daily quota window fishes_taken counts
+        self._db.execute(
+            "INSERT OR IGNORE INTO counters (name, value) VALUES ('quota_window', 0)"
+        )
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def admit(self, jid: str, limit: int, replica: str = "") -> tuple[bool, str]:
+        """Atomically add `jid` to the active fishermen if it is not inside and there is room"""
+
+        def admit(db):
+            if db.execute(
+                "SELECT 1 FROM active_fishermen WHERE jid = ?", (jid,)
+            ).fetchone():
+                return False, "You are already in the fishery."
+            (count,) = db.execute("SELECT COUNT(*) FROM active_fishermen").fetchone()
+            if count >= limit:
+                return False, f"Fishery is at capacity ({limit} fishermen)."
+            db.execute(
+                "INSERT INTO active_fishermen (jid, replica) VALUES (?, ?)",
+                (jid, replica),
+            )
+            return True, "Entrance allowed."
+
+        return self._transaction(admit)
+
+    def release(self, jid: str) -> bool:
+        """Remove `jid` from the active fishermen; False if it was not inside"""
+        return self._transaction(
+            lambda db: db.execute(
+                "DELETE FROM active_fishermen WHERE jid = ?", (jid,)
+            ).rowcount
+            > 0
+        )
+
+    def take_fish(self, limit: int, count: int = 1) -> int:
+        """Atomically grant up to `count` fish takes under `limit`; returns how many were granted"""
+
+        def take(db):
+            (taken,) = db.execute(
+                "SELECT value FROM counters WHERE name = 'fishes_taken'"
+            ).fetchone()
+            granted = max(0, min(count, limit - taken))
+            if granted:
+                db.execute(
+                    "UPDATE counters SET value = value + ? WHERE name = 'fishes_taken'",
+                    (granted,),
+                )
+            return granted
+
+        return self._transaction(take)
+
+    def return_fish(self, count: int):
+        """Give back `count` fish takes granted by take_fish"""
+        self._transaction(
+            lambda db: db.execute(
+                "UPDATE counters SET value = MAX(value - ?, 0) WHERE name = 'fishes_taken'",
+                (count,),
+            )
+        )
+
+    def active_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM active_fishermen").fetchone()[
+                0
+            ]
+
+    def active_fishermen(self) -> set[str]:
+        with self._lock:
+            return {
+                jid for (jid,) in self._db.execute("SELECT jid FROM active_fishermen")
+            }
+
+    def fishes_taken(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT value FROM counters WHERE name = 'fishes_taken'"
+            ).fetchone()[0]
+
+    def start_quota_window(self, window_start: float) -> bool:
+        """
+        Restart the fish take counter for the daily quota window starting at
+        `window_start` (epoch seconds). Every replica calls this; only the
+        first call for a window resets the counter.
+
+        Returns:
+            bool: True if this call started the window
+        """
+
+        def start(db):
+            (current,) = db.execute(
+                "SELECT value FROM counters WHERE name = 'quota_window'"
+            ).fetchone()
+            if current >= window_start:
+                return False
+            db.execute("UPDATE counters SET value = 0 WHERE name = 'fishes_taken'")
+            db.execute(
+                "UPDATE counters SET value = ? WHERE name = 'quota_window'",
+                (int(window_start),),
+            )
+            return True
+
+        return self._transaction(start)
+
+    def reset(self):
+        """Clear all admission state (e.g. at the start of a new fishing day)"""
+
+        def reset(db):
+            db.execute("DELETE FROM active_fishermen")
+            db.execute("UPDATE counters SET value = 0 WHERE name = 'fishes_taken'")
+
+        self._transaction(reset)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class OwnerRouterAgent(Agent):
+    """Logical owner address that spreads fishermen over OwnerAgent replicas"""
+
+    def __init__(self, jid, password, replica_jids: list[str], vnodes: int = 64):
+        super().__init__(jid, password)
+        self.replica_jids = replica_jids
+        self.ring = ConsistentHashRing(replica_jids, vnodes)
+
+    class RouteRequestsBehaviour(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=30)
+            if not msg:
+                return
+
+            protocol = msg.metadata.get("protocol")
+            if protocol not in FISHER_PROTOCOLS:
+                logger.warning(
+                    "Router dropped %s from %s: not a fisher protocol",
+                    protocol,
+                    msg.sender,
+                )
+                return
+
+            fisherman_jid = str(msg.sender.bare)
+            replica = self.agent.ring.node_for(fisherman_jid)
+            forward = Message(to=replica, body=msg.body, thread=msg.thread)
+            forward.metadata = dict(msg.metadata)
+            forward.metadata["on-behalf-of"] = str(msg.sender)
+            logger.debug("Routing %s from %s to %s", protocol, fisherman_jid, replica)
+            await self.send(forward)
+
+    async def setup(self):
+        logger.info(
+            "Owner router %s starting with replicas %s",
+            self.jid,
+            self.replica_jids,
+        )
+        self.add_behaviour(self.RouteRequestsBehaviour())
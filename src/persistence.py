@@ -0,0 +1,200 @@
+"""
+Snapshots of agent state on top of the event ledger.
+
+An agent with a ledger rebuilds its state on startup by replaying its
+events. To keep restarts fast however long the fishery has been running,
+DurableStateMixin periodically writes a snapshot of the state together with
+the ledger sequence number it reflects; a restart loads the latest snapshot
+and replays only the events recorded after it.
+
+The state is captured on the event loop (a cheap copy); encoding and
+writing happen in a worker thread. Snapshots are written to a temporary
+file, synced and renamed over the previous one, so a crash leaves either
+the old or the new snapshot, never a torn one.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Optional
+from .clock import PeriodicBehaviour
+from .ledger import LedgerError
+from .logger_config import get_logger
+
+logger = get_logger("Persistence")
+
+
+def _encode(value):
+    # Typed arrays (catch registry columns) travel as base64 of their bytes
+    if isinstance(value, array):
+        return {
+            "__array__": value.typecode,
+            "byteorder": sys.byteorder,
+            "data": base64.b64encode(value.tobytes()).decode("ascii"),
+        }
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Cannot snapshot {type(value).__name__}")
+
+
+def _decode(obj: dict):
+    if "__array__" in obj:
+        values = array(obj["__array__"])
+        values.frombytes(base64.b64decode(obj["data"]))
+        if obj.get("byteorder", sys.byteorder) != sys.byteorder:
+            values.byteswap()
+        return values
+    return obj
+
+
+class SnapshotStore:
+    """One snapshot file per agent in `directory`"""
+
+    def __init__(self, directory="data/snapshots"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, name: str) -> Path:
+        return self.directory / f"{name.replace('/', '_')}.json"
+
+    def write(self, name: str, seq: int, state: dict):
+        """Atomically replace the snapshot of `name` (blocking)"""
+        path = self.path_for(name)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"seq": seq, "time": time.time(), "state": state},
+                f,
+                default=_encode,
+                separators=(",", ":"),
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        # Make the rename itself durable
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def read(self, name: str) -> tuple[int, Optional[dict]]:
+        """
+        Latest snapshot of `name`.
+
+        Returns:
+            tuple: (ledger sequence number it reflects, state), (0, None) if there is none
+        """
+        try:
+            with open(self.path_for(name), encoding="utf-8") as f:
+                snapshot = json.load(f, object_hook=_decode)
+            return snapshot["seq"], snapshot["state"]
+        except FileNotFoundError:
+            return 0, None
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(
+                "Unreadable snapshot for %s, replaying the whole ledger: %s", name, e
+            )
+            return 0, None
+
+
+class DurableStateMixin:
+    """
+    Agent mixin: record state changes in the ledger, snapshot the state and
+    restore both on startup.
+
+    The agent sets `ledger`, `snapshot_store` and `snapshot_interval_s` and
+    implements `apply_event(event)`, `snapshot_state()` (a detached copy of
+    the state, JSON-serialisable apart from arrays and sets) and
+    `load_state(state)`.
+    """
+
+    ledger = None
+    snapshot_store: Optional[SnapshotStore] = None
+    snapshot_interval_s = 60.0
+    snapshot_seq = 0  # ledger sequence number of the last snapshot
+
+    class SnapshotBehaviour(PeriodicBehaviour):
+        def match(self, message) -> bool:
+            # Never reads the mailbox
+            return False
+
+        async def run(self):
+            try:
+                await self.agent.save_snapshot()
+            except Exception:  # keep snapshotting on the next period
+                logger.exception("Snapshot of %s failed", self.agent.jid)
+
+    def record(self, kind, subject="", data=None):
+        """Append a state change to the ledger (no-op without a ledger)"""
+        if self.ledger is not None:
+            self.ledger.append(str(self.jid), kind, subject, data)
+
+    async def sync_ledger(self) -> bool:
+        """
+        Wait until the recorded state changes are on disk, before promising anything.
+
+        Returns:
+            bool: False if they could not be written: the caller must undo its
+            change and refuse instead of replying success
+        """
+        if self.ledger is not None:
+            try:
+                await self.ledger.committed()
+            except LedgerError as e:
+                logger.error("%s could not record its state change: %s", self.jid, e)
+                return False
+        return True
+
+    def restore_state(self):
+        """Load the latest snapshot and replay the ledger events recorded after it"""
+        if self.ledger is None:
+            return
+        started = time.perf_counter()
+        seq, state = 0, None
+        if self.snapshot_store is not None:
+            seq, state = self.snapshot_store.read(str(self.jid))
+        if state is not None:
+            self.load_state(state)
+        replayed = 0
+        for event in self.ledger.events(source=str(self.jid), after_seq=seq):
+            self.apply_event(event)
+            replayed += 1
+        self.snapshot_seq = seq
+        if state is not None or replayed:
+            logger.info(
+                "%s restored from %s + %s ledger events in %.3fs",
+                self.jid,
+                f"snapshot at {seq}" if state is not None else "scratch",
+                replayed,
+                time.perf_counter() - started,
+            )
+
+    async def save_snapshot(self):
+        if self.ledger is None or self.snapshot_store is None:
+            return
+        seq = self.ledger.last_seq
+        if seq == self.snapshot_seq:
+            return  # nothing happened since the last snapshot
+        state = self.snapshot_state()
+        # Never let a snapshot get ahead of the ledger it points into
+        await self.ledger.committed(seq)
+        try:
+            await asyncio.to_thread(
+                self.snapshot_store.write, str(self.jid), seq, state
+            )
+        except (OSError, TypeError, ValueError) as e:
+            logger.error("Could not write snapshot of %s: %s", self.jid, e)
+            return
+        self.snapshot_seq = seq
+        logger.debug("Snapshot of %s written at ledger seq %s", self.jid, seq)
+
+    def setup_snapshots(self):
+        if self.ledger is not None and self.snapshot_store is not None:
+            self.add_behaviour(self.SnapshotBehaviour(period=self.snapshot_interval_s))
@@ -0,0 +1,399 @@
+"""
+End-to-end latency and throughput benchmark of the fishery protocols.
+
+Each simulated fisher is a ProbeAgent that repeatedly runs the full
+fisherman conversation - enter, take fish, register fish data, exit - and
+records the round-trip time of every request/response pair. Results for
+each concurrency level are reported as p50/p95/p99 latencies and sustained
+round trips (and messages) per second, together with the mean encoded size
+and process CPU time per message, in a JSON document that can be diffed
+between commits. `codec_report` compares the message encodings on their own.
+
+Transports:
+    local - owner and caretakers run in this process on the in-memory bus
+    xmpp  - only the probes run here; the system must already be running
+            against a local Prosody (python fishing_system.py)
+"""
+
+import asyncio
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+from typing import Optional
+from spade.agent import Agent
+from spade.behaviour import OneShotBehaviour
+from spade.message import Message
+from .correlation import new_id
+from .fish_caretaker_agent import FishCaretakerAgent
+from .ledger import EventLedger
+from .local_transport import local_agent_class
+from .logger_config import get_logger
+from .message_codec import (
+    BIN,
+    JSON,
+    decode_body,
+    encode_body,
+    pack_body,
+    set_default_encoding,
+)
+from .owner_agent import OwnerAgent
+from .protocols import Protocols
+from .water_caretaker_agent import WaterCaretakerAgent
+
+logger = get_logger("ProtocolBenchmark")
+
+# Benchmarked conversation steps: (name, request protocol, performative, recipient)
+PROTOCOL_STEPS = [
+    ("enter", Protocols.IF_CAN_ENTER_REQUEST, "query_if", "owner"),
+    ("take_fish", Protocols.IF_CAN_TAKE_FISH_REQUEST, "query_if", "owner"),
+    (
+        "register_fish_data",
+        Protocols.REGISTER_FISH_DATA_REQUEST,
+        "request",
+        "fish_caretaker",
+    ),
+    ("exit", Protocols.REGISTER_EXIT_REQUEST, "inform", "owner"),
+]
+
+BENCH_FISH = {"species": "Carp", "size": "M", "mass": 1.5}
+
+# Representative payloads for the codec comparison; sensor readings are
+# full-precision floats like the ones the caretakers send
+_ph = random.Random(0)
+SAMPLE_PAYLOADS = {
+    Protocols.IF_CAN_ENTER_REQUEST: {"fisherman_data": {"jid": "fisher42@localhost"}},
+    Protocols.IF_CAN_ENTER_RESPONSE: {"allow": True, "reason": ""},
+    Protocols.IF_CAN_TAKE_FISH_REQUEST: BENCH_FISH,
+    Protocols.IF_CAN_TAKE_FISH_RESPONSE: {
+        "allow": True,
+        "message": "You can take this fish.",
+    },
+    Protocols.IF_CAN_TAKE_FISH_BATCH_REQUEST: {"catches": [BENCH_FISH] * 10},
+    Protocols.REGISTER_FISH_DATA_REQUEST: {
+        **BENCH_FISH,
+        "time": "2025-06-01T12:00:00.000000",
+    },
+    Protocols.REGISTER_EXIT_REQUEST: {
+        "fisherman": "fisher42@localhost",
+        "fishes_taken": 3,
+        "exit_time": "2025-06-01T12:00:00.000000",
+    },
+    Protocols.SEND_WATER_QUALITY_ALARM: {
+        "z_score": 2.31,
+        "window": {"size": 10, "mean": 7.02, "std_dev": 0.31, "min": 6.5, "max": 7.9},
+        "recent": [_ph.normalvariate(7, 0.3) for _ in range(10)],
+        "sample_range": [0, 3599],
+    },
+    Protocols.WATER_QUALITY_WINDOW_RESPONSE: {
+        "first_index": 0,
+        "ph_data": [_ph.normalvariate(7, 0.3) for _ in range(3600)],
+    },
+}
+
+
+def message_size(msg: Message) -> int:
+    """Bytes of body and metadata, the part of a message the codec controls"""
+    size = len((msg.body or "").encode("utf-8"))
+    return size + sum(len(k) + len(v or "") for k, v in msg.metadata.items())
+
+
+def codec_report(iterations: int = 2000) -> dict:
+    """Encoded size and encode+decode CPU time of the sample payloads per encoding"""
+    report = {}
+    for protocol, payload in SAMPLE_PAYLOADS.items():
+        entry = {}
+        for encoding in (JSON, BIN):
+            body, used = encode_body(protocol.value, payload, encoding)
+            started = time.process_time()
+            for _ in range(iterations):
+                body, used = encode_body(protocol.value, payload, encoding)
+                decode_body(protocol.value, body, used)
+            entry[encoding] = {
+                "bytes": len(body),
+                "us_per_message": round(
+                    1e6 * (time.process_time() - started) / iterations, 3
+                ),
+            }
+        report[protocol.value] = entry
+    return report
+
+
+def percentile(sorted_values: list[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LatencyRecorder:
+    """Collects round-trip times (in seconds) and timeouts per protocol step"""
+
+    def __init__(self):
+        self.latencies = {name: [] for name, *_ in PROTOCOL_STEPS}
+        self.timeouts = {name: 0 for name, *_ in PROTOCOL_STEPS}
+        self.messages = 0
+        self.message_bytes = 0
+
+    def record_message(self, msg: Message):
+        self.messages += 1
+        self.message_bytes += message_size(msg)
+
+    def summary(self, duration_s: float, cpu_s: float) -> dict:
+        protocols = {}
+        total = 0
+        for name, values in self.latencies.items():
+            values = sorted(values)
+            total += len(values)
+            protocols[name] = {
+                "count": len(values),
+                "timeouts": self.timeouts[name],
+                "mean_ms": (
+                    round(1000 * sum(values) / len(values), 4) if values else None
+                ),
+                "p50_ms": self._ms(percentile(values, 50)),
+                "p95_ms": self._ms(percentile(values, 95)),
+                "p99_ms": self._ms(percentile(values, 99)),
+                "max_ms": self._ms(values[-1] if values else None),
+                "round_trips_per_s": round(len(values) / duration_s, 2),
+            }
+        return {
+            "duration_s": round(duration_s, 4),
+            "round_trips": total,
+            "round_trips_per_s": round(total / duration_s, 2),
+            "messages_per_s": round(2 * total / duration_s, 2),
+            "bytes_per_message": (
+                round(self.message_bytes / self.messages, 1) if self.messages else None
+            ),
+            "cpu_us_per_message": (
+                round(1e6 * cpu_s / (2 * total), 2) if total else None
+            ),
+            "protocols": protocols,
+        }
+
+    @staticmethod
+    def _ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(1000 * value, 4)
+
+
+class ProbeAgent(Agent):
+    """Simulated fisher running the benchmarked conversation `rounds` times"""
+
+    def __init__(
+        self,
+        jid,
+        password,
+        owner_jid,
+        fish_caretaker_jid,
+        recorder: LatencyRecorder,
+        start_event: asyncio.Event,
+        rounds=3,
+        timeout_s=30.0,
+    ):
+        super().__init__(jid, password)
+        self.recipients = {"owner": owner_jid, "fish_caretaker": fish_caretaker_jid}
+        self.recorder = recorder
+        self.start_event = start_event
+        self.rounds = rounds
+        self.timeout_s = timeout_s
+        self.finished = asyncio.Event()
+
+    class ProtocolProbeBehaviour(OneShotBehaviour):
+        async def request(self, name, protocol, performative, recipient, payload):
+            reply_with = new_id()
+            msg = Message(
+                to=self.agent.recipients[recipient],
+                metadata={
+                    "performative": performative,
+                    "protocol": protocol.value,
+                    "language": "JSON",
+                    "reply-with": reply_with,
+                    "conversation-id": new_id(),
+                },
+            )
+            pack_body(msg, payload)
+            self.agent.recorder.record_message(msg)
+            started = time.perf_counter()
+            deadline = started + self.agent.timeout_s
+            await self.send(msg)
+
+            # One request in flight at a time, so anything else is a stale reply
+            while (remaining := deadline - time.perf_counter()) > 0:
+                reply = await self.receive(timeout=remaining)
+                if reply and reply.metadata.get("in-reply-to") == reply_with:
+                    self.agent.recorder.record_message(reply)
+                    self.agent.recorder.latencies[name].append(
+                        time.perf_counter() - started
+                    )
+                    return
+            self.agent.recorder.timeouts[name] += 1
+
+        def payload(self, name) -> dict:
+            if name == "enter":
+                return {"fisherman_data": {"jid": str(self.agent.jid)}}
+            if name == "exit":
+                return {
+                    "fisherman": str(self.agent.jid),
+                    "fishes_taken": 1,
+                    "exit_time": datetime.now().isoformat(),
+                }
+            if name == "register_fish_data":
+                return {**BENCH_FISH, "time": datetime.now().isoformat()}
+            return BENCH_FISH
+
+        async def run(self):
+            await self.agent.start_event.wait()
+            for _ in range(self.agent.rounds):
+                for name, protocol, performative, recipient in PROTOCOL_STEPS:
+                    await self.request(
+                        name, protocol, performative, recipient, self.payload(name)
+                    )
+            self.agent.finished.set()
+
+    async def setup(self):
+        self.add_behaviour(self.ProtocolProbeBehaviour())
+
+
+class ProtocolBenchmark:
+    """Sweeps concurrency levels and collects a JSON-serialisable report"""
+
+    def __init__(
+        self,
+        transport="local",
+        rounds=3,
+        timeout_s=30.0,
+        domain="localhost",
+        encoding=JSON,
+        ledger_path=None,
+    ):
+        if transport not in ("local", "xmpp"):
+            raise ValueError(f"Unknown transport: {transport}")
+        self.transport = transport
+        self.encoding = encoding
+        self.ledger_path = ledger_path  # record state changes durably, as in production
+        self.ledger = None
+        self.rounds = rounds
+        self.timeout_s = timeout_s
+        self.domain = domain
+        self.owner_jid = f"owner@{domain}"
+        self.water_caretaker_jid = f"water_caretaker@{domain}"
+        self.fish_caretaker_jid = f"fish_caretaker@{domain}"
+        self.system_agents = []
+
+    def agent_class(self, agent_class):
+        return (
+            local_agent_class(agent_class) if self.transport == "local" else agent_class
+        )
+
+    async def start_system(self, max_fishers: int):
+        if self.transport != "local":
+            return  # the system runs in its own process against Prosody
+
+        if self.ledger_path:
+            self.ledger = EventLedger(self.ledger_path)
+        owner = self.agent_class(OwnerAgent)(
+            self.owner_jid,
+            "",
+            self.water_caretaker_jid,
+            self.fish_caretaker_jid,
+            gui=False,
+            ledger=self.ledger,
+            # Never rate limit the probes, but keep the check on the hot path
+            fisher_rate=1e9,
+            fisher_burst=10**9,
+        )
+        # Let every probe in and never hit the quota, so all answers are "agree"
+        owner.fisherman_limit = max_fishers
+        owner.fish_takes_limit = 10**12
+        water_caretaker = self.agent_class(WaterCaretakerAgent)(
+            self.water_caretaker_jid, "", self.owner_jid
+        )
+        fish_caretaker = self.agent_class(FishCaretakerAgent)(
+            self.fish_caretaker_jid, "", self.owner_jid, ledger=self.ledger
+        )
+        self.system_agents = [owner, water_caretaker, fish_caretaker]
+        await asyncio.gather(*(agent.start() for agent in self.system_agents))
+
+    async def stop_system(self):
+        await asyncio.gather(*(agent.stop() for agent in self.system_agents))
+        if self.ledger is not None:
+            self.ledger.close()
+
+    def reset_system(self):
+        if self.system_agents:
+            owner, _, fish_caretaker = self.system_agents
+            owner.active_fishermen.clear()
+            owner.fishes_taken_count = 0
+            fish_caretaker.catches.clear()
+
+    async def run_level(self, fishers: int) -> dict:
+        self.reset_system()
+        recorder = LatencyRecorder()
+        start_event = asyncio.Event()
+        probe_class = self.agent_class(ProbeAgent)
+        probes = [
+            probe_class(
+                f"bench{fishers}_{i}@{self.domain}",
+                "",
+                self.owner_jid,
+                self.fish_caretaker_jid,
+                recorder,
+                start_event,
+                rounds=self.rounds,
+                timeout_s=self.timeout_s,
+            )
+            for i in range(1, fishers + 1)
+        ]
+        await asyncio.gather(*(probe.start() for probe in probes))
+
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        start_event.set()
+        await asyncio.gather(*(probe.finished.wait() for probe in probes))
+        duration_s = time.perf_counter() - started
+        cpu_s = time.process_time() - cpu_started
+
+        await asyncio.gather(*(probe.stop() for probe in probes))
+        for probe in probes:
+            probe.container.unregister(str(probe.jid))
+
+        result = {"fishers": fishers, **recorder.summary(duration_s, cpu_s)}
+        logger.info(
+            "Benchmark level %s fishers: %s round trips/s",
+            fishers,
+            result["round_trips_per_s"],
+        )
+        return result
+
+    async def run(self, levels: list[int]) -> dict:
+        # With the xmpp transport this only affects the probes' requests
+        set_default_encoding(self.encoding)
+        await self.start_system(max(levels))
+        try:
+            results = []
+            for fishers in levels:
+                results.append(await self.run_level(fishers))
+        finally:
+            await self.stop_system()
+        return {"meta": self.meta(levels), "results": results}
+
+    def meta(self, levels) -> dict:
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "commit": commit,
+            "transport": self.transport,
+            "encoding": self.encoding,
+            "ledger": bool(self.ledger_path),
+            "rounds": self.rounds,
+            "levels": levels,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        }
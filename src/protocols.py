@@ -8,7 +8,13 @@ class Protocols(Enum):
     REGISTER_EXIT_RESPONSE = "register_exit_response"
     IF_CAN_TAKE_FISH_REQUEST = "if_can_take_fish_request"
     IF_CAN_TAKE_FISH_RESPONSE = "if_can_take_fish_response"
+    IF_CAN_TAKE_FISH_BATCH_REQUEST = "if_can_take_fish_batch_request"
+    IF_CAN_TAKE_FISH_BATCH_RESPONSE = "if_can_take_fish_batch_response"
     REGISTER_FISH_DATA_REQUEST = "register_fish_data_request"
     REGISTER_FISH_DATA_RESPONSE = "response_fish_data_response"
+    REGISTER_FISH_DATA_BATCH_REQUEST = "register_fish_data_batch_request"
+    REGISTER_FISH_DATA_BATCH_RESPONSE = "register_fish_data_batch_response"
     SEND_NEEDS_STOCKING_ALARM = "send_needs_stocking_alarm"
     SEND_WATER_QUALITY_ALARM = "send_water_quality_alarm"
+    WATER_QUALITY_WINDOW_REQUEST = "water_quality_window_request"
+    WATER_QUALITY_WINDOW_RESPONSE = "water_quality_window_response"
@@ -0,0 +1,76 @@
+"""
+Quota helpers for the OwnerAgent.
+
+- Daily quotas run in windows starting every day at a configurable reset
+  time; the owner resets its counters from a scheduled behaviour at the
+  window boundary, so request handling never looks at the date.
+- RateLimiter keeps a token bucket per fisher: a fisher may burst up to
+  `burst` requests and then `rate` requests per second. The dispatcher asks
+  it before a message is decoded or logged, so a flooding client only costs
+  a dict lookup per message and cannot slow down everybody else.
+"""
+
+import time
+from datetime import datetime, time as dtime, timedelta
+from typing import Callable
+
+
+def quota_window_start(now: datetime, reset_at: dtime = dtime(0, 0)) -> datetime:
+    """Start of the daily quota window containing `now`"""
+    start = now.replace(
+        hour=reset_at.hour, minute=reset_at.minute, second=0, microsecond=0
+    )
+    return start if start <= now else start - timedelta(days=1)
+
+
+class RateLimiter:
+    """Token bucket per key"""
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: int = 20,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = 10000,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("Rate must be positive and burst at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.max_keys = max_keys
+        self.buckets: dict[str, list] = {}  # key -> [tokens, last update]
+        self.rejected = 0
+        self._prune_at = max_keys
+
+    def allow(self, key: str) -> bool:
+        """Take a token from `key`'s bucket; False if it is empty"""
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self._prune_at:
+                self.prune(now)
+            self.buckets[key] = [self.burst - 1, now]
+            return True
+        tokens = bucket[0] + (now - bucket[1]) * self.rate
+        if tokens > self.burst:
+            tokens = self.burst
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True
+        bucket[0] = tokens
+        self.rejected += 1
+        return False
+
+    def prune(self, now=None):
+        """Forget buckets that have refilled completely - they behave like new ones"""
+        now = self.clock() if now is None else now
+        refill_s = self.burst / self.rate
+        self.buckets = {
+            key: bucket
+            for key, bucket in self.buckets.items()
+            if now - bucket[1] < refill_s
+        }
+        # Amortised: prune again only after the table doubled
+        self._prune_at = max(self.max_keys, 2 * len(self.buckets))
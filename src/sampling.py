@@ -0,0 +1,74 @@
+"""
+Adaptive sampling for the caretaker measurement behaviours.
+
+While the readings are stable a behaviour wakes up every `slow_s` seconds and
+reads a single sample. As soon as a reading comes close to an alarm threshold
+(`urgency` of at least `arm_at`, where 1.0 is the threshold itself) it wakes
+up every `fast_s` seconds and reads a micro-batch of `batch` samples, so a
+developing excursion is followed at `batch / fast_s` samples per second.
+After `calm_after` calm readings in a row the interval doubles, back up to
+`slow_s`. For noisy statistics, `smoothing` (< 1) follows an exponential
+average of the urgency instead of the latest reading, so single noisy samples
+do not keep the sampler fast.
+
+Samplers start fast, so the statistics of a fresh agent warm up quickly.
+"""
+
+from typing import Optional
+
+
+class AdaptiveSampler:
+    def __init__(
+        self,
+        slow_s: float = 10.0,
+        fast_s: float = 1.0,
+        batch: int = 3,
+        arm_at: float = 0.8,
+        calm_after: int = 5,
+        smoothing: float = 1.0,
+    ):
+        if not 0 < fast_s <= slow_s:
+            raise ValueError("Intervals must be positive and fast_s <= slow_s.")
+        if batch < 1 or calm_after < 1:
+            raise ValueError("Batch size and calm_after must be at least 1.")
+        if not 0 < smoothing <= 1:
+            raise ValueError("Smoothing must be in (0, 1].")
+        self.slow_s = slow_s
+        self.fast_s = fast_s
+        self.batch = batch
+        self.arm_at = arm_at
+        self.calm_after = calm_after
+        self.smoothing = smoothing  # weight of the latest reading
+        self.urgency = 0.0
+        self.interval = fast_s  # seconds until the next read
+        self.size = batch  # samples to read at the next wake-up
+        self._calm = 0
+
+    @property
+    def spacing(self) -> float:
+        """Seconds between the samples of one read"""
+        return self.interval / self.size
+
+    def update(self, urgency: Optional[float]) -> float:
+        """
+        Adjust the schedule to the latest reading.
+
+        Args:
+            urgency: how close the reading came to an alarm threshold (1.0 at
+                the threshold), None while the statistics are warming up
+
+        Returns:
+            float: seconds until the next read
+        """
+        if urgency is None:
+            return self.interval
+        self.urgency += self.smoothing * (urgency - self.urgency)
+        if self.urgency >= self.arm_at:
+            self.interval, self.size, self._calm = self.fast_s, self.batch, 0
+        else:
+            self._calm += 1
+            if self._calm >= self.calm_after:
+                self._calm = 0
+                self.interval = min(self.interval * 2, self.slow_s)
+                self.size = 1
+        return self.interval
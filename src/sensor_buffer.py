@@ -0,0 +1,63 @@
+from array import array
+from typing import Iterator, Optional
+
+
+class SensorBuffer:
+    """
+    Fixed-capacity ring buffer of float samples backed by a preallocated array('d').
+
+    Every sample is written twice (at `i` and `i + capacity`), so the most
+    recent `k` samples are always one contiguous slice and `window()` can hand
+    out a zero-copy memoryview instead of building a new list. Memory use is
+    fixed at creation time no matter how many samples are appended.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        self.capacity = capacity
+        self._data = array("d", bytes(16 * capacity))
+        self._view = memoryview(self._data)
+        self._head = 0
+        self.total = 0  # samples appended since creation
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.window())
+
+    def __getitem__(self, index):
+        return self.window()[index]
+
+    def append(self, value: float) -> None:
+        value = float(value)
+        head = self._head
+        self._data[head] = value
+        self._data[head + self.capacity] = value
+        head += 1
+        self._head = 0 if head == self.capacity else head
+        self.total += 1
+
+    def extend(self, values) -> None:
+        for value in values:
+            self.append(value)
+
+    def window(self, n: Optional[int] = None) -> memoryview:
+        """
+        Zero-copy view of the last `n` samples (all retained samples by default), oldest first.
+
+        The view aliases the buffer, so it is only valid until the next append.
+        """
+        size = len(self)
+        if n is None or n > size:
+            n = size
+        end = self._head + self.capacity
+        return self._view[end - n : end]
+
+    def first_index(self) -> int:
+        """Sample index (counted from the first append) of the oldest retained sample."""
+        return self.total - len(self)
+
+    def tolist(self) -> list[float]:
+        return self.window().tolist()
@@ -0,0 +1,182 @@
+"""
+Seeded sensor simulator for the caretaker agents.
+
+Samples are generated in blocks of `block_size` with NumPy generators and
+handed out one at a time, so a reading costs a list lookup instead of a
+`random.normalvariate` call. A signal is
+
+    level (mean + linear drift + step changes) + random walk + noise + spikes
+
+Every sensor derives its random streams from the run seed and its own name,
+so a run is reproducible bit for bit: a sensor produces the same samples
+whatever the block size, the other sensors or the order they were created in.
+Injected spikes are reported alongside the samples, which gives detector
+tests their ground truth.
+"""
+
+import zlib
+from typing import NamedTuple, Optional, Sequence
+import numpy as np
+
+
+class SensorProfile(NamedTuple):
+    mean: float
+    sigma: float  # white noise std dev
+    drift: float = 0.0  # change of the level per sample
+    walk_sigma: float = 0.0  # std dev of the random walk steps
+    steps: Sequence[tuple[int, float]] = ()  # (sample index, level change)
+    anomaly_rate: float = 0.0  # probability of a spike per sample
+    anomaly_scale: float = 6.0  # spike height in noise std devs
+    floor: Optional[float] = None
+    ceiling: Optional[float] = None
+
+
+def run_seed(seed: Optional[int] = None) -> int:
+    """`seed`, or a fresh one to log so the run can be repeated"""
+    return np.random.SeedSequence(seed).entropy
+
+
+def sensor_seed(seed, name: str) -> np.random.SeedSequence:
+    """Seed of sensor `name` within the run seeded by `seed`"""
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(name.encode()),))
+
+
+class SimulatedSensor:
+    """One simulated stream, read sample by sample or in chunks"""
+
+    def __init__(
+        self, name: str, profile: SensorProfile, seed=None, block_size: int = 4096
+    ):
+        if block_size < 1:
+            raise ValueError("Block size must be at least 1.")
+        self.name = name
+        self.profile = profile
+        self.block_size = block_size
+        # Separate generators, so each component draws a fixed amount per sample
+        noise, walk, spikes = sensor_seed(seed, name).spawn(3)
+        self._noise = np.random.Generator(np.random.PCG64(noise))
+        self._walk = np.random.Generator(np.random.PCG64(walk))
+        self._spikes = np.random.Generator(np.random.PCG64(spikes))
+        self._walk_level = 0.0
+        self.generated = 0  # samples generated so far
+        self._values: list[float] = []
+        self._injected: list[bool] = []
+        self._pos = 0
+        self.last_injected = False  # whether the last sample read carries a spike
+
+    def generate(self, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Generate the next `n` samples, bypassing the read buffer.
+
+        Returns:
+            tuple: (samples, mask of the samples with an injected spike)
+        """
+        p = self.profile
+        index = np.arange(self.generated, self.generated + n)
+        values = p.mean + p.sigma * self._noise.standard_normal(n)
+        if p.drift:
+            values += p.drift * index
+        for at, delta in p.steps:
+            values[index >= at] += delta
+        if p.walk_sigma:
+            # Accumulated from the previous level, so block boundaries don't change rounding
+            steps = p.walk_sigma * self._walk.standard_normal(n)
+            walk = np.cumsum(np.concatenate(([self._walk_level], steps)))[1:]
+            self._walk_level = float(walk[-1])
+            values += walk
+        injected = np.zeros(n, dtype=bool)
+        if p.anomaly_rate:
+            draws = self._spikes.random((n, 2))
+            injected = draws[:, 0] < p.anomaly_rate
+            sign = np.where(draws[:, 1] < 0.5, -1.0, 1.0)
+            values += injected * sign * (p.anomaly_scale * p.sigma)
+        if p.floor is not None or p.ceiling is not None:
+            np.clip(values, p.floor, p.ceiling, out=values)
+        self.generated += n
+        return values, injected
+
+    def _refill(self, n: int):
+        values, injected = self.generate(n)
+        self._values, self._injected = values.tolist(), injected.tolist()
+        self._pos = 0
+
+    def read(self) -> float:
+        if self._pos == len(self._values):
+            self._refill(self.block_size)
+        value = self._values[self._pos]
+        self.last_injected = self._injected[self._pos]
+        self._pos += 1
+        return value
+
+    def read_many(self, n: int) -> np.ndarray:
+        """The next `n` samples, continuing where `read()` stopped"""
+        values: list[float] = []
+        while n > 0:
+            if self._pos == len(self._values):
+                # Whole blocks, or one chunk covering a larger request
+                self._refill(max(self.block_size, n))
+            chunk = self._values[self._pos : self._pos + n]
+            self._pos += len(chunk)
+            n -= len(chunk)
+            values += chunk
+        if self._pos:
+            self.last_injected = self._injected[self._pos - 1]
+        return np.asarray(values, dtype=float)
+
+
+class SensorArray:
+    """
+    Many sensors read in lockstep: `read_all()` returns one sample of every
+    sensor. Sensors are named `<prefix><i>` unless given as a dict, and must
+    not be read individually while they belong to an array.
+    """
+
+    def __init__(
+        self, profiles, seed=None, block_size: int = 1024, prefix: str = "sensor-"
+    ):
+        if not isinstance(profiles, dict):
+            profiles = {f"{prefix}{i}": profile for i, profile in enumerate(profiles)}
+        self.sensors = [
+            SimulatedSensor(name, profile, seed, block_size)
+            for name, profile in profiles.items()
+        ]
+        self.names = [sensor.name for sensor in self.sensors]
+        self.block_size = block_size
+        self._block = np.empty((len(self.sensors), 0))
+        self._injected = np.empty((len(self.sensors), 0), dtype=bool)
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return len(self.sensors)
+
+    def _fill(self):
+        self._block = np.empty((len(self.sensors), self.block_size))
+        self._injected = np.empty((len(self.sensors), self.block_size), dtype=bool)
+        for row, sensor in enumerate(self.sensors):
+            self._block[row], self._injected[row] = sensor.generate(self.block_size)
+        self._pos = 0
+
+    def read_all(self) -> np.ndarray:
+        """One sample of every sensor, in the order of `names`"""
+        if self._pos == self._block.shape[1]:
+            self._fill()
+        column = self._block[:, self._pos].copy()
+        self._pos += 1
+        return column
+
+    def read_block(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        All samples of the current block that were not read yet.
+
+        Returns:
+            tuple: (samples, injected spike mask), both shaped (sensors, samples)
+        """
+        if self._pos == self._block.shape[1]:
+            self._fill()
+        start, self._pos = self._pos, self._block.shape[1]
+        return self._block[:, start:], self._injected[:, start:]
+
+
+# Profiles matching the stand-in readings the caretakers used before
+PH_PROFILE = SensorProfile(mean=10.0, sigma=5.0)
+FISH_COUNT_PROFILE = SensorProfile(mean=20.0, sigma=5.0, floor=0.0)
@@ -0,0 +1,207 @@
+"""
+Record-and-replay of caretaker sensor samples.
+
+TraceRecorder appends timestamped samples of named streams (ph, camera,
+sonar) to a binary trace file: a short header naming the streams followed by
+fixed-size little-endian records
+
+    time (float64, epoch s) | value (float64) | stream (uint16)
+
+18 bytes per sample, written in buffered chunks. SensorTrace maps a trace
+file into memory as a NumPy record array, so a trace of millions of samples
+opens instantly and a stream is sliced out without parsing anything.
+TraceReplay feeds the samples back to the caretaker behaviours at their
+recorded pace, N times faster, or as fast as they can be consumed.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator, Optional
+import numpy as np
+from .logger_config import get_logger
+
+logger = get_logger("SensorTrace")
+
+MAGIC = b"FSHTRACE"
+VERSION = 1
+RECORD = struct.Struct("<ddH")
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("value", "<f8"), ("stream", "<u2")])
+STREAMS = ("ph", "camera", "sonar")
+
+
+def _read_header(f) -> tuple[dict, int]:
+    """Header of an open trace file and the offset of its first record"""
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError("Not a sensor trace file")
+    (length,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(length))
+    if header.get("version") != VERSION:
+        raise ValueError(f"Unsupported trace version {header.get('version')}")
+    return header, len(MAGIC) + 4 + length
+
+
+class TraceRecorder:
+    """
+    Appends samples to a trace file. An existing trace with the same streams
+    is continued; a torn record left by a crash is cut off first.
+    """
+
+    def __init__(
+        self,
+        path,
+        streams: Iterable[str] = STREAMS,
+        chunk: int = 512,
+        flush_interval_s: float = 5.0,
+    ):
+        self.path = Path(path)
+        self.streams = list(streams)
+        self.stream_ids = {name: i for i, name in enumerate(self.streams)}
+        self.chunk = chunk
+        self.flush_interval_s = flush_interval_s
+        self.recorded = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size:
+            with open(self.path, "rb") as f:
+                header, offset = _read_header(f)
+            if header["streams"] != self.streams:
+                raise ValueError(
+                    f"{self.path} records streams {header['streams']}, not {self.streams}"
+                )
+            size = self.path.stat().st_size
+            whole = offset + (size - offset) // RECORD.size * RECORD.size
+            if whole != size:
+                os.truncate(self.path, whole)
+            self._file = open(self.path, "ab")
+        else:
+            header = json.dumps({"version": VERSION, "streams": self.streams}).encode()
+            self._file = open(self.path, "wb")
+            self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self._buffer = bytearray(RECORD.size * chunk)
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+
+    def record(self, stream: str, value: float, timestamp: Optional[float] = None):
+        """Buffer one sample; written once the chunk is full or `flush_interval_s` passed"""
+        if timestamp is None:
+            timestamp = time.time()
+        RECORD.pack_into(
+            self._buffer,
+            self._pending * RECORD.size,
+            timestamp,
+            value,
+            self.stream_ids[stream],
+        )
+        self._pending += 1
+        self.recorded += 1
+        if (
+            self._pending == self.chunk
+            or time.monotonic() - self._flushed_at >= self.flush_interval_s
+        ):
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(memoryview(self._buffer)[: self._pending * RECORD.size])
+            self._pending = 0
+        self._file.flush()
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class SensorTrace:
+    """Read-only, memory-mapped view of a trace file"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            header, offset = _read_header(f)
+        self.streams: list[str] = header["streams"]
+        count = (self.path.stat().st_size - offset) // RECORD.size
+        if count:
+            self.records = np.memmap(
+                self.path, dtype=RECORD_DTYPE, mode="r", offset=offset, shape=(count,)
+            )
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def start_time(self) -> Optional[float]:
+        return float(self.records["time"][0]) if len(self) else None
+
+    @property
+    def end_time(self) -> Optional[float]:
+        return float(self.records["time"][-1]) if len(self) else None
+
+    def _ids(self, streams: Optional[Iterable[str]]) -> Optional[list[int]]:
+        if streams is None:
+            return None
+        return [self.streams.index(name) for name in streams if name in self.streams]
+
+    def stream(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Every sample of one stream.
+
+        Returns:
+            tuple: (times, values) arrays in recording order
+        """
+        if name not in self.streams:
+            return np.empty(0), np.empty(0)
+        selected = self.records[self.records["stream"] == self.streams.index(name)]
+        return np.asarray(selected["time"]), np.asarray(selected["value"])
+
+    def samples(
+        self, streams: Optional[Iterable[str]] = None, chunk: int = 4096
+    ) -> Iterator[tuple[str, float, float]]:
+        """(stream, time, value) of the samples of `streams` (all by default), in order"""
+        ids = self._ids(streams)
+        for begin in range(0, len(self), chunk):
+            part = self.records[begin : begin + chunk]
+            if ids is not None:
+                part = part[np.isin(part["stream"], ids)]
+            for stream_id, timestamp, value in zip(
+                part["stream"].tolist(), part["time"].tolist(), part["value"].tolist()
+            ):
+                yield self.streams[stream_id], timestamp, value
+
+
+class TraceReplay:
+    """
+    Plays a trace back at `speed` times its recorded pace (0: no pacing).
+    Each caller of `samples()` gets its own playback, started when it starts
+    iterating.
+    """
+
+    def __init__(self, trace: SensorTrace, speed: float = 1.0):
+        if speed < 0:
+            raise ValueError("Speed must not be negative.")
+        self.trace = trace
+        self.speed = speed
+
+    async def samples(
+        self, streams: Optional[Iterable[str]] = None
+    ) -> AsyncIterator[tuple[str, float, float]]:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        origin = self.trace.start_time
+        for count, (stream, timestamp, value) in enumerate(self.trace.samples(streams)):
+            if self.speed:
+                delay = (timestamp - origin) / self.speed - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif count % 1000 == 0:
+                await asyncio.sleep(0)  # let the other behaviours run
+            yield stream, timestamp, value
+        logger.info("Replay of %s finished", self.trace.path)
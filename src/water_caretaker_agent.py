@@ -1,74 +1,276 @@
-import asyncio
-import json
-from uuid import uuid4 as uuid
 from spade.agent import Agent
-from spade.behaviour import PeriodicBehaviour
+from spade.behaviour import CyclicBehaviour
 from spade.message import Message
+from spade.template import Template
+from .aeration import AerationPump
+from .alarms import AlarmHysteresis, AlarmManager, AlarmPolicy
+from .clock import SYSTEM_CLOCK, PeriodicBehaviour
+from .correlation import new_id
 from .logger_config import get_logger
-from .misc import get_random_data, calculate_z_score
+from .message_codec import CodecError, pack_body, unpack_body
+from .metrics import HANDLER_SECONDS, MetricsAgentMixin
+from .misc import RollingZScore
 from .protocols import Protocols
+from .sampling import AdaptiveSampler
+from .sensor_buffer import SensorBuffer
+from .sensor_simulator import PH_PROFILE, SimulatedSensor, run_seed
 
 logger = get_logger("WaterCaretakerAgent")
 
 
-class WaterCaretakerAgent(Agent):
-    def __init__(self, jid, password, owner_jid):
+class WaterCaretakerAgent(MetricsAgentMixin, Agent):
+    def __init__(
+        self,
+        jid,
+        password,
+        owner_jid,
+        history_size=3600,
+        seed=None,
+        ph_sensor=None,
+        recorder=None,
+        replay=None,
+        clock=None,
+    ):
         super().__init__(jid, password)
+        self.clock = clock or SYSTEM_CLOCK
 
         self.owner_jid = owner_jid
-        self.ph_data = []
+        if ph_sensor is None:
+            seed = run_seed(seed)
+            logger.info("Simulated pH sensor seed: %s", seed)
+            ph_sensor = SimulatedSensor("ph", PH_PROFILE, seed)
+        self.ph_sensor = ph_sensor
+        self.recorder = recorder  # TraceRecorder keeping every pH sample
+        self.replay = replay  # TraceReplay to take the pH samples from instead
+        # keeps the last `history_size` samples
+        self.ph_data = SensorBuffer(history_size)
 
         self.last_values = 10
         self.z_score_alert = 1.1
+        self.z_score_clear = 0.8
+        self.ph_stats = RollingZScore(self.last_values)
+        # pH is read once per 10 s while the average |z| stays under
+        # z_score_alert and 3 samples a second once it reaches it; a single
+        # |z| of 1 is common noise with a 10 sample window, hence the smoothing
+        self.ph_sampler = AdaptiveSampler(
+            slow_s=10.0, fast_s=1.0, batch=3, arm_at=1.0, smoothing=0.3
+        )
+        # One pH excursion raises one alarm: |z| must stay over z_score_alert
+        # for 2 samples to trip and under z_score_clear for 3 samples to re-arm
+        self.ph_alarm = AlarmHysteresis(
+            self.z_score_alert, self.z_score_clear, trip_after=2, clear_after=3
+        )
+        # Pump cycles run in AerationBehaviour, never in the measurement path
+        self.aeration = AerationPump(self.clock, run_s=5.0, rest_s=10.0)
+        self.alarm_recent_samples = 10  # raw samples attached to each alarm
+        # Every alarm to the owner goes through the alarm manager: at most one
+        # notification per 5 minutes, the rest are aggregated into it
+        self.alarms = AlarmManager(
+            self.clock,
+            {
+                Protocols.SEND_WATER_QUALITY_ALARM.value: AlarmPolicy(
+                    suppress_s=300.0, escalate_at=(5, 20), reset_s=1800.0
+                )
+            },
+        )
+
+    def water_quality_summary(self) -> dict:
+        """
+        Bounded summary of the pH stream sent with water quality alarms.
+
+        Returns:
+            dict: z-score window stats, the last `alarm_recent_samples` samples
+            and the index range of the retained history (fetchable on demand
+            via the water_quality_window_request protocol)
+        """
+        window = self.ph_data.window(self.last_values)
+        return {
+            "window": {
+                "size": len(window),
+                "mean": round(self.ph_stats.mean, 4),
+                "std_dev": round(self.ph_stats.std_dev, 4),
+                "min": min(window) if window else None,
+                "max": max(window) if window else None,
+            },
+            "recent": self.ph_data.window(self.alarm_recent_samples).tolist(),
+            "sample_range": [self.ph_data.first_index(), self.ph_data.total - 1],
+        }
 
     class WaterQualityMeasureBehaviour(PeriodicBehaviour):
         async def run(self):
             await self.collect_data()
 
-        async def aeration(self):
-            logger.info("Aeration started (pump ON)")
-            await asyncio.sleep(5)
-            logger.info("Aeration ended (pump OFF)")
-
         async def send_water_quality_alarm(self, z_score):
-            logger.warning(f"ALERT: Unusual pH change! z_score: {z_score}")
-            payload = {"z_score": z_score, "ph_data": self.agent.ph_data}
+            payload = {"z_score": z_score, **self.agent.water_quality_summary()}
+            notification = self.agent.alarms.raise_alarm(
+                Protocols.SEND_WATER_QUALITY_ALARM.value, payload
+            )
+            if notification is None:
+                logger.info("pH alarm suppressed, z_score: %s", z_score)
+                return
+            await self.send_alarm(notification)
+
+        async def send_due_alarms(self):
+            """Send the aggregated notifications of suppressed alarms"""
+            for notification in self.agent.alarms.due():
+                await self.send_alarm(notification)
+
+        async def send_alarm(self, notification):
+            logger.warning(
+                "ALERT: Unusual pH change! z_score: %s (%s, %s)",
+                notification.payload.get("z_score"),
+                notification.level,
+                notification.summary(),
+            )
             try:
                 msg = Message(
                     to=self.agent.owner_jid,
-                    body=json.dumps(payload),
                     metadata={
                         "performative": "request",
-                        "protocol": Protocols.SEND_WATER_QUALITY_ALARM.value,
+                        "protocol": notification.kind,
                         "language": "JSON",
-                        "reply-with": str(uuid()),
-                        "conversation-id": str(uuid()),
-                        "in-reply-to": str(uuid()),
+                        "reply-with": new_id(),
+                        "conversation-id": new_id(),
+                        "in-reply-to": new_id(),
                     },
                 )
+                pack_body(msg, notification.body())
                 await self.send(msg)
-                await self.aeration()
-            except json.JSONDecodeError as e:
-                logger.error(f"JSONDecodeError while sending quality alarm: {e}")
+            except CodecError as e:
+                logger.error("Could not encode water quality alarm: %s", e)
 
         async def collect_data(self):
-            ph_data = get_random_data(10, 5)
-            logger.debug(f"Collected pH data: {ph_data}")
+            sampler = self.agent.ph_sampler
+            now = self.agent.clock.time()
+            batch = self.agent.ph_sensor.read_many(sampler.size).tolist()
+            z_scores = []
+            # A micro-batch covers the interval since the previous read
+            for i, ph_data in enumerate(batch):
+                timestamp = now - (sampler.size - 1 - i) * sampler.spacing
+                z_score = await self.ingest(ph_data, timestamp)
+                if z_score is not None:
+                    z_scores.append(abs(z_score))
+            urgency = None
+            if z_scores:
+                urgency = sum(z_scores) / len(z_scores) / self.agent.z_score_alert
+            # PeriodicBehaviour picks up the new period for the next activation
+            self.period = sampler.update(urgency)
 
-            self.agent.ph_data.append(ph_data)
-            await self.calculate_quality()
+        async def ingest(self, ph_data, timestamp=None):
+            """
+            Store a pH sample and check the water quality.
 
-            await asyncio.sleep(1)
+            Returns:
+                float: z-score of the sample, None while the window fills up
+            """
+            logger.debug("Collected pH data: %s", ph_data)
+
+            self.agent.ph_data.append(ph_data)
+            self.agent.ph_stats.update(ph_data)
+            if self.agent.recorder is not None:
+                if timestamp is None:
+                    timestamp = self.agent.clock.time()
+                self.agent.recorder.record("ph", ph_data, timestamp)
+            return await self.calculate_quality()
 
         async def calculate_quality(self):
-            z_score = calculate_z_score(self.agent.ph_data, self.agent.last_values)
+            z_score = self.agent.ph_stats.z_score()
             if z_score is not None:
                 z_score = round(float(z_score), 2)
 
-                if abs(z_score) > self.agent.z_score_alert:
+                excursion = self.agent.ph_alarm.update(abs(z_score))
+                if excursion:
                     await self.send_water_quality_alarm(z_score)
+                    if not self.agent.aeration.request():
+                        logger.info("Aeration already scheduled, request merged")
+                elif excursion is False:
+                    logger.info("pH back to normal, z_score: %s", z_score)
+            await self.send_due_alarms()
+            return z_score
+
+    class AerationBehaviour(CyclicBehaviour):
+        """Runs the pump cycles requested by the measurement behaviour"""
+
+        def match(self, message) -> bool:
+            # The pump never reads the mailbox
+            return False
+
+        async def run(self):
+            await self.agent.aeration.run_cycle()
+
+    class WaterQualityReplayBehaviour(WaterQualityMeasureBehaviour):
+        """Feed a recorded pH trace through the measurement path instead of the sensor"""
+
+        def match(self, message) -> bool:
+            # Never reads the mailbox
+            return False
+
+        async def run(self):
+            async for _, timestamp, ph_data in self.agent.replay.samples(("ph",)):
+                await self.ingest(ph_data, timestamp)
+            self.kill()
+
+    class HandleWaterQualityWindowRequestBehaviour(CyclicBehaviour):
+        """Send the retained pH history on demand (water_quality_window_request)"""
+
+        async def run(self):
+            msg = await self.receive(timeout=30)
+            if msg:
+                with HANDLER_SECONDS.time(
+                    self.agent.metrics_role, msg.metadata.get("protocol", "")
+                ):
+                    await self.handle(msg)
+
+        async def handle(self, msg):
+            try:
+                request = unpack_body(msg)
+                last = request.get("last")
+                if last is not None:
+                    last = int(last)
+                samples = self.agent.ph_data.window(last).tolist()
+
+                logger.info(
+                    "Received pH window request from %s, sending %s samples",
+                    msg.sender,
+                    len(samples),
+                )
+
+                reply = msg.make_reply()
+                reply.metadata["protocol"] = (
+                    Protocols.WATER_QUALITY_WINDOW_RESPONSE.value
+                )
+                reply.metadata["performative"] = "inform"
+                reply.metadata["language"] = "JSON"
+                reply.metadata["reply-with"] = new_id()
+                reply.metadata["in-reply-to"] = msg.metadata.get("reply-with")
+                reply.metadata["conversation-id"] = msg.metadata.get("conversation-id")
+                pack_body(
+                    reply,
+                    {
+                        "first_index": self.agent.ph_data.total - len(samples),
+                        "ph_data": samples,
+                    },
+                )
+                await self.send(reply)
+            except (CodecError, TypeError, ValueError):
+                logger.error("Error parsing pH window request from message")
 
     async def setup(self):
         logger.info("Agent setup complete")
-        b = self.WaterQualityMeasureBehaviour(period=2)
+        if self.replay is not None:
+            b = self.WaterQualityReplayBehaviour(period=0)
+        else:
+            b = self.WaterQualityMeasureBehaviour(period=self.ph_sampler.interval)
         self.add_behaviour(b)
+        self.add_behaviour(self.AerationBehaviour())
+
+        window_request_template = Template(
+            metadata={
+                "protocol": Protocols.WATER_QUALITY_WINDOW_REQUEST.value,
+                "performative": "request",
+                "language": "JSON",
+            }
+        )
+        self.add_behaviour(
+            self.HandleWaterQualityWindowRequestBehaviour(), window_request_template
+        )
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+from src.aeration import OFF, ON, RESTING, AerationPump
+from src.clock import SimulatedClock
+
+
+def run_pump(script):
+    """Run `script(pump, at)` against a pump cycling in the background"""
+    clock = SimulatedClock(datetime(2026, 5, 1, 9))
+    pump = AerationPump(clock, run_s=5.0, rest_s=10.0)
+
+    async def at(t):
+        await clock.sleep(t - clock.monotonic())
+        return pump.state
+
+    async def main():
+        async def cycles():
+            while True:
+                await pump.run_cycle()
+
+        task = asyncio.create_task(cycles())
+        result = await script(pump, at)
+        task.cancel()
+        return result
+
+    return clock.run(main()), pump
+
+
+def test_cycle_runs_then_rests_then_turns_off():
+    async def script(pump, at):
+        states = [await at(0.0)]
+        assert pump.request()
+        states += [await at(t) for t in (0.1, 4.9, 5.1, 14.9, 15.1)]
+        return states
+
+    states, pump = run_pump(script)
+    assert states == [OFF, ON, ON, RESTING, RESTING, OFF]
+    assert pump.cycles == 1
+
+
+def test_requests_while_running_are_merged():
+    async def script(pump, at):
+        pump.request()
+        await at(1.0)
+        merged = [pump.request(), pump.request()]
+        return merged, await at(15.1)
+
+    (merged, state), pump = run_pump(script)
+    assert merged == [False, False]
+    assert state == OFF
+    assert pump.cycles == 1
+    assert pump.merged == 2
+
+
+def test_request_while_resting_waits_for_the_rest_to_end():
+    async def script(pump, at):
+        pump.request()
+        await at(6.0)
+        started = pump.request()
+        merged = pump.request()
+        states = [await at(t) for t in (14.9, 15.1, 20.1, 30.1)]
+        return started, merged, states
+
+    (started, merged, states), pump = run_pump(script)
+    assert started and not merged
+    # At least rest_s off between cycles, and each cycle runs for run_s
+    assert states == [RESTING, ON, RESTING, OFF]
+    assert pump.cycles == 2
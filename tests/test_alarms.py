@@ -0,0 +1,103 @@
+from datetime import datetime
+from src.alarms import AlarmHysteresis, AlarmManager, AlarmPolicy
+from src.clock import SimulatedClock
+
+PH = "water_quality_alarm"
+
+
+def manager(policy):
+    clock = SimulatedClock(datetime(2026, 5, 1, 9))
+    return AlarmManager(clock, {PH: policy}), clock
+
+
+def test_occurrences_within_the_window_are_suppressed():
+    alarms, clock = manager(AlarmPolicy(suppress_s=300, escalate_at=(), reset_s=900))
+    first = alarms.raise_alarm(PH, {"z_score": 3.0})
+    assert first.level == "warning"
+    assert first.occurrences == 1
+    for _ in range(4):
+        clock.advance(30)
+        assert alarms.raise_alarm(PH, {"z_score": 2.0}) is None
+    assert alarms.suppressed(PH) == 4
+    assert alarms.due() == []
+
+
+def test_due_aggregates_the_suppressed_occurrences():
+    alarms, clock = manager(AlarmPolicy(suppress_s=300, escalate_at=(), reset_s=900))
+    alarms.raise_alarm(PH, {"z_score": 3.0})
+    clock.advance(10)
+    since = clock.time()
+    for z in (2.0, 2.5, 4.0):
+        alarms.raise_alarm(PH, {"z_score": z})
+        clock.advance(10)
+
+    clock.advance(300)
+    (notification,) = alarms.due()
+    assert notification.occurrences == 3
+    assert notification.since == since
+    assert notification.suppressed == 3
+    assert notification.payload == {"z_score": 4.0}
+    body = notification.body()
+    assert body["z_score"] == 4.0
+    assert body["summary"].startswith("3 occurrences since 2026-05-01T09:00:10")
+    # Reported once only
+    assert alarms.due() == []
+
+
+def test_reaching_a_level_is_notified_at_once():
+    alarms, clock = manager(
+        AlarmPolicy(suppress_s=300, escalate_at=(3, 5), reset_s=900)
+    )
+    levels = []
+    for _ in range(6):
+        notification = alarms.raise_alarm(PH, {})
+        levels.append(notification and notification.level)
+        clock.advance(1)
+    assert levels == ["warning", None, "major", None, "critical", None]
+
+
+def test_a_new_episode_starts_at_warning_and_is_notified_at_once():
+    # Episodes end sooner than the suppression window (the fish caretaker's policy)
+    alarms, clock = manager(AlarmPolicy(suppress_s=300, escalate_at=(2,), reset_s=120))
+    assert alarms.raise_alarm(PH, {}).level == "warning"
+    assert alarms.raise_alarm(PH, {}).level == "major"
+
+    clock.advance(121)
+    notification = alarms.raise_alarm(PH, {})
+    assert notification is not None
+    assert notification.level == "warning"
+    # Within the new episode the window applies again
+    clock.advance(10)
+    assert alarms.raise_alarm(PH, {}).level == "major"
+    clock.advance(10)
+    assert alarms.raise_alarm(PH, {}) is None
+
+
+def feed(hysteresis, scores):
+    return [hysteresis.update(score) for score in scores]
+
+
+def test_hysteresis_trips_and_clears_after_the_dwell_counts():
+    alarm = AlarmHysteresis(trip=1.1, clear=0.8, trip_after=2, clear_after=3)
+    assert feed(alarm, [1.5, 1.5]) == [None, True]
+    assert alarm.active
+    assert feed(alarm, [0.5, 0.5, 0.5]) == [None, None, False]
+    assert not alarm.active
+    assert alarm.excursions == 1
+
+
+def test_hysteresis_dwell_counts_need_consecutive_samples():
+    alarm = AlarmHysteresis(trip=1.1, clear=0.8, trip_after=2, clear_after=3)
+    assert feed(alarm, [1.5, 0.5, 1.5, 0.5]) == [None] * 4
+    assert feed(alarm, [1.5, 1.5]) == [None, True]
+    assert feed(alarm, [0.5, 0.5, 1.0, 0.5, 0.5]) == [None] * 5
+    assert alarm.active
+
+
+def test_hysteresis_does_not_chatter_around_the_threshold():
+    alarm = AlarmHysteresis(trip=1.1, clear=0.8, trip_after=2, clear_after=3)
+    # Hovering between clear and trip, with excursions just over the threshold
+    scores = [1.2, 1.15, 1.0, 1.12, 0.9, 1.2, 1.0, 0.95, 1.11, 1.05] * 10
+    changes = [change for change in feed(alarm, scores) if change is not None]
+    assert changes == [True]
+    assert alarm.excursions == 1
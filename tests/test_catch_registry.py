@@ -0,0 +1,108 @@
+from array import array
+from datetime import datetime, timedelta
+from src.catch_registry import CatchRegistry
+
+START = datetime(2026, 5, 1, 9, 0)
+
+
+def catch(species, size, mass, minutes):
+    time = (START + timedelta(minutes=minutes)).isoformat()
+    return {"species": species, "size": size, "mass": mass, "time": time}
+
+
+def registry():
+    catches = CatchRegistry(bucket_s=3600)
+    catches.add("a@localhost", catch("pike", "L", 4.0, 0))
+    catches.add("b@localhost", catch("carp", "M", 1.5, 30))
+    catches.add("a@localhost", catch("carp", "S", 0.5, 70))
+    catches.add("a@localhost", catch("pike", "M", 2.0, 130))
+    return catches
+
+
+def test_records_are_filtered_by_fisher_species_and_time():
+    catches = registry()
+    assert len(catches) == 4
+    assert catches.record(1) == {
+        "fisherman": "b@localhost",
+        **catch("carp", "M", 1.5, 30),
+    }
+
+    def masses(**filters):
+        return [record["mass"] for record in catches.records(**filters)]
+
+    assert masses() == [4.0, 1.5, 0.5, 2.0]
+    assert masses(fisherman="a@localhost") == [4.0, 0.5, 2.0]
+    assert masses(species="carp") == [1.5, 0.5]
+    assert masses(fisherman="a@localhost", species="pike") == [4.0, 2.0]
+    hour = (START + timedelta(hours=1)).timestamp()
+    assert masses(since=hour) == [0.5, 2.0]
+    assert masses(until=hour) == [4.0, 1.5]
+    assert masses(fisherman="a@localhost", since=hour, until=hour + 3600) == [0.5]
+
+
+def test_totals_per_group_and_time_bucket():
+    summary = registry().summary()
+    assert summary["total"] == {"count": 4, "mass": 8.0}
+    assert summary["species"] == {
+        "pike": {"count": 2, "mass": 6.0},
+        "carp": {"count": 2, "mass": 2.0},
+    }
+    assert summary["size"]["M"] == {"count": 2, "mass": 3.5}
+    assert summary["fisher"]["a@localhost"] == {"count": 3, "mass": 6.5}
+    start = START.timestamp()
+    assert summary["bucket"] == {
+        start: {"count": 2, "mass": 5.5},
+        start + 3600: {"count": 1, "mass": 0.5},
+        start + 7200: {"count": 1, "mass": 2.0},
+    }
+
+
+def test_unknown_keys_match_nothing():
+    catches = registry()
+    assert catches.fisher_count("nobody@localhost") == 0
+    assert catches.species_count("salmon") == 0
+    assert list(catches.records(fisherman="nobody@localhost")) == []
+    assert list(catches.records(species="salmon")) == []
+    assert list(catches.records(fisherman="b@localhost", species="pike")) == []
+
+
+def test_malformed_fish_data_is_registered_with_defaults():
+    catches = CatchRegistry()
+    row = catches.add("a@localhost", {"mass": "heavy", "time": START.timestamp()})
+    catches.add("a@localhost", {"species": "perch", "mass": float("nan")})
+    record = catches.record(row)
+    assert (record["species"], record["size"], record["mass"]) == (
+        "Unknown",
+        "Unknown",
+        0.0,
+    )
+    assert record["time"] == START.isoformat()
+    assert catches.total.mass == 0.0
+
+
+def test_any_number_of_distinct_species_and_sizes():
+    catches = CatchRegistry()
+    for i in range(70000):
+        catches.add("a@localhost", {"species": f"s{i}", "size": f"z{i}", "mass": 1})
+    assert catches.record(69999)["species"] == "s69999"
+    assert catches.record(69999)["size"] == "z69999"
+    assert list(catches.records(species="s65536"))[0]["size"] == "z65536"
+
+
+def test_state_round_trip_including_older_snapshots():
+    catches = registry()
+    state = catches.to_state()
+    restored = CatchRegistry()
+    restored.load_state(state)
+    assert restored.summary() == catches.summary()
+    assert list(restored.records()) == list(catches.records())
+
+    # Snapshots written with u16 species and size columns
+    for name in ("_species_col", "_size_col"):
+        state["columns"][name] = array("H", state["columns"][name])
+    restored.load_state(state)
+    assert list(restored.records(fisherman="a@localhost", species="carp")) == list(
+        catches.records(fisherman="a@localhost", species="carp")
+    )
+    restored.add("c@localhost", catch("perch", "S", 0.3, 200))
+    assert restored.species_count("perch") == 1
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from src.clock import PeriodicBehaviour, SimulatedClock
+
+START = datetime(2026, 5, 1, 9, 0)
+
+
+def test_sleeps_advance_virtual_time_without_waiting():
+    clock = SimulatedClock(START)
+
+    async def day():
+        await asyncio.sleep(3600)
+        await clock.sleep(23 * 3600)
+        return clock.now()
+
+    started = time.perf_counter()
+    assert clock.run(day()) == START + timedelta(days=1)
+    assert time.perf_counter() - started < 1.0
+    assert clock.monotonic() == 24 * 3600
+    assert clock.time() == START.timestamp() + 24 * 3600
+
+
+def test_call_later_and_timeouts_follow_virtual_time():
+    clock = SimulatedClock(START)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        fired = []
+        loop.call_later(30, lambda: fired.append(clock.monotonic()))
+        loop.call_at(loop.time() + 10, lambda: fired.append(clock.monotonic()))
+        try:
+            await asyncio.wait_for(asyncio.Event().wait(), timeout=60)
+        except asyncio.TimeoutError:
+            fired.append(("timeout", clock.monotonic()))
+        return fired
+
+    assert clock.run(main()) == [10.0, 30.0, ("timeout", 60.0)]
+
+
+def test_equal_deadlines_run_in_scheduling_order():
+    clock = SimulatedClock(START)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        order = []
+
+        async def sleeper(name):
+            await asyncio.sleep(5)
+            order.append(name)
+
+        for name in "abc":
+            loop.call_later(5, order.append, f"timer {name}")
+        await asyncio.gather(*(sleeper(name) for name in "xyz"))
+        return order
+
+    assert clock.run(main()) == [
+        "timer a",
+        "timer b",
+        "timer c",
+        "x",
+        "y",
+        "z",
+    ]
+    assert clock.monotonic() == 5
+
+
+def test_concurrent_sleepers_wake_in_deadline_order():
+    clock = SimulatedClock(START)
+
+    async def main():
+        woke = []
+
+        async def sleeper(delay):
+            await clock.sleep(delay)
+            woke.append((delay, clock.monotonic()))
+
+        await asyncio.gather(*(sleeper(delay) for delay in (300, 5, 3600, 60)))
+        return woke
+
+    assert clock.run(main()) == [(5, 5), (60, 60), (300, 300), (3600, 3600)]
+
+
+def test_sleep_until_an_epoch_time():
+    clock = SimulatedClock(START)
+    midnight = datetime(2026, 5, 2)
+    clock.run(clock.sleep_until(midnight.timestamp()))
+    assert clock.now() == midnight
+
+
+class Counter(PeriodicBehaviour):
+    async def run(self):
+        self.agent.runs.append(self.agent.clock.monotonic())
+
+
+def test_periodic_behaviour_runs_on_the_virtual_period():
+    clock = SimulatedClock(START)
+    behaviour = Counter(period=10)
+    behaviour.agent = type("Agent", (), {"clock": clock, "runs": []})()
+
+    async def main():
+        while clock.monotonic() < 35:
+            await behaviour._run()
+        return behaviour.agent.runs
+
+    assert clock.run(main()) == [0, 10, 20, 30]
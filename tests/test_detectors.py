@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from src.detectors import DetectionEngine, Detector, ZScoreDetector
+from src.misc import RollingZScore
+
+
+def streams():
+    rng = np.random.default_rng(19)
+    gaussian = rng.normal(10.0, 2.0, 2000)
+    outliers = rng.normal(10.0, 2.0, 2000)
+    spikes = rng.random(2000) < 0.02
+    outliers[spikes] += rng.choice([-1e6, 1e6], spikes.sum())
+    return {"gaussian": gaussian, "outliers": outliers}
+
+
+def rolling_z_scores(data, window):
+    stats = RollingZScore(window)
+    scores = []
+    for x in data:
+        stats.update(x)
+        z = stats.z_score()
+        scores.append(np.nan if z is None else z)
+    return np.array(scores)
+
+
+@pytest.mark.parametrize("window", [2, 3, 5, 10, 31, 50])
+@pytest.mark.parametrize("stream", ["gaussian", "outliers"])
+def test_zscore_detector_matches_rolling_z_score(window, stream):
+    data = streams()[stream]
+    detector = ZScoreDetector(window)
+    # Uneven micro-batches, so windows straddle batch boundaries
+    rng = np.random.default_rng(window)
+    scores, start = [], 0
+    while start < len(data):
+        size = int(rng.integers(1, 40))
+        scores.append(detector.scores(data[start : start + size]))
+        start += size
+    scores = np.concatenate(scores)
+
+    expected = rolling_z_scores(data, window)
+    assert np.array_equal(np.isnan(scores), np.isnan(expected))
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-9, equal_nan=True)
+
+
+def test_zscore_detector_constant_window_scores_zero():
+    scores = ZScoreDetector(5).scores(np.full(20, 0.1))
+    assert np.isnan(scores[0])
+    assert np.all(scores[1:] == 0.0)
+
+
+def test_evaluate_reports_the_peak_score_of_the_batch():
+    batch = [10.0, 11.0, 9.0, 10.0, 10.5, 60.0, 10.0, 10.2, 9.8, 10.1]
+    engine = DetectionEngine({"camera": [ZScoreDetector(5, threshold=1.9)]})
+    engine.extend("camera", batch)
+    result = engine.evaluate()["camera"]
+
+    # The spike alarms mid-batch; the latest sample is back to normal
+    assert result.alarms["zscore"] == 1
+    assert result.peak("zscore") > 1.9
+    assert abs(result.score("zscore")) < 1.9
+
+
+def test_detector_without_scores_cannot_be_instantiated():
+    class Stub(Detector):
+        name = "stub"
+
+    with pytest.raises(TypeError):
+        Stub(1.0)
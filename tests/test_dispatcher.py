@@ -0,0 +1,118 @@
+import asyncio
+import zlib
+from spade.message import Message
+from src.dispatcher import ProtocolDispatcher
+from src.protocols import Protocols
+
+ENTER = Protocols.IF_CAN_ENTER_REQUEST
+EXIT = Protocols.REGISTER_EXIT_REQUEST
+
+
+class SlowForOneFisher:
+    def __init__(self, slow_sender):
+        self.slow_sender = slow_sender
+        self.handled = []
+
+    async def handle(self, msg):
+        self.handled.append(msg.body)
+        if str(msg.sender) == self.slow_sender:
+            await asyncio.sleep(3600)
+
+
+def message(sender, protocol, body):
+    return Message(sender=sender, body=body, metadata={"protocol": protocol.value})
+
+
+def worker(key, workers=2):
+    return zlib.crc32(key.encode()) % workers
+
+
+def dispatcher_for(handler, incoming, **kwargs):
+    dispatcher = ProtocolDispatcher(**kwargs)
+    dispatcher.route(ENTER, handler)
+    dispatcher.route(EXIT, handler)
+    dispatcher.agent = type("Agent", (), {"metrics_role": "TestAgent"})()
+    pending = iter(incoming)
+
+    async def receive(timeout=None):
+        return next(pending, None)
+
+    dispatcher.receive = receive
+    return dispatcher
+
+
+def test_full_queue_never_blocks_other_keys():
+    slow, other = "slow@localhost", "other@localhost"
+    assert worker(slow) != worker(other)
+
+    async def run():
+        handler = SlowForOneFisher(slow)
+        incoming = [message(slow, ENTER, f"slow{i}") for i in range(6)]
+        incoming += [message(slow, EXIT, "slow exit")]
+        incoming += [message(other, ENTER, f"other{i}") for i in range(3)]
+        dispatcher = dispatcher_for(
+            handler,
+            incoming,
+            workers=2,
+            queue_size=2,
+            on_busy=lambda msg: (
+                "busy" if msg.metadata["protocol"] == ENTER.value else None
+            ),
+        )
+        replies = []
+
+        async def send(reply):
+            replies.append(reply)
+
+        dispatcher.send = send
+        await dispatcher.on_start()
+        for _ in incoming:
+            # A blocked dispatch loop would time out here
+            await asyncio.wait_for(dispatcher.run(), 1)
+        await asyncio.sleep(0.1)
+        deferred = len(dispatcher._overflow[worker(slow)])
+        await dispatcher.on_end()
+        return handler.handled, replies, deferred
+
+    handled, replies, deferred = asyncio.run(run())
+    # slow0 is being handled, slow1 and slow2 wait in the queue
+    assert handled == ["slow0", "other0", "other1", "other2"]
+    assert replies == ["busy"] * 3
+    assert deferred == 1  # the exit cannot be refused, it waits for the queue
+
+
+class Gated:
+    """Holds the first message until `gate` is set"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.handled = []
+
+    async def handle(self, msg):
+        self.handled.append(msg.body)
+        if len(self.handled) == 1:
+            await self.gate.wait()
+
+
+def test_overflow_keeps_one_fishers_messages_in_order():
+    fisher = "fisher@localhost"
+
+    async def run():
+        handler = Gated()
+        incoming = [message(fisher, EXIT, f"m{i}") for i in range(6)]
+        dispatcher = dispatcher_for(handler, incoming, workers=1, queue_size=1)
+        await dispatcher.on_start()
+        # m0 is being handled, m1 fills the queue, m2 and m3 overflow
+        for _ in range(4):
+            await dispatcher.run()
+        handler.gate.set()
+        while len(handler.handled) < 2:
+            await asyncio.sleep(0)
+        # The queue has room again, but m4 and m5 must not overtake m2 and m3
+        await dispatcher.run()
+        await dispatcher.run()
+        await asyncio.sleep(0.1)
+        await dispatcher.on_end()
+        return handler.handled
+
+    assert asyncio.run(run()) == [f"m{i}" for i in range(6)]
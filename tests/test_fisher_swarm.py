@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+from spade.message import Message
+from src.clock import SimulatedClock
+from src.fisher_swarm import FishermanPlan, ScriptedFisherAgent
+
+
+class ScriptedOwner:
+    """Answers the n-th entrance request with `answers[n]` after `delay_s` seconds"""
+
+    def __init__(self, answers, delay_s):
+        self.answers = answers
+        self.delay_s = delay_s
+        self.requests = 0
+        self.exits = 0
+
+    async def request_enter_fishery(self):
+        answer = self.answers[self.requests]
+        self.requests += 1
+        if answer == "undecodable":
+            return None
+        future = asyncio.get_running_loop().create_future()
+        if answer is None:
+            # No response: the correlation timeout resolves the request to None
+            asyncio.get_running_loop().call_later(30.0, future.set_result, None)
+        else:
+            msg = Message(metadata={"performative": answer})
+            asyncio.get_running_loop().call_later(self.delay_s, future.set_result, msg)
+        return future
+
+    async def register_exit(self):
+        self.exits += 1
+
+
+def enter(answers, delay_s):
+    clock = SimulatedClock(datetime(2026, 5, 1, 9))
+    agent = ScriptedFisherAgent(
+        "swarm1@localhost",
+        "",
+        "owner@localhost",
+        FishermanPlan(1, 0.0, 60.0, [], []),
+        entrance_timeout_s=10.0,
+        entrance_retry_s=5.0,
+        max_entrance_attempts=len(answers),
+        clock=clock,
+    )
+    behaviour = agent.ScriptedFishingBehaviour()
+    behaviour.set_agent(agent)
+    owner = ScriptedOwner(answers, delay_s)
+    behaviour.request_enter_fishery = owner.request_enter_fishery
+    behaviour.register_exit = owner.register_exit
+    return clock.run(behaviour.enter()), owner, clock
+
+
+def test_late_agree_admits_during_the_next_attempt():
+    entered, owner, clock = enter(["agree", "refuse", "refuse"], delay_s=12.0)
+    assert entered
+    assert owner.requests == 2
+    assert owner.exits == 0
+    # The agree came in during the retry pause and is seen at the next attempt
+    assert clock.elapsed == 15.0
+
+
+def test_agree_after_giving_up_is_given_back():
+    entered, owner, _ = enter(["agree", "refuse"], delay_s=40.0)
+    assert not entered
+    assert owner.exits == 1
+
+
+def test_unanswered_and_undecodable_responses_are_refusals():
+    entered, owner, _ = enter([None, "undecodable", "refuse"], delay_s=1.0)
+    assert not entered
+    assert owner.requests == 3
+    assert owner.exits == 0
@@ -0,0 +1,107 @@
+import asyncio
+import sqlite3
+import threading
+import pytest
+from src.ledger import ADMIT, CATCH, EXIT, EventLedger, LedgerError
+
+
+class FailingConnection:
+    """sqlite3 connection whose first `failures` inserts fail once `go` is set"""
+
+    def __init__(self, db, failures):
+        self._db = db
+        self.failures = failures
+        self.go = threading.Event()
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def executemany(self, *args):
+        self.go.wait()
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("disk I/O error")
+        return self._db.executemany(*args)
+
+
+def test_events_are_returned_in_order_and_filtered(tmp_path):
+    ledger = EventLedger(str(tmp_path / "ledger.sqlite"), clock=lambda: 123.0)
+    assert ledger.append("owner", ADMIT, "a") == 1
+    assert ledger.append("caretaker", CATCH, "a", {"species": "pike"}) == 2
+    assert ledger.append("owner", EXIT, "a") == 3
+
+    events = list(ledger.events())
+    assert [e.seq for e in events] == [1, 2, 3]
+    assert events[1].data == {"species": "pike"}
+    assert all(e.time == 123.0 for e in events)
+    assert [e.kind for e in ledger.events(source="owner")] == [ADMIT, EXIT]
+    assert [e.seq for e in ledger.events(kinds=[CATCH, EXIT])] == [2, 3]
+    assert [e.seq for e in ledger.events(after_seq=2)] == [3]
+    ledger.close()
+
+
+def test_burst_is_written_in_few_group_commits(tmp_path):
+    ledger = EventLedger(str(tmp_path / "ledger.sqlite"), max_batch=1000)
+
+    async def burst():
+        seqs = [ledger.append("owner", ADMIT, f"fisher{i}") for i in range(5000)]
+        await ledger.committed(seqs[-1])
+        return seqs
+
+    seqs = asyncio.run(burst())
+    assert seqs == list(range(1, 5001))
+    assert ledger.committed_seq == 5000
+    # One disk sync per batch, not per event
+    assert 5 <= ledger.batches < 100
+    assert len(list(ledger.events())) == 5000
+    ledger.close()
+
+
+def test_committed_waits_for_the_disk(tmp_path):
+    ledger = EventLedger(str(tmp_path / "ledger.sqlite"))
+
+    async def append_and_wait():
+        seq = ledger.append("owner", ADMIT, "a")
+        await ledger.committed()
+        return seq
+
+    seq = asyncio.run(append_and_wait())
+    assert ledger.committed_seq >= seq
+    ledger.close()
+
+
+def test_reopened_ledger_continues_the_sequence(tmp_path):
+    path = str(tmp_path / "ledger.sqlite")
+    ledger = EventLedger(path)
+    ledger.append("owner", ADMIT, "a")
+    ledger.append("owner", EXIT, "a")
+    ledger.close()
+
+    reopened = EventLedger(path)
+    assert reopened.last_seq == reopened.committed_seq == 2
+    assert reopened.append("owner", ADMIT, "b") == 3
+    assert [e.subject for e in reopened.events()] == ["a", "a", "b"]
+    reopened.close()
+
+
+def test_failed_commit_fails_the_waiters_and_is_retried(tmp_path):
+    ledger = EventLedger(str(tmp_path / "ledger.sqlite"), retry_delay_s=0.5)
+    db = ledger._db = FailingConnection(ledger._db, failures=1)
+
+    async def append_and_wait():
+        seq = ledger.append("owner", ADMIT, "a")
+        waiter = asyncio.ensure_future(ledger.committed(seq))
+        await asyncio.sleep(0)
+        db.go.set()
+        with pytest.raises(LedgerError):
+            await waiter
+        assert ledger.committed_seq == 0
+        # The batch is retried and nothing newer is written before it
+        later = ledger.append("owner", EXIT, "a")
+        await ledger.committed(later)
+        return seq
+
+    seq = asyncio.run(append_and_wait())
+    assert ledger.committed_seq == seq + 1
+    assert [(e.seq, e.kind) for e in ledger.events()] == [(1, ADMIT), (2, EXIT)]
+    ledger.close()
@@ -0,0 +1,38 @@
+import logging
+import queue
+from src.logger_config import DroppingQueueHandler
+
+
+def record(msg, args):
+    return logging.LogRecord(
+        "fishery_system.Test", logging.INFO, "", 0, msg, args, None
+    )
+
+
+def test_formatting_is_left_to_the_listener_thread():
+    handler = DroppingQueueHandler(queue.Queue())
+    original = record("%s fishermen, limit %d", ("12", 300))
+    handler.handle(original)
+    queued = handler.queue.get_nowait()
+    assert queued is not original
+    assert queued.args == ("12", 300)
+    assert queued.getMessage() == "12 fishermen, limit 300"
+    assert original.msg == "%s fishermen, limit %d"
+
+
+def test_mutable_arguments_are_formatted_at_once():
+    handler = DroppingQueueHandler(queue.Queue())
+    catches = ["pike"]
+    original = record("catches: %s", (catches,))
+    handler.handle(original)
+    catches.append("carp")
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "catches: ['pike']"
+    assert original.args == (catches,)
+
+
+def test_full_queue_drops_records():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(record("sample", None))
+    assert handler.dropped == 2
@@ -0,0 +1,117 @@
+import base64
+import pytest
+from spade.message import Message
+from src.message_codec import (
+    BIN,
+    JSON,
+    SCHEMAS,
+    CodecError,
+    decode_body,
+    encode_body,
+    pack_body,
+    unpack_body,
+)
+from src.protocols import Protocols
+
+SAMPLES = {"str": "Szczupak ąę", "f64": -1.25, "i64": -(2**40), "bool": True}
+
+
+def sample(kind):
+    """A value of `kind` using every key of every schema"""
+    if isinstance(kind, str):
+        return SAMPLES[kind]
+    if kind[0] == "list":
+        return [sample(kind[1]), sample(kind[1])]
+    return {key: sample(field_kind) for key, field_kind in kind[1]}
+
+
+@pytest.mark.parametrize("protocol", list(SCHEMAS), ids=lambda p: p.value)
+def test_every_schema_round_trips_as_binary(protocol):
+    payload = sample(("struct", SCHEMAS[protocol]))
+    body, used = encode_body(protocol.value, payload, BIN)
+    assert used == BIN
+    assert decode_body(protocol.value, body, BIN) == payload
+
+    # Keys may be missing, None counts as missing
+    first_key, *other_keys = [key for key, _ in SCHEMAS[protocol]]
+    partial = {first_key: payload[first_key]}
+    body, used = encode_body(
+        protocol.value, {**partial, **dict.fromkeys(other_keys)}, BIN
+    )
+    assert used == BIN
+    assert decode_body(protocol.value, body, used) == partial
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"species": "pike", "bait": "worm"},  # key outside the schema
+        {"species": "pike", "mass": "heavy"},  # wrong type
+        {"species": "pike", "mass": True},  # bool is not a number
+        {"species": "x" * 70000},  # longer than a u16 length prefix
+    ],
+)
+def test_payloads_outside_the_schema_fall_back_to_json(payload):
+    protocol = Protocols.IF_CAN_TAKE_FISH_REQUEST.value
+    body, used = encode_body(protocol, payload, BIN)
+    assert used == JSON
+    assert decode_body(protocol, body, used) == payload
+
+
+def test_out_of_range_integers_fall_back_to_json():
+    protocol = Protocols.REGISTER_EXIT_REQUEST.value
+    payload = {"fisherman": "a@localhost", "fishes_taken": 2**70}
+    body, used = encode_body(protocol, payload, BIN)
+    assert used == JSON
+    assert decode_body(protocol, body, used) == payload
+
+
+def test_protocols_without_a_schema_are_json():
+    body, used = encode_body("set_feeding_parameters", {"kg": 2}, BIN)
+    assert used == JSON
+    assert decode_body("set_feeding_parameters", body) == {"kg": 2}
+
+
+def test_encoding_metadata_follows_the_body():
+    protocol = Protocols.IF_CAN_ENTER_RESPONSE.value
+    msg = Message(metadata={"protocol": protocol, "language": "JSON"})
+    pack_body(msg, {"allow": True, "reason": ""}, BIN)
+    assert msg.metadata["encoding"] == BIN
+    assert msg.metadata["language"] == "JSON"
+    assert unpack_body(msg) == {"allow": True, "reason": ""}
+
+    # Re-packed as JSON, e.g. a reply built from a binary request
+    pack_body(msg, {"allow": False, "reason": "full"}, JSON)
+    assert "encoding" not in msg.metadata
+    assert unpack_body(msg) == {"allow": False, "reason": "full"}
+
+
+def binary_body(protocol, payload):
+    body, _ = encode_body(protocol, payload, BIN)
+    return base64.b64decode(body)
+
+
+@pytest.mark.parametrize("cut", [1, 3, 9])
+def test_truncated_binary_body_raises(cut):
+    protocol = Protocols.IF_CAN_TAKE_FISH_REQUEST.value
+    data = binary_body(protocol, sample(("struct", SCHEMAS[Protocols(protocol)])))
+    body = base64.b64encode(data[:-cut]).decode()
+    with pytest.raises(CodecError):
+        decode_body(protocol, body, BIN)
+
+
+def test_corrupt_bodies_raise():
+    protocol = Protocols.WATER_QUALITY_WINDOW_RESPONSE.value
+    data = binary_body(protocol, {"first_index": 1, "ph_data": [7.0]})
+    with pytest.raises(CodecError):
+        decode_body(protocol, "not base64!", BIN)
+    with pytest.raises(CodecError):
+        decode_body(protocol, base64.b64encode(data + b"\0").decode(), BIN)
+    with pytest.raises(CodecError):
+        decode_body(protocol, '{"first_index": 1,', JSON)
+    with pytest.raises(CodecError):
+        decode_body(protocol, "AAAA", "XML")
+    # A string whose length prefix points past the end of the body
+    protocol = Protocols.REGISTER_EXIT_RESPONSE.value
+    with pytest.raises(CodecError):
+        decode_body(protocol, base64.b64encode(b"\x01\xff\x00ab").decode(), BIN)
@@ -0,0 +1,43 @@
+import random
+import pytest
+from src.misc import RollingZScore, calculate_z_score
+
+
+def gaussian(seed, size=600):
+    rng = random.Random(seed)
+    return [rng.gauss(7.0, 0.5) for _ in range(size)]
+
+
+def with_outliers(seed, size=600):
+    rng = random.Random(seed)
+    data = gaussian(seed, size)
+    for i in range(0, size, 37):
+        data[i] += rng.choice([-1.0, 1.0]) * 1e6
+    return data
+
+
+@pytest.mark.parametrize("n", range(1, 51))
+@pytest.mark.parametrize("stream", [gaussian, with_outliers])
+def test_rolling_z_score_matches_calculate_z_score(n, stream):
+    data = stream(n)
+    stats = RollingZScore(n)
+    for i, x in enumerate(data, 1):
+        stats.update(x)
+        expected = calculate_z_score(data[:i], n)
+        if expected is None:
+            assert stats.z_score() is None
+        else:
+            assert stats.z_score() == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+def test_rolling_z_score_constant_stream():
+    stats = RollingZScore(5)
+    for _ in range(12):
+        stats.update(3.0)
+    assert stats.z_score() == 0.0
+    assert stats.std_dev == 0.0
+
+
+def test_rolling_z_score_rejects_empty_window():
+    with pytest.raises(ValueError):
+        RollingZScore(0)
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.owner_sharding import ConsistentHashRing, SharedCapacityStore
+
+KEYS = [f"fisher{i}@localhost" for i in range(2000)]
+
+
+def test_ring_is_deterministic_and_uses_every_node():
+    nodes = ["owner1@localhost", "owner2@localhost", "owner3@localhost"]
+    ring, again = ConsistentHashRing(nodes), ConsistentHashRing(list(reversed(nodes)))
+    placement = [ring.node_for(key) for key in KEYS]
+    assert placement == [again.node_for(key) for key in KEYS]
+    for node in nodes:
+        assert placement.count(node) > len(KEYS) / len(nodes) / 2
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = ConsistentHashRing(["a", "b", "c"])
+    after = ConsistentHashRing(["a", "b", "c", "d"])
+    moved = [key for key in KEYS if before.node_for(key) != after.node_for(key)]
+    assert all(after.node_for(key) == "d" for key in moved)
+    assert len(moved) < len(KEYS) / 2
+
+
+def test_ring_needs_a_node():
+    with pytest.raises(ValueError):
+        ConsistentHashRing([])
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "owner_state.sqlite")
+
+
+def test_admit_and_release(store_path):
+    store = SharedCapacityStore(store_path)
+    assert store.admit("a", limit=2) == (True, "Entrance allowed.")
+    assert store.admit("a", limit=2)[0] is False  # already inside
+    assert store.admit("b", limit=2)[0] is True
+    assert store.admit("c", limit=2)[0] is False  # at capacity
+    assert store.release("a") is True
+    assert store.release("a") is False
+    assert store.admit("c", limit=2)[0] is True
+    assert store.active_fishermen() == {"b", "c"}
+    store.close()
+
+
+def test_replicas_never_admit_over_the_limit(store_path):
+    replicas = [SharedCapacityStore(store_path) for _ in range(4)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(
+            pool.map(
+                lambda i: replicas[i % 4].admit(
+                    f"fisher{i}", limit=25, replica=str(i % 4)
+                ),
+                range(200),
+            )
+        )
+    assert sum(allowed for allowed, _ in results) == 25
+    assert replicas[0].active_count() == 25
+    for store in replicas:
+        store.close()
+
+
+def test_replicas_never_grant_more_takes_than_the_limit(store_path):
+    replicas = [SharedCapacityStore(store_path) for _ in range(4)]
+    with ThreadPoolExecutor(8) as pool:
+        granted = list(
+            pool.map(lambda i: replicas[i % 4].take_fish(100, 3), range(100))
+        )
+    assert sum(granted) == 100
+    assert replicas[1].fishes_taken() == 100
+    for store in replicas:
+        store.close()
+
+
+def test_quota_window_resets_the_counter_once(store_path):
+    first, second = SharedCapacityStore(store_path), SharedCapacityStore(store_path)
+    assert first.take_fish(10, 4) == 4
+    assert first.start_quota_window(86400.0) is True
+    assert second.start_quota_window(86400.0) is False  # already started by a replica
+    assert second.fishes_taken() == 0
+    assert second.take_fish(10, 20) == 10
+    assert first.start_quota_window(0.0) is False  # an older window never resets
+    assert first.fishes_taken() == 10
+    first.close()
+    second.close()
@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from spade.message import Message
+from src import FishCaretakerAgent, OwnerAgent
+from src.clock import SimulatedClock
+from src.ledger import EventLedger
+from src.message_codec import pack_body
+from src.protocols import Protocols
+from tests.test_ledger import FailingConnection
+from src.persistence import SnapshotStore
+
+START = datetime(2026, 5, 1, 9, 0)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "ledger.sqlite"), str(tmp_path / "snapshots")
+
+
+def owner(ledger, store=None, clock=None):
+    return OwnerAgent(
+        "owner@localhost",
+        "",
+        "water_caretaker@localhost",
+        "fish_caretaker@localhost",
+        gui=False,
+        ledger=ledger,
+        snapshot_store=store,
+        clock=clock or SimulatedClock(START),
+    )
+
+
+def test_owner_restores_snapshot_plus_later_events(paths):
+    ledger_path, snapshot_dir = paths
+    clock = SimulatedClock(START)
+    ledger = EventLedger(ledger_path, clock=clock.time)
+    store = SnapshotStore(snapshot_dir)
+    first = owner(ledger, store, clock)
+    for jid in ("a", "b", "c"):
+        first.admit_fisherman(jid)
+    first.take_fish()
+    first.take_fish_batch(3)
+    first.release_fisherman("b")
+    asyncio.run(first.save_snapshot())
+    assert first.snapshot_seq == ledger.last_seq
+    # After the snapshot: replayed from the ledger
+    first.admit_fisherman("d")
+    first.take_fish()
+    ledger.close()
+
+    ledger = EventLedger(ledger_path, clock=clock.time)
+    restored = owner(ledger, SnapshotStore(snapshot_dir), clock)
+    restored.restore_state()
+    from_scratch = owner(ledger, None, clock)
+    from_scratch.restore_state()
+    ledger.close()
+
+    for agent in (restored, from_scratch):
+        assert agent.active_fishermen == {"a", "c", "d"}
+        assert agent.fishes_taken_count == 5
+    assert restored.snapshot_seq == first.snapshot_seq
+
+
+def test_takes_of_an_earlier_quota_window_are_not_restored(paths):
+    ledger_path, snapshot_dir = paths
+    clock = SimulatedClock(START)
+    ledger = EventLedger(ledger_path, clock=clock.time)
+    first = owner(ledger, SnapshotStore(snapshot_dir), clock)
+    first.admit_fisherman("a")
+    first.take_fish_batch(4)
+    asyncio.run(first.save_snapshot())
+    ledger.close()
+
+    # Restarted the next day, without the reset ever having run
+    clock.advance(timedelta(days=1).total_seconds())
+    ledger = EventLedger(ledger_path, clock=clock.time)
+    restored = owner(ledger, SnapshotStore(snapshot_dir), clock)
+    restored.restore_state()
+    ledger.close()
+    assert restored.active_fishermen == {"a"}
+    assert restored.fishes_taken_count == 0
+
+
+def test_unreadable_snapshot_falls_back_to_the_whole_ledger(paths):
+    ledger_path, snapshot_dir = paths
+    clock = SimulatedClock(START)
+    ledger = EventLedger(ledger_path, clock=clock.time)
+    store = SnapshotStore(snapshot_dir)
+    first = owner(ledger, store, clock)
+    first.admit_fisherman("a")
+    first.take_fish()
+    asyncio.run(first.save_snapshot())
+    store.path_for("owner@localhost").write_text('{"seq": 2, "sta')
+
+    restored = owner(ledger, store, clock)
+    restored.restore_state()
+    ledger.close()
+    assert restored.active_fishermen == {"a"}
+    assert restored.fishes_taken_count == 1
+
+
+def test_fish_caretaker_restores_its_catch_registry(paths):
+    ledger_path, snapshot_dir = paths
+    ledger = EventLedger(ledger_path)
+    store = SnapshotStore(snapshot_dir)
+
+    def caretaker():
+        return FishCaretakerAgent(
+            "fish_caretaker@localhost",
+            "",
+            "owner@localhost",
+            ledger=ledger,
+            snapshot_store=store,
+            seed=1,
+        )
+
+    first = caretaker()
+    for i in range(30):
+        fish = {
+            "species": ["pike", "carp", "perch"][i % 3],
+            "size": "big" if i % 2 else "small",
+            "mass": 0.5 + i / 10,
+            "time": (START + timedelta(minutes=i)).isoformat(),
+        }
+        first.register_catch(f"fisher{i % 4}", fish)
+        if i == 19:
+            asyncio.run(first.save_snapshot())
+
+    restored = caretaker()
+    restored.restore_state()
+    ledger.close()
+    assert len(restored.catches) == 30
+    assert restored.catches.to_state() == first.catches.to_state()
+
+
+def test_owner_refuses_and_undoes_changes_it_could_not_record(paths):
+    ledger_path, _ = paths
+    ledger = EventLedger(ledger_path, retry_delay_s=0.01, max_retry_delay_s=0.01)
+    # The disk stays broken for the whole test
+    ledger._db = FailingConnection(ledger._db, failures=10**6)
+    ledger._db.go.set()
+    agent = owner(ledger)
+    replies = []
+
+    async def send(reply):
+        replies.append(reply)
+
+    async def request(behaviour, protocol, body):
+        behaviour.set_agent(agent)
+        behaviour.send = send
+        msg = Message(
+            to="owner@localhost",
+            sender="b@localhost",
+            metadata={"protocol": protocol.value, "reply-with": "r"},
+        )
+        pack_body(msg, body)
+        await behaviour.handle(msg)
+        return replies[-1]
+
+    async def run():
+        enter = await request(
+            agent.HandleIfCanEnterRequestBehaviour(),
+            Protocols.IF_CAN_ENTER_REQUEST,
+            {"fisherman_data": {"jid": "b@localhost"}},
+        )
+        take = await request(
+            agent.HandleIfCanTakeFishBehaviour(),
+            Protocols.IF_CAN_TAKE_FISH_REQUEST,
+            {"species": "pike", "size": "L", "mass": 4.0},
+        )
+        return enter, take
+
+    enter, take = asyncio.run(run())
+    assert enter.metadata["performative"] == "refuse"
+    assert take.metadata["performative"] == "refuse"
+    assert agent.active_fishermen == set()
+    assert agent.fishes_taken_count == 0
+    ledger.close()
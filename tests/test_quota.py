@@ -0,0 +1,63 @@
+from datetime import datetime, time
+import pytest
+from src.quota import RateLimiter, quota_window_start
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "now, reset_at, expected",
+    [
+        (datetime(2026, 5, 1, 9, 30), time(0, 0), datetime(2026, 5, 1, 0, 0)),
+        (datetime(2026, 5, 1, 0, 0), time(0, 0), datetime(2026, 5, 1, 0, 0)),
+        (datetime(2026, 5, 1, 5, 59, 59), time(6, 0), datetime(2026, 4, 30, 6, 0)),
+        (datetime(2026, 5, 1, 6, 0), time(6, 0), datetime(2026, 5, 1, 6, 0)),
+        (datetime(2026, 3, 1, 1, 0), time(4, 30), datetime(2026, 2, 28, 4, 30)),
+    ],
+)
+def test_quota_window_start(now, reset_at, expected):
+    assert quota_window_start(now, reset_at) == expected
+
+
+def test_burst_then_steady_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2.0, burst=5, clock=clock)
+    assert [limiter.allow("a") for _ in range(6)] == [True] * 5 + [False]
+    clock.now = 0.5  # one token back
+    assert limiter.allow("a") is True
+    assert limiter.allow("a") is False
+    clock.now = 100.0  # refill is capped at the burst
+    assert sum(limiter.allow("a") for _ in range(10)) == 5
+    assert limiter.rejected == 7
+
+
+def test_keys_have_separate_buckets():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1.0, burst=1, clock=clock)
+    assert limiter.allow("a") is True
+    assert limiter.allow("a") is False
+    assert limiter.allow("b") is True
+
+
+def test_prune_forgets_only_refilled_buckets():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1.0, burst=2, clock=clock, max_keys=4)
+    for key in "abcd":
+        limiter.allow(key)
+    clock.now = 10.0
+    limiter.allow("e")  # table full: the refilled buckets are dropped
+    assert set(limiter.buckets) == {"e"}
+    limiter.allow("e")
+    assert limiter.allow("e") is False  # pruning never hands out extra tokens
+
+
+@pytest.mark.parametrize("rate, burst", [(0, 5), (-1, 5), (1, 0)])
+def test_invalid_limits(rate, burst):
+    with pytest.raises(ValueError):
+        RateLimiter(rate, burst)
@@ -0,0 +1,58 @@
+import pytest
+from src.sampling import AdaptiveSampler
+
+
+def sampler(**kwargs):
+    return AdaptiveSampler(slow_s=10.0, fast_s=1.0, batch=3, calm_after=2, **kwargs)
+
+
+def test_starts_fast_and_holds_while_warming_up():
+    s = sampler()
+    assert (s.interval, s.size) == (1.0, 3)
+    assert s.update(None) == 1.0
+    assert s.spacing == pytest.approx(1 / 3)
+
+
+def test_quiet_signal_backs_off_to_the_slow_interval():
+    s = sampler()
+    intervals = [s.update(0.1) for _ in range(10)]
+    # The interval doubles after every `calm_after` calm readings, up to slow_s
+    assert intervals == [1.0, 2.0, 2.0, 4.0, 4.0, 8.0, 8.0, 10.0, 10.0, 10.0]
+    assert s.size == 1
+    assert s.spacing == 10.0
+
+
+def test_reading_near_the_threshold_switches_to_fast_batches_at_once():
+    s = sampler()
+    for _ in range(10):
+        s.update(0.1)
+    assert s.update(0.9) == 1.0
+    assert s.size == 3
+    # Calm readings count again from zero
+    assert [s.update(0.1) for _ in range(4)] == [1.0, 2.0, 2.0, 4.0]
+
+
+def test_smoothing_ignores_a_single_noisy_reading():
+    s = sampler(arm_at=1.0, smoothing=0.3)
+    for _ in range(10):
+        s.update(0.2)
+    assert s.update(2.0) == 10.0  # smoothed urgency 0.74
+    # A sustained excursion arms it with the next reading (1.12)
+    assert s.update(2.0) == 1.0
+    assert s.urgency == pytest.approx(1.115, abs=1e-3)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"fast_s": 0.0},
+        {"fast_s": 20.0},
+        {"batch": 0},
+        {"calm_after": 0},
+        {"smoothing": 0.0},
+        {"smoothing": 1.5},
+    ],
+)
+def test_invalid_settings(kwargs):
+    with pytest.raises(ValueError):
+        AdaptiveSampler(**{"slow_s": 10.0, **kwargs})
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from src.sensor_simulator import SensorArray, SensorProfile, SimulatedSensor
+
+SEED = 1234
+# Every component of a signal: drift, steps, random walk, spikes and clipping
+PROFILE = SensorProfile(
+    mean=7.0,
+    sigma=0.3,
+    drift=1e-4,
+    walk_sigma=0.05,
+    steps=((500, 1.5), (3000, -2.0)),
+    anomaly_rate=0.01,
+    floor=5.0,
+    ceiling=10.0,
+)
+N = 5000
+
+
+def read(sensor, n=N):
+    values, injected = [], []
+    for _ in range(n):
+        values.append(sensor.read())
+        injected.append(sensor.last_injected)
+    return np.array(values), np.array(injected)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1000, 4096, 10000])
+def test_samples_do_not_depend_on_the_block_size(block_size):
+    expected, expected_injected = SimulatedSensor("ph", PROFILE, SEED).generate(N)
+    values, injected = read(SimulatedSensor("ph", PROFILE, SEED, block_size))
+    assert np.array_equal(values, expected)
+    assert np.array_equal(injected, expected_injected)
+    assert expected_injected.any()
+
+
+def test_read_many_continues_the_same_stream():
+    expected, _ = read(SimulatedSensor("ph", PROFILE, SEED, block_size=64), 9000)
+    sensor = SimulatedSensor("ph", PROFILE, SEED, block_size=64)
+    values = []
+    for n in [1, 3, 0, 64, 200, 1, 17] * 30:
+        if n == 1:
+            values.append(sensor.read())
+        else:
+            values.extend(sensor.read_many(n))
+    assert len(values) == 30 * 286
+    assert np.array_equal(values, expected[: len(values)])
+
+
+def test_samples_do_not_depend_on_the_other_sensors_or_creation_order():
+    names = ["ph", "camera", "sonar"]
+    alone = {name: read(SimulatedSensor(name, PROFILE, SEED))[0] for name in names}
+
+    sensors = {name: SimulatedSensor(name, PROFILE, SEED) for name in reversed(names)}
+    interleaved = {name: [] for name in names}
+    for _ in range(N):
+        for name in names:
+            interleaved[name].append(sensors[name].read())
+    for name in names:
+        assert np.array_equal(interleaved[name], alone[name])
+    assert not np.array_equal(alone["ph"], alone["camera"])
+
+
+def test_a_different_seed_gives_a_different_stream():
+    first, _ = read(SimulatedSensor("ph", PROFILE, SEED), 100)
+    second, _ = read(SimulatedSensor("ph", PROFILE, SEED + 1), 100)
+    assert not np.array_equal(first, second)
+
+
+def test_sensor_array_matches_individual_sensors():
+    profiles = [PROFILE, PROFILE._replace(mean=20.0, sigma=5.0, floor=0.0)] * 3
+    array = SensorArray(profiles, SEED, block_size=256)
+    columns = np.array([array.read_all() for _ in range(1000)]).T
+    for row, name in enumerate(array.names):
+        sensor = SimulatedSensor(name, profiles[row], SEED, block_size=999)
+        assert np.array_equal(columns[row], read(sensor, 1000)[0])
+
+
+def test_sensor_array_read_block_continues_after_read_all():
+    array = SensorArray([PROFILE] * 4, SEED, block_size=100)
+    first = np.array([array.read_all() for _ in range(30)]).T
+    rest, injected = array.read_block()
+    assert rest.shape == injected.shape == (4, 70)
+    for row, name in enumerate(array.names):
+        values, flags = SimulatedSensor(name, PROFILE, SEED).generate(100)
+        assert np.array_equal(np.hstack([first[row], rest[row]]), values)
+        assert np.array_equal(injected[row], flags[30:])
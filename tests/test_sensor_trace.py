@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from src.clock import SimulatedClock
+from src.sensor_trace import RECORD, SensorTrace, TraceRecorder, TraceReplay
+
+T0 = 1_777_600_000.0
+
+
+def record(path, samples, chunk=64):
+    recorder = TraceRecorder(path, chunk=chunk, flush_interval_s=3600)
+    for stream, timestamp, value in samples:
+        recorder.record(stream, value, timestamp)
+    recorder.close()
+    return recorder
+
+
+def sample_stream(n):
+    streams = ("ph", "camera", "sonar")
+    return [(streams[i % 3], T0 + i * 0.5, 7.0 + i / 1000) for i in range(n)]
+
+
+def test_recorded_samples_read_back_through_the_memory_map(tmp_path):
+    path = tmp_path / "day.trace"
+    # Not a multiple of the recorder chunk: the last chunk is written on close
+    samples = sample_stream(1000)
+    assert record(path, samples).recorded == 1000
+
+    trace = SensorTrace(path)
+    assert isinstance(trace.records, np.memmap)
+    assert len(trace) == 1000
+    assert (trace.start_time, trace.end_time) == (T0, T0 + 999 * 0.5)
+    # Read across the boundaries of 64-record recorder and 100-record reader chunks
+    assert list(trace.samples(chunk=100)) == samples
+    assert list(trace.samples(("sonar",), chunk=100)) == samples[2::3]
+    times, values = trace.stream("camera")
+    assert times.tolist() == [t for s, t, _ in samples if s == "camera"]
+    assert values.tolist() == [v for s, _, v in samples if s == "camera"]
+    assert trace.stream("thermometer")[0].size == 0
+
+
+def test_recording_continues_a_trace_and_cuts_a_torn_record(tmp_path):
+    path = tmp_path / "day.trace"
+    samples = sample_stream(100)
+    record(path, samples[:50])
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD.size // 2))  # crash in the middle of a record
+    record(path, samples[50:])
+    assert list(SensorTrace(path).samples()) == samples
+
+
+def test_other_streams_cannot_continue_a_trace(tmp_path):
+    path = tmp_path / "day.trace"
+    record(path, sample_stream(3))
+    with pytest.raises(ValueError):
+        TraceRecorder(path, streams=("ph",))
+
+
+def test_empty_trace(tmp_path):
+    path = tmp_path / "empty.trace"
+    record(path, [])
+    trace = SensorTrace(path)
+    assert len(trace) == 0
+    assert trace.start_time is None
+    assert list(trace.samples()) == []
+
+
+@pytest.mark.parametrize(
+    "speed, arrivals",
+    [(1.0, [0.0, 1.0, 5.0, 15.0]), (2.0, [0.0, 0.5, 2.5, 7.5]), (0.0, [0.0] * 4)],
+)
+def test_replay_keeps_the_recorded_pace(tmp_path, speed, arrivals):
+    path = tmp_path / "day.trace"
+    offsets = [0.0, 1.0, 5.0, 15.0]
+    record(path, [("ph", T0 + offset, 7.0) for offset in offsets])
+    clock = SimulatedClock(T0)
+    replay = TraceReplay(SensorTrace(path), speed)
+
+    async def play():
+        return [
+            (clock.monotonic(), timestamp)
+            async for _, timestamp, _ in replay.samples(("ph",))
+        ]
+
+    played = clock.run(play())
+    assert [at for at, _ in played] == arrivals
+    assert [timestamp - T0 for _, timestamp in played] == offsets